@@ -0,0 +1,24 @@
+import hmac
+from functools import wraps
+
+from django.conf import settings
+from django.http import JsonResponse
+
+
+def metrics_required(view):
+    """Serve an operational endpoint (stats, /metrics) only to METRICS_TOKEN holders.
+
+    The token is sent as ``Authorization: Bearer <token>``. Without a
+    configured token these endpoints stay closed.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        token = settings.METRICS_TOKEN
+        if not token:
+            return JsonResponse({"error": "Metrics are disabled. Set METRICS_TOKEN to enable them."}, status=403)
+        sent = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+        if not hmac.compare_digest(sent.encode(), token.encode()):
+            return JsonResponse({"error": "Invalid metrics token"}, status=401)
+        return view(request, *args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,467 @@
+"""
+Shared Gemini client.
+
+Every app talks to Gemini through this module so that all calls reuse one
+keep-alive connection pool, follow one retry policy, respect the per-key
+rate limiter (backend/ratelimit.py), share the exact-match response cache
+(backend/response_cache.py) and report timings through the same hooks.
+GEMINI_BASE_URL can point the client at a local stub server.
+"""
+
+import json
+import time
+import logging
+import asyncio
+import threading
+import weakref
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+from .ratelimit import key_limiter, parse_retry_after
+from .prompts import payload_chars
+from .response_cache import response_cache
+from .timing import gemini_timing_hook
+
+
+MODEL_NAME = "gemini-2.5-flash-preview-09-2025"
+
+logger = logging.getLogger("backend.gemini")
+
+# Status codes worth another attempt; everything else is returned to the caller.
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+# ============================================================
+#  Connection Pool
+# ============================================================
+
+_session = None
+
+
+def get_session():
+    """Return the process-wide pooled session, creating it on first use."""
+    global _session
+    if _session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=settings.GEMINI_POOL_SIZE,
+            pool_block=False,
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update({"Content-Type": "application/json"})
+        _session = session
+    return _session
+
+
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client():
+    """Return the pooled httpx client for the running event loop.
+
+    httpx clients are bound to the loop they were first used on, so each
+    loop (normally just the one ASGI loop) gets its own pool.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(
+            headers={"Content-Type": "application/json"},
+            limits=httpx.Limits(
+                max_connections=settings.GEMINI_ASYNC_POOL_SIZE,
+                max_keepalive_connections=settings.GEMINI_ASYNC_POOL_SIZE,
+            ),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+# ============================================================
+#  Per-Key Concurrency
+#  Fan-out callers (batch endpoints) hold one of these slots per call so
+#  a single API key never has more than GEMINI_PER_KEY_CONCURRENCY
+#  requests in flight from this process.
+# ============================================================
+
+_key_slots = {}
+_key_slots_lock = threading.Lock()
+_async_key_slots = weakref.WeakKeyDictionary()
+
+
+def key_slot(api_key):
+    """Semaphore for ``api_key``; use as ``with key_slot(key): call_gemini(...)``."""
+    with _key_slots_lock:
+        slot = _key_slots.get(api_key)
+        if slot is None:
+            slot = threading.BoundedSemaphore(settings.GEMINI_PER_KEY_CONCURRENCY)
+            _key_slots[api_key] = slot
+        return slot
+
+
+def akey_slot(api_key):
+    """asyncio twin of ``key_slot`` for the running event loop."""
+    slots = _async_key_slots.setdefault(asyncio.get_running_loop(), {})
+    slot = slots.get(api_key)
+    if slot is None:
+        slot = asyncio.BoundedSemaphore(settings.GEMINI_PER_KEY_CONCURRENCY)
+        slots[api_key] = slot
+    return slot
+
+
+# ============================================================
+#  Timing Hooks
+# ============================================================
+
+def _log_sizes(event):
+    logger.info(
+        "gemini %s status=%s attempt=%d %.2fs prompt=%d chars ~%d tokens, usage prompt=%s response=%s tokens",
+        event["endpoint"] or "-", event["status"], event["attempt"], event["elapsed"],
+        event["prompt_chars"], event["prompt_tokens_est"], event.get("prompt_tokens"),
+        event.get("response_tokens"),
+    )
+
+
+_timing_hooks = [_log_sizes, gemini_timing_hook]
+
+
+def add_timing_hook(hook):
+    """Register ``hook(event)`` to be called after every Gemini attempt.
+
+    ``event`` is a dict with ``model``, ``endpoint`` (as passed by the
+    caller), ``attempt``, ``status`` (HTTP status or None on a transport
+    error), ``elapsed`` (seconds), ``ok``, ``prompt_chars`` and
+    ``prompt_tokens_est``. Successful attempts add Gemini's own
+    ``prompt_tokens`` / ``response_tokens`` counts. Streaming calls add
+    ``stream: True`` and ``ttfb`` (seconds to the first chunk).
+    """
+    if hook not in _timing_hooks:
+        _timing_hooks.append(hook)
+
+
+def remove_timing_hook(hook):
+    if hook in _timing_hooks:
+        _timing_hooks.remove(hook)
+
+
+def _emit_timing(event):
+    for hook in list(_timing_hooks):
+        try:
+            hook(event)
+        except Exception as e:
+            print(f"Gemini timing hook error: {e}")
+
+
+# ============================================================
+#  Calls
+# ============================================================
+
+def model_url(action="generateContent", model=MODEL_NAME):
+    return f"{settings.GEMINI_BASE_URL}/{model}:{action}"
+
+
+def max_attempts():
+    """Attempts per call; GEMINI_MAX_RETRIES=0 still makes one."""
+    return max(1, settings.GEMINI_MAX_RETRIES)
+
+
+def backoff_delay(attempt):
+    """Seconds to wait before retrying after ``attempt`` (0-based) failed."""
+    return settings.GEMINI_RETRY_BACKOFF ** attempt
+
+
+def _throttled(api_key, res):
+    """Pass a 429's Retry-After / RetryInfo hint on to the key limiter."""
+    try:
+        body = res.json()
+    except ValueError:
+        body = None
+    key_limiter.throttled(api_key, parse_retry_after(res.headers, body))
+
+
+def _call_info(endpoint, payload):
+    """Per-call fields shared by every attempt event of one call."""
+    chars = payload_chars(payload)
+    return {
+        "model": MODEL_NAME,
+        "endpoint": endpoint,
+        "prompt_chars": chars,
+        "prompt_tokens_est": -(-chars // settings.PROMPT_CHARS_PER_TOKEN),
+    }
+
+
+def _usage(data):
+    usage = (data or {}).get("usageMetadata") or {}
+    return {
+        "prompt_tokens": usage.get("promptTokenCount"),
+        "response_tokens": usage.get("candidatesTokenCount"),
+    }
+
+
+def _attempt_event(call, attempt, status, started, ok):
+    return {
+        **call,
+        "attempt": attempt,
+        "status": status,
+        "elapsed": time.perf_counter() - started,
+        "ok": ok,
+    }
+
+
+def call_gemini(api_key, payload, timeout=None, endpoint=None, cache=True):
+    """Send a generateContent request over the shared pool, with retry.
+
+    ``endpoint`` labels the call for logs, prompt budgets and the response
+    cache; ``cache=False`` skips the cache lookup ("regenerate") but still
+    stores the fresh response.
+    """
+    key, cached = response_cache.lookup(endpoint, MODEL_NAME, payload, use=cache)
+    if cached is not None:
+        return cached
+
+    session = get_session()
+    url = model_url()
+    timeout = timeout or settings.GEMINI_TIMEOUT
+    attempts = max_attempts()
+    call = _call_info(endpoint, payload)
+
+    for attempt in range(attempts):
+        started = time.perf_counter()
+        status = None
+        key_limiter.acquire(api_key)
+        try:
+            res = session.post(url, params={"key": api_key}, json=payload, timeout=timeout)
+            status = res.status_code
+            res.raise_for_status()
+            data = res.json()
+        except requests.exceptions.RequestException as e:
+            _emit_timing(_attempt_event(call, attempt, status, started, False))
+            if status == 429:
+                _throttled(api_key, res)
+            retryable = status is None or status in RETRY_STATUS
+            if attempt == attempts - 1 or not retryable:
+                raise e
+            # After a 429 the limiter already holds the next attempt back.
+            if status != 429:
+                time.sleep(backoff_delay(attempt))
+            continue
+
+        key_limiter.succeeded(api_key)
+        _emit_timing({**_attempt_event(call, attempt, status, started, True), **_usage(data)})
+        if key:
+            response_cache.put(key, data)
+        return data
+
+
+async def acall_gemini(api_key, payload, timeout=None, endpoint=None, cache=True):
+    """Non-blocking twin of ``call_gemini`` for async views."""
+    key, cached = response_cache.lookup(endpoint, MODEL_NAME, payload, use=cache)
+    if cached is not None:
+        return cached
+
+    client = get_async_client()
+    url = model_url()
+    timeout = timeout or settings.GEMINI_TIMEOUT
+    attempts = max_attempts()
+    call = _call_info(endpoint, payload)
+
+    for attempt in range(attempts):
+        started = time.perf_counter()
+        status = None
+        await key_limiter.aacquire(api_key)
+        try:
+            res = await client.post(url, params={"key": api_key}, json=payload, timeout=timeout)
+            status = res.status_code
+            res.raise_for_status()
+            data = res.json()
+        except (httpx.HTTPError, ValueError) as e:
+            _emit_timing(_attempt_event(call, attempt, status, started, False))
+            if status == 429:
+                _throttled(api_key, res)
+            retryable = status is None or status in RETRY_STATUS
+            if attempt == attempts - 1 or not retryable:
+                raise e
+            if status != 429:
+                await asyncio.sleep(backoff_delay(attempt))
+            continue
+
+        key_limiter.succeeded(api_key)
+        _emit_timing({**_attempt_event(call, attempt, status, started, True), **_usage(data)})
+        if key:
+            response_cache.put(key, data)
+        return data
+
+
+# ============================================================
+#  Streaming (server-sent events from streamGenerateContent)
+# ============================================================
+
+class _Collected:
+    """Reassembles streamed chunks into one generateContent-style response."""
+
+    def __init__(self):
+        self.texts = []
+        self.grounding = None
+        self.usage = None
+
+    def add(self, chunk):
+        candidate = (chunk.get("candidates") or [{}])[0]
+        for part in candidate.get("content", {}).get("parts", []):
+            self.texts.append(part.get("text", ""))
+        if candidate.get("groundingMetadata"):
+            self.grounding = candidate["groundingMetadata"]
+        if chunk.get("usageMetadata"):
+            self.usage = chunk["usageMetadata"]
+
+    def response(self):
+        candidate = {"content": {"role": "model", "parts": [{"text": "".join(self.texts)}]}}
+        if self.grounding:
+            candidate["groundingMetadata"] = self.grounding
+        response = {"candidates": [candidate]}
+        if self.usage:
+            response["usageMetadata"] = self.usage
+        return response
+
+
+def _sse_chunk(line):
+    """Decode one ``data:`` line of Gemini's SSE stream, else None."""
+    if not line or not line.startswith("data:"):
+        return None
+    return json.loads(line[5:].strip())
+
+
+def stream_gemini(api_key, payload, timeout=None, endpoint=None, cache=True):
+    """Yield response chunks from streamGenerateContent as they arrive.
+
+    Retries happen only while connecting; once the first chunk has been
+    yielded a failure is raised to the caller. A cached response is
+    yielded as a single chunk.
+    """
+    key, cached = response_cache.lookup(endpoint, MODEL_NAME, payload, use=cache)
+    if cached is not None:
+        yield cached
+        return
+
+    session = get_session()
+    url = model_url("streamGenerateContent")
+    timeout = timeout or settings.GEMINI_TIMEOUT
+    attempts = max_attempts()
+    call = _call_info(endpoint, payload)
+
+    for attempt in range(attempts):
+        started = time.perf_counter()
+        status = None
+        key_limiter.acquire(api_key)
+        try:
+            res = session.post(
+                url, params={"key": api_key, "alt": "sse"}, json=payload,
+                timeout=timeout, stream=True,
+            )
+            status = res.status_code
+            res.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            _emit_timing(_attempt_event(call, attempt, status, started, False))
+            if status is not None:
+                if status == 429:
+                    _throttled(api_key, res)
+                # Streamed responses hold their pooled connection until closed.
+                res.close()
+            retryable = status is None or status in RETRY_STATUS
+            if attempt == attempts - 1 or not retryable:
+                raise e
+            if status != 429:
+                time.sleep(backoff_delay(attempt))
+            continue
+        key_limiter.succeeded(api_key)
+        break
+
+    ttfb = None
+    usage = {}
+    collected = _Collected()
+    ok = False
+    try:
+        res.encoding = "utf-8"
+        for line in res.iter_lines(decode_unicode=True):
+            chunk = _sse_chunk(line)
+            if chunk is None:
+                continue
+            if ttfb is None:
+                ttfb = time.perf_counter() - started
+            if chunk.get("usageMetadata"):
+                usage = _usage(chunk)
+            collected.add(chunk)
+            yield chunk
+        ok = True
+        if key:
+            response_cache.put(key, collected.response())
+    finally:
+        res.close()
+        _emit_timing({**_attempt_event(call, attempt, status, started, ok), **usage, "stream": True, "ttfb": ttfb})
+
+
+async def astream_gemini(api_key, payload, timeout=None, endpoint=None, cache=True):
+    """Async twin of ``stream_gemini``."""
+    key, cached = response_cache.lookup(endpoint, MODEL_NAME, payload, use=cache)
+    if cached is not None:
+        yield cached
+        return
+
+    client = get_async_client()
+    url = model_url("streamGenerateContent")
+    timeout = timeout or settings.GEMINI_TIMEOUT
+    attempts = max_attempts()
+    call = _call_info(endpoint, payload)
+
+    for attempt in range(attempts):
+        started = time.perf_counter()
+        status = None
+        res = None
+        await key_limiter.aacquire(api_key)
+        try:
+            request = client.build_request(
+                "POST", url, params={"key": api_key, "alt": "sse"}, json=payload, timeout=timeout,
+            )
+            res = await client.send(request, stream=True)
+            status = res.status_code
+            res.raise_for_status()
+        except httpx.HTTPError as e:
+            if res is not None:
+                if status == 429:
+                    await res.aread()
+                    _throttled(api_key, res)
+                await res.aclose()
+            _emit_timing(_attempt_event(call, attempt, status, started, False))
+            retryable = status is None or status in RETRY_STATUS
+            if attempt == attempts - 1 or not retryable:
+                raise e
+            if status != 429:
+                await asyncio.sleep(backoff_delay(attempt))
+            continue
+        key_limiter.succeeded(api_key)
+        break
+
+    ttfb = None
+    usage = {}
+    collected = _Collected()
+    ok = False
+    try:
+        async for line in res.aiter_lines():
+            chunk = _sse_chunk(line)
+            if chunk is None:
+                continue
+            if ttfb is None:
+                ttfb = time.perf_counter() - started
+            if chunk.get("usageMetadata"):
+                usage = _usage(chunk)
+            collected.add(chunk)
+            yield chunk
+        ok = True
+        if key:
+            response_cache.put(key, collected.response())
+    finally:
+        await res.aclose()
+        _emit_timing({**_attempt_event(call, attempt, status, started, ok), **usage, "stream": True, "ttfb": ttfb})
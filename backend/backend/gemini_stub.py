@@ -0,0 +1,189 @@
+"""
+Local stand-in for the Gemini REST API.
+
+Answers ``:generateContent`` and ``:streamGenerateContent?alt=sse`` with
+canned responses after a configurable delay, so the whole request path
+(rate limiter, retries, response cache, timing hooks) can be exercised
+without network access or quota. Point GEMINI_BASE_URL at ``base_url``.
+``throttle(n, retry_after)`` makes the next ``n`` requests answer 429
+like an exhausted quota does.
+
+The response is picked from the prompt: JSON for the prep hub, the
+sections it was sent for a section-level enhance, a small compilable
+LaTeX document for resume generate/enhance, plain text for everything
+else. ``payload_chars`` pads the text to a realistic size.
+"""
+
+import re
+import json
+import time
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+FILLER = (
+    "Led the migration of a monolith to services, cutting p95 latency by 40 percent "
+    "and owning the on-call rotation for the payments team. "
+)
+
+
+def _filler(chars):
+    return (FILLER * (chars // len(FILLER) + 1))[:chars]
+
+
+def _prompt_text(payload):
+    parts = list((payload.get("systemInstruction") or {}).get("parts", []))
+    for content in payload.get("contents", []):
+        parts.extend(content.get("parts", []))
+    return " ".join(part.get("text", "") for part in parts)
+
+
+def response_text(payload, payload_chars):
+    """Canned answer shaped like what the calling endpoint expects."""
+    prompt = _prompt_text(payload)
+
+    if "interview preparation" in prompt:
+        return json.dumps({
+            "interview_questions": {
+                "technical_round_1": [{"question": "Design a rate limiter", "answer": _filler(payload_chars // 4)}],
+                "technical_round_2": [],
+                "hr_round": [],
+            },
+            "company_overview": _filler(payload_chars // 4),
+        })
+
+    sections = re.findall(r"^%%% SECTION \d+\n.*?(?=^%%% SECTION |^Improve wording)", prompt, re.M | re.S)
+    if sections:
+        # Section-level enhance: hand the sections back unchanged.
+        return "\n".join(section.strip() for section in sections)
+
+    if "LaTeX" in prompt:
+        body = "\n\n".join(_filler(300) for _ in range(max(1, payload_chars // 300)))
+        return (
+            "\\documentclass{article}\n"
+            "\\begin{document}\n"
+            "\\section{Experience}\n"
+            f"{body}\n"
+            "\\end{document}\n"
+            "% ATS_SCORE: 85"
+        )
+
+    return "Subject: Backend engineer application\n\n" + _filler(payload_chars)
+
+
+def _response(text):
+    return {
+        "candidates": [{"content": {"parts": [{"text": text}], "role": "model"}, "finishReason": "STOP"}],
+        "usageMetadata": {"promptTokenCount": 0, "candidatesTokenCount": len(text) // 4},
+    }
+
+
+class GeminiStub:
+    """Threaded HTTP server answering like Gemini.
+
+    ``latency`` is the mean delay in seconds before the first byte,
+    ``jitter`` a +/- fraction of it, ``stream_chunks`` how many SSE
+    events a streamed answer is split into.
+    """
+
+    def __init__(self, latency=0.5, jitter=0.2, payload_chars=3000, stream_chunks=8, host="127.0.0.1", port=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.payload_chars = payload_chars
+        self.stream_chunks = stream_chunks
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "streamed": 0, "throttled": 0}
+        self._throttle = 0
+        self._retry_after = 0
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1beta/models"
+
+    def delay(self):
+        spread = self.latency * self.jitter
+        return max(0.0, self.latency + random.uniform(-spread, spread))
+
+    def throttle(self, count, retry_after=1):
+        """Answer the next ``count`` requests with 429 and this Retry-After."""
+        with self._lock:
+            self._throttle = count
+            self._retry_after = retry_after
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                url = urlparse(self.path)
+                streamed = url.path.endswith(":streamGenerateContent")
+                with stub._lock:
+                    stub.stats["requests"] += 1
+                    stub.stats["streamed"] += int(streamed)
+                    throttled = stub._throttle > 0
+                    if throttled:
+                        stub._throttle -= 1
+                        stub.stats["throttled"] += 1
+
+                if throttled:
+                    return self._rate_limited(stub._retry_after)
+
+                text = response_text(payload, stub.payload_chars)
+                time.sleep(stub.delay())
+
+                if streamed and parse_qs(url.query).get("alt") == ["sse"]:
+                    self._stream(text)
+                else:
+                    self._json(_response(text))
+
+            def _json(self, data):
+                body = json.dumps(data).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _rate_limited(self, retry_after):
+                body = json.dumps({"error": {"code": 429, "status": "RESOURCE_EXHAUSTED", "message": "Quota exceeded"}}).encode()
+                self.send_response(429)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Retry-After", str(retry_after))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _stream(self, text):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                size = -(-len(text) // stub.stream_chunks)
+                for start in range(0, len(text), size):
+                    chunk = _response(text[start:start + size])
+                    self.wfile.write(f"data: {json.dumps(chunk)}\r\n\r\n".encode())
+                    self.wfile.flush()
+                self.close_connection = True
+
+        return Handler
@@ -0,0 +1,90 @@
+"""
+Process-wide MongoDB access.
+
+Every app goes through this module instead of building its own
+MongoClient: one lazily created, pooled client per process (plus one async
+client per event loop for the coroutine views). ``ensure_indexes`` and the
+apps' own index setup run once at startup from the users app, so
+collections only touched by the async views are indexed too.
+"""
+
+import asyncio
+import threading
+import weakref
+
+from django.conf import settings
+from pymongo import MongoClient, AsyncMongoClient, ASCENDING
+
+from .timing import MongoTimingListener
+
+
+_client = None
+_client_lock = threading.Lock()
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _client_options():
+    return {
+        "maxPoolSize": settings.MONGO_MAX_POOL_SIZE,
+        "minPoolSize": settings.MONGO_MIN_POOL_SIZE,
+        "serverSelectionTimeoutMS": settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "event_listeners": [MongoTimingListener()],
+    }
+
+
+def get_client():
+    """Return the shared MongoClient, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = MongoClient(settings.MONGO_URI, **_client_options())
+    return _client
+
+
+def get_db():
+    return get_client()[settings.MONGO_DB_NAME]
+
+
+def collection(name):
+    return get_db()[name]
+
+
+def users():
+    return collection("users")
+
+
+def get_async_db():
+    """Return the async database handle for the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = AsyncMongoClient(settings.MONGO_URI, **_client_options())
+        _async_clients[loop] = client
+    return client[settings.MONGO_DB_NAME]
+
+
+def async_collection(name):
+    return get_async_db()[name]
+
+
+def async_users():
+    return async_collection("users")
+
+
+def ensure_indexes():
+    """Create the indexes every lookup relies on; safe to call repeatedly."""
+    users().create_index([("email", ASCENDING)], unique=True, name="email_unique")
+
+
+def ensure_indexes_in_background(*more):
+    """Run ensure_indexes, then each of ``more``, without holding up startup when Mongo is slow or down."""
+
+    def run():
+        for ensure in (ensure_indexes, *more):
+            try:
+                ensure()
+            except Exception as e:
+                print(f"Warning: could not ensure MongoDB indexes at startup: {e}")
+
+    threading.Thread(target=run, daemon=True).start()
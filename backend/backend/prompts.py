@@ -0,0 +1,155 @@
+"""
+Prompt size budgeting.
+
+Payload builders hand their fixed text (system prompt, template, LaTeX
+source) and their trimmable inputs (profile, job description, resume
+text) to ``fit``. Inputs are always serialized compactly; if the prompt
+is still over the endpoint's PROMPT_BUDGETS entry, the least valuable
+inputs are shrunk first. Token counts are estimates (PROMPT_CHARS_PER_TOKEN
+characters per token), good enough for budgeting; Gemini's own counts are
+logged with every call by backend/gemini.py.
+"""
+
+import re
+import json
+import logging
+
+from django.conf import settings
+
+
+logger = logging.getLogger("backend.prompts")
+
+TRIMMED_MARKER = " [...]"
+
+# Profile sections dropped first when a profile is over budget.
+LOW_VALUE_SECTIONS = ("certifications", "projects")
+
+
+def estimate_tokens(text):
+    return -(-len(text) // settings.PROMPT_CHARS_PER_TOKEN) if text else 0
+
+
+def payload_chars(payload):
+    """Characters of text in a generateContent payload."""
+    parts = list((payload.get("systemInstruction") or {}).get("parts", []))
+    for content in payload.get("contents", []):
+        parts.extend(content.get("parts", []))
+    return sum(len(part.get("text", "")) for part in parts)
+
+
+def budget_for(endpoint):
+    return settings.PROMPT_BUDGETS.get(endpoint, settings.PROMPT_DEFAULT_BUDGET)
+
+
+# ============================================================
+#  Compaction
+# ============================================================
+
+def _drop_empty(value):
+    if isinstance(value, dict):
+        cleaned = {k: _drop_empty(v) for k, v in value.items()}
+        return {k: v for k, v in cleaned.items() if v not in (None, "", [], {})}
+    if isinstance(value, list):
+        cleaned = [_drop_empty(v) for v in value]
+        return [v for v in cleaned if v not in (None, "", [], {})]
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+
+def _shorten_strings(value, limit):
+    if isinstance(value, dict):
+        return {k: _shorten_strings(v, limit) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_shorten_strings(v, limit) for v in value]
+    if isinstance(value, str) and len(value) > limit:
+        return value[:limit].rstrip() + TRIMMED_MARKER
+    return value
+
+
+def compact_json(data):
+    """JSON without indentation, spaces after separators or empty fields."""
+    return json.dumps(_drop_empty(data), separators=(",", ":"), ensure_ascii=False)
+
+
+def fit_text(text, max_tokens=None):
+    """Collapse redundant whitespace, then cut at a line or word boundary to ``max_tokens``."""
+    text = re.sub(r"[ \t]+", " ", text or "")
+    text = re.sub(r" *\n *", "\n", text)
+    text = re.sub(r"\n{3,}", "\n\n", text).strip()
+    if max_tokens is None or estimate_tokens(text) <= max_tokens:
+        return text
+
+    limit = max(0, max_tokens * settings.PROMPT_CHARS_PER_TOKEN - len(TRIMMED_MARKER))
+    cut = text[:limit]
+    boundary = max(cut.rfind("\n"), cut.rfind(" "))
+    if boundary > limit // 2:
+        cut = cut[:boundary]
+    return cut.rstrip() + TRIMMED_MARKER
+
+
+def fit_profile(profile, max_tokens=None):
+    """Compact JSON of ``profile_data``, shrunk step by step to ``max_tokens``.
+
+    Order: keep two entries of LOW_VALUE_SECTIONS, shorten long
+    descriptions, then drop LOW_VALUE_SECTIONS altogether.
+    """
+    data = _drop_empty(profile or {})
+    text = compact_json(data)
+
+    def fits(candidate):
+        return max_tokens is None or estimate_tokens(candidate) <= max_tokens
+
+    if fits(text):
+        return text
+
+    trimmed = {k: (v[:2] if k in LOW_VALUE_SECTIONS and isinstance(v, list) else v) for k, v in data.items()}
+    candidates = [trimmed]
+    for limit in (400, 200, 100):
+        candidates.append(_shorten_strings(candidates[-1], limit))
+    candidates.append({k: v for k, v in candidates[-1].items() if k not in LOW_VALUE_SECTIONS})
+
+    for candidate in candidates:
+        text = compact_json(candidate)
+        if fits(text):
+            break
+    return text
+
+
+# ============================================================
+#  Budgeting
+# ============================================================
+
+def fit(endpoint, fixed, parts):
+    """Shrink ``parts`` until they fit next to ``fixed`` in the endpoint's budget.
+
+    ``parts`` is a list of ``(name, text, shrink)``, least valuable first,
+    where ``text`` is the full compact rendering and ``shrink(max_tokens)``
+    a shorter one. A first pass halves parts at most, so one input is not
+    wiped out while another is untouched. Returns ``{name: text}``.
+    """
+    budget = budget_for(endpoint)
+    texts = {name: text for name, text, _ in parts}
+    full = {name: estimate_tokens(text) for name, text, _ in parts}
+    over = estimate_tokens(fixed) + sum(full.values()) - budget
+
+    for keep in (0.5, 0.0):
+        for name, _, shrink in parts:
+            if over <= 0:
+                break
+            before = estimate_tokens(texts[name])
+            target = max(int(full[name] * keep), before - over)
+            if target >= before:
+                continue
+            texts[name] = shrink(target)
+            over -= before - estimate_tokens(texts[name])
+
+    for name in texts:
+        if estimate_tokens(texts[name]) < full[name]:
+            logger.info(
+                "prompt %s: trimmed %s from ~%d to ~%d tokens (budget %d)",
+                endpoint, name, full[name], estimate_tokens(texts[name]), budget,
+            )
+    if over > 0:
+        logger.warning("prompt %s: ~%d tokens over its %d token budget", endpoint, over, budget)
+    return texts
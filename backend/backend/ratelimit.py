@@ -0,0 +1,177 @@
+"""
+Per-API-key rate limiting for Gemini calls.
+
+Each key gets a token bucket refilled at ``rpm`` requests per minute. A
+call takes a token before it goes out; when the bucket is empty the call
+waits for its turn, and if that wait would exceed GEMINI_KEY_MAX_WAIT it
+is shed with ``RateLimited`` instead of being sent into a quota wall.
+
+The rate adapts to what Gemini reports: a 429 halves the key's rate and
+blocks it for the Retry-After / RetryInfo delay, and every success after
+that nudges the rate back up towards GEMINI_KEY_RPM. State is per
+process; keys are only ever exposed as a short hash.
+"""
+
+import time
+import math
+import asyncio
+import hashlib
+import threading
+from email.utils import parsedate_to_datetime
+
+from django.conf import settings
+from django.http import JsonResponse
+
+
+class RateLimited(Exception):
+    """The key's budget is exhausted; ``retry_after`` is in seconds."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Gemini rate limit reached for this API key, retry in {math.ceil(retry_after)}s")
+        self.retry_after = retry_after
+
+
+def rate_limited_response(error):
+    """429 for a call shed by the key limiter, with the wait in Retry-After."""
+    retry_after = math.ceil(error.retry_after)
+    response = JsonResponse({"error": str(error), "retry_after": retry_after}, status=429)
+    response["Retry-After"] = str(retry_after)
+    return response
+
+
+def key_id(api_key):
+    return hashlib.sha256(api_key.encode()).hexdigest()[:12]
+
+
+def parse_retry_after(headers, body=None):
+    """Seconds Gemini asked us to wait, from Retry-After or an error body's RetryInfo."""
+    value = headers.get("Retry-After") if headers else None
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+
+    # {"error": {"status": "RESOURCE_EXHAUSTED", "details": [{"@type": ".../google.rpc.RetryInfo", "retryDelay": "31s"}]}}
+    error = (body or {}).get("error") if isinstance(body, dict) else None
+    for detail in (error or {}).get("details") or []:
+        delay = detail.get("retryDelay") if isinstance(detail, dict) else None
+        if isinstance(delay, str) and delay.endswith("s"):
+            try:
+                return max(0.0, float(delay[:-1]))
+            except ValueError:
+                pass
+    return None
+
+
+class TokenBucket:
+
+    def __init__(self, rpm, burst):
+        self.rpm = rpm
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.stats = {
+            "sent": 0,
+            "waited": 0,
+            "shed": 0,
+            "throttled": 0,
+        }
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rpm / 60.0)
+        self.updated = now
+
+    def reserve(self, now, max_wait):
+        """Take a token; return seconds to wait before using it, or raise RateLimited."""
+        self._refill(now)
+        self.tokens -= 1
+        wait = max(0.0, -self.tokens * 60.0 / self.rpm, self.blocked_until - now)
+        if wait > max_wait:
+            self.tokens += 1
+            self.stats["shed"] += 1
+            raise RateLimited(wait)
+        self.stats["sent"] += 1
+        if wait > 0:
+            self.stats["waited"] += 1
+        return wait
+
+    def throttled(self, now, retry_after):
+        self._refill(now)
+        self.rpm = max(settings.GEMINI_KEY_MIN_RPM, self.rpm / 2)
+        self.tokens = min(self.tokens, 0.0)
+        self.blocked_until = max(self.blocked_until, now + (retry_after or 60.0 / self.rpm))
+        self.stats["throttled"] += 1
+
+    def succeeded(self):
+        # Additive increase back towards the configured rate.
+        self.rpm = min(settings.GEMINI_KEY_RPM, self.rpm + 1)
+
+    def snapshot(self, now):
+        self._refill(now)
+        return {
+            **self.stats,
+            "rpm": round(self.rpm, 2),
+            "max_rpm": settings.GEMINI_KEY_RPM,
+            "tokens": round(max(self.tokens, 0.0), 2),
+            "queued": max(0, math.ceil(-self.tokens)),
+            "blocked_for": round(max(0.0, self.blocked_until - now), 1),
+        }
+
+
+class KeyRateLimiter:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def _bucket(self, api_key):
+        kid = key_id(api_key)
+        bucket = self._buckets.get(kid)
+        if bucket is None:
+            bucket = TokenBucket(settings.GEMINI_KEY_RPM, settings.GEMINI_KEY_BURST)
+            self._buckets[kid] = bucket
+        return bucket
+
+    def _reserve(self, api_key, max_wait):
+        if max_wait is None:
+            max_wait = settings.GEMINI_KEY_MAX_WAIT
+        with self._lock:
+            return self._bucket(api_key).reserve(time.monotonic(), max_wait)
+
+    def acquire(self, api_key, max_wait=None):
+        """Block until ``api_key`` may send a request; raises RateLimited instead of waiting too long."""
+        wait = self._reserve(api_key, max_wait)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def aacquire(self, api_key, max_wait=None):
+        wait = self._reserve(api_key, max_wait)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def throttled(self, api_key, retry_after=None):
+        """Record a 429 for ``api_key``."""
+        with self._lock:
+            self._bucket(api_key).throttled(time.monotonic(), retry_after)
+
+    def succeeded(self, api_key):
+        with self._lock:
+            self._bucket(api_key).succeeded()
+
+    def budget(self, api_key):
+        """Current budget of one key."""
+        with self._lock:
+            return {"key_id": key_id(api_key), **self._bucket(api_key).snapshot(time.monotonic())}
+
+    def snapshot(self):
+        now = time.monotonic()
+        with self._lock:
+            return {kid: bucket.snapshot(now) for kid, bucket in self._buckets.items()}
+
+
+key_limiter = KeyRateLimiter()
@@ -0,0 +1,128 @@
+"""
+Exact-match cache for Gemini responses.
+
+Identical prompts (a retry, a double-click) are answered from memory
+instead of spending quota again. The key is a SHA-256 over the model name,
+system instruction, user contents and generation settings of the payload,
+so any difference in resume text, company, role or tone is a different
+entry. Only endpoints listed in GEMINI_CACHE_ENDPOINTS are cached; entries
+live for GEMINI_CACHE_TTL seconds in a per-process LRU of
+GEMINI_CACHE_MAX_ENTRIES. A request with ``X-Regenerate: 1`` (or
+``Cache-Control: no-cache``) skips the lookup and refreshes the entry.
+"""
+
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+def cache_key(model, payload):
+    normalized = {
+        "model": model,
+        "system": payload.get("systemInstruction"),
+        "contents": payload.get("contents"),
+        "tools": payload.get("tools"),
+        "config": payload.get("generationConfig"),
+    }
+    blob = json.dumps(normalized, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+def bypass_requested(request):
+    """True when the client asked for a fresh generation ("regenerate")."""
+    if request.headers.get("X-Regenerate", "").lower() in ("1", "true", "yes"):
+        return True
+    return "no-cache" in request.headers.get("Cache-Control", "").lower()
+
+
+def _billed_tokens(data):
+    usage = data.get("usageMetadata") or {}
+    return (usage.get("promptTokenCount") or 0) + (usage.get("candidatesTokenCount") or 0)
+
+
+class ResponseCache:
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # key -> (expires_at, response)
+        self._endpoints = {}
+        self.stats = {
+            "evictions": 0,
+            "expired": 0,
+            "saved_tokens": 0,
+        }
+
+    def enabled_for(self, endpoint):
+        return self.max_entries > 0 and endpoint in settings.GEMINI_CACHE_ENDPOINTS
+
+    def _count(self, endpoint, field):
+        counts = self._endpoints.setdefault(endpoint, {"hits": 0, "misses": 0, "bypassed": 0})
+        counts[field] += 1
+
+    def lookup(self, endpoint, model, payload, use=True):
+        """Return (key, cached_response).
+
+        ``key`` is None when the endpoint is not cached; ``cached_response``
+        is None on a miss or bypass. Treat returned responses as read-only.
+        """
+        if not self.enabled_for(endpoint):
+            return None, None
+        key = cache_key(model, payload)
+
+        with self._lock:
+            if not use:
+                self._count(endpoint, "bypassed")
+                return key, None
+
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[key]
+                self.stats["expired"] += 1
+                entry = None
+            if entry is None:
+                self._count(endpoint, "misses")
+                return key, None
+
+            self._entries.move_to_end(key)
+            self._count(endpoint, "hits")
+            self.stats["saved_tokens"] += _billed_tokens(entry[1])
+            return key, entry[1]
+
+    def put(self, key, response):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def snapshot(self):
+        with self._lock:
+            endpoints = {}
+            for endpoint, counts in self._endpoints.items():
+                lookups = counts["hits"] + counts["misses"]
+                endpoints[endpoint] = {
+                    **counts,
+                    "hit_ratio": (counts["hits"] / lookups) if lookups else 0.0,
+                }
+            hits = sum(c["hits"] for c in self._endpoints.values())
+            lookups = hits + sum(c["misses"] for c in self._endpoints.values())
+            return {
+                **self.stats,
+                "hits": hits,
+                "hit_ratio": (hits / lookups) if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "enabled_endpoints": sorted(settings.GEMINI_CACHE_ENDPOINTS),
+                "endpoints": endpoints,
+            }
+
+
+response_cache = ResponseCache(settings.GEMINI_CACHE_MAX_ENTRIES, settings.GEMINI_CACHE_TTL)
@@ -28,6 +28,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'backend.timing.TimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -122,3 +123,186 @@ os.makedirs(TEMP_FOLDER, exist_ok=True)
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 MONGO_URI = "mongodb://localhost:27017"
 MONGO_DB_NAME = "resume_db"
+
+# GEMINI CLIENT
+# One pooled keep-alive session per worker process (see backend/gemini.py).
+GEMINI_POOL_SIZE = int(os.environ.get("GEMINI_POOL_SIZE", 10))
+GEMINI_TIMEOUT = float(os.environ.get("GEMINI_TIMEOUT", 60))
+GEMINI_MAX_RETRIES = int(os.environ.get("GEMINI_MAX_RETRIES", 3))
+GEMINI_RETRY_BACKOFF = float(os.environ.get("GEMINI_RETRY_BACKOFF", 1.5))
+GEMINI_ASYNC_POOL_SIZE = int(os.environ.get("GEMINI_ASYNC_POOL_SIZE", 200))
+# Point at a local stub server for load tests.
+GEMINI_BASE_URL = os.environ.get("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1beta/models")
+# Per-key token bucket (backend/ratelimit.py): requests per minute, burst,
+# the rate a key may be throttled down to after 429s, and the longest a
+# call may queue for its key before it is shed.
+GEMINI_KEY_RPM = float(os.environ.get("GEMINI_KEY_RPM", 60))
+GEMINI_KEY_BURST = int(os.environ.get("GEMINI_KEY_BURST", 10))
+GEMINI_KEY_MIN_RPM = float(os.environ.get("GEMINI_KEY_MIN_RPM", 2))
+GEMINI_KEY_MAX_WAIT = float(os.environ.get("GEMINI_KEY_MAX_WAIT", 30))
+# Calls in flight per API key for batch fan-out (backend.gemini.key_slot).
+GEMINI_PER_KEY_CONCURRENCY = int(os.environ.get("GEMINI_PER_KEY_CONCURRENCY", 4))
+# Exact-match response cache (backend/response_cache.py); only the
+# endpoints listed here are cached.
+GEMINI_CACHE_ENDPOINTS = {
+    name.strip()
+    for name in os.environ.get("GEMINI_CACHE_ENDPOINTS", "cold_mail,cold_dm,cover_letter").split(",")
+    if name.strip()
+}
+GEMINI_CACHE_TTL = int(os.environ.get("GEMINI_CACHE_TTL", 3600))
+GEMINI_CACHE_MAX_ENTRIES = int(os.environ.get("GEMINI_CACHE_MAX_ENTRIES", 1000))
+
+# ASYNC VIEWS
+# backend/asgi.py turns this on so the LLM-bound views run as coroutines;
+# WSGI deployments keep the blocking views.
+ASYNC_VIEWS = os.environ.get("DJANGO_ASYNC_VIEWS", "0") == "1"
+
+# PDF CACHE
+# Compiled resumes keyed by the hash of their cleaned LaTeX (resume/pdf_cache.py).
+PDF_CACHE_FOLDER = os.path.join(MEDIA_ROOT, "pdf_cache")
+PDF_CACHE_MAX_BYTES = int(os.environ.get("PDF_CACHE_MAX_BYTES", 500 * 1024 * 1024))
+
+# RESUME ARTIFACTS
+# Generated .tex files (resume/artifacts.py). ARTIFACT_BACKEND is "local"
+# (sharded by hash under ARTIFACT_FOLDER) or "gridfs" (a bucket in the app
+# database, so every node can serve every resume); with GridFS each node
+# keeps a read-through copy under ARTIFACT_CACHE_FOLDER, trimmed to
+# ARTIFACT_CACHE_MAX_BYTES (0 = no cache) on each GC pass. The GC runs
+# at most every ARTIFACT_GC_INTERVAL seconds (sooner when over the byte
+# quota), in one process per store at a time, and drops files without a resume record, files older than the
+# retention and the oldest files beyond ARTIFACT_MAX_BYTES; dropped files
+# are rebuilt from their record when requested again.
+ARTIFACT_BACKEND = os.environ.get("ARTIFACT_BACKEND", "local")
+ARTIFACT_FOLDER = os.path.join(MEDIA_ROOT, "artifacts")
+ARTIFACT_GRIDFS_BUCKET = os.environ.get("ARTIFACT_GRIDFS_BUCKET", "resume_artifacts")
+ARTIFACT_CACHE_FOLDER = os.path.join(MEDIA_ROOT, "artifact_cache")
+ARTIFACT_CACHE_MAX_BYTES = int(os.environ.get("ARTIFACT_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+ARTIFACT_CHUNK_SIZE = int(os.environ.get("ARTIFACT_CHUNK_SIZE", 64 * 1024))
+ARTIFACT_MAX_BYTES = int(os.environ.get("ARTIFACT_MAX_BYTES", 1024 * 1024 * 1024))
+ARTIFACT_RETENTION_DAYS = int(os.environ.get("ARTIFACT_RETENTION_DAYS", 30))
+ARTIFACT_GC_INTERVAL = int(os.environ.get("ARTIFACT_GC_INTERVAL", 3600))
+
+# LATEX COMPILE ENGINE
+# Precompiled preamble formats and warm pdflatex workers (resume/latex_engine.py).
+LATEX_FORMAT_FOLDER = os.path.join(MEDIA_ROOT, "latex_formats")
+LATEX_WARM_WORKERS = int(os.environ.get("LATEX_WARM_WORKERS", 2))
+LATEX_MAX_WARM_FORMATS = int(os.environ.get("LATEX_MAX_WARM_FORMATS", 8))
+# Idle warm workers across all formats.
+LATEX_MAX_IDLE_WORKERS = int(os.environ.get("LATEX_MAX_IDLE_WORKERS", 4))
+LATEX_COMPILE_TIMEOUT = int(os.environ.get("LATEX_COMPILE_TIMEOUT", 60))
+# 0 = one concurrent compile per CPU / a wait queue twice that size.
+LATEX_MAX_CONCURRENT = int(os.environ.get("LATEX_MAX_CONCURRENT", 0))
+LATEX_MAX_QUEUE = int(os.environ.get("LATEX_MAX_QUEUE", 0))
+
+# RESUME TEMPLATES
+# Uploaded templates (resume/template_registry.py), stored once per content
+# hash. Lookups are cached per process for TEMPLATE_CACHE_TTL seconds.
+TEMPLATE_MAX_BYTES = int(os.environ.get("TEMPLATE_MAX_BYTES", 200 * 1024))
+TEMPLATE_CACHE_TTL = int(os.environ.get("TEMPLATE_CACHE_TTL", 300))
+TEMPLATE_CACHE_MAX_ENTRIES = int(os.environ.get("TEMPLATE_CACHE_MAX_ENTRIES", 256))
+
+# RESUME JOB QUEUE
+# Background generate/enhance jobs, run by `manage.py resume_worker`.
+RESUME_JOB_LEASE_SECONDS = int(os.environ.get("RESUME_JOB_LEASE_SECONDS", 300))
+RESUME_JOB_MAX_ATTEMPTS = int(os.environ.get("RESUME_JOB_MAX_ATTEMPTS", 3))
+RESUME_JOB_POLL_SECONDS = float(os.environ.get("RESUME_JOB_POLL_SECONDS", 1.0))
+
+# PREP HUB CACHE
+# Per-company results (resume/prep_hub_cache.py). Entries older than the TTL
+# are still served but refreshed in the background until MAX_STALE.
+PREP_HUB_CACHE_TTL = int(os.environ.get("PREP_HUB_CACHE_TTL", 7 * 24 * 3600))
+PREP_HUB_CACHE_MAX_STALE = int(os.environ.get("PREP_HUB_CACHE_MAX_STALE", 30 * 24 * 3600))
+
+# RESUME TEXT CACHE
+# Extracted text of uploaded resume PDFs keyed by file hash (coldconnect/resume_text.py).
+RESUME_TEXT_TTL = int(os.environ.get("RESUME_TEXT_TTL", 30 * 24 * 3600))
+RESUME_TEXT_LOCAL_ENTRIES = int(os.environ.get("RESUME_TEXT_LOCAL_ENTRIES", 256))
+
+# UPLOADS
+# Every uploaded file is spooled to disk and refused with 413 past
+# UPLOAD_MAX_BYTES (backend/uploads.py).
+UPLOAD_MAX_BYTES = int(os.environ.get("UPLOAD_MAX_BYTES", 10 * 1024 * 1024))
+FILE_UPLOAD_HANDLERS = ["backend.uploads.SpooledUploadHandler"]
+
+# RESUME TEXT EXTRACTION
+# Resume PDFs are read page by page in a child process (coldconnect/pdf_extract.py)
+# that stops after MAX_CHARS or MAX_PAGES, is killed after TIMEOUT seconds
+# and may use at most MAX_MEMORY_MB of address space (0 = no cap).
+RESUME_TEXT_MAX_CHARS = int(os.environ.get("RESUME_TEXT_MAX_CHARS", 50000))
+RESUME_TEXT_MAX_PAGES = int(os.environ.get("RESUME_TEXT_MAX_PAGES", 20))
+RESUME_TEXT_TIMEOUT = int(os.environ.get("RESUME_TEXT_TIMEOUT", 20))
+RESUME_TEXT_MAX_MEMORY_MB = int(os.environ.get("RESUME_TEXT_MAX_MEMORY_MB", 512))
+
+# RESUME HISTORY
+# How many recent resume summaries /user/profile/ includes.
+PROFILE_RECENT_RESUMES = int(os.environ.get("PROFILE_RECENT_RESUMES", 20))
+
+# MONGODB CLIENT
+# One pooled client per process, shared by every app (backend/mongo.py).
+MONGO_MAX_POOL_SIZE = int(os.environ.get("MONGO_MAX_POOL_SIZE", 50))
+MONGO_MIN_POOL_SIZE = int(os.environ.get("MONGO_MIN_POOL_SIZE", 0))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000))
+
+# SESSION USER CACHE
+# Per-process cache behind users.decorators.user_required (users/store.py).
+USER_CACHE_TTL = float(os.environ.get("USER_CACHE_TTL", 10))
+USER_CACHE_MAX_ENTRIES = int(os.environ.get("USER_CACHE_MAX_ENTRIES", 10000))
+
+# PASSWORD HASHING
+# bcrypt cost and the thread pool it runs on (users/passwords.py).
+# Changing BCRYPT_ROUNDS re-hashes each password on its next login.
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", 12))
+# 0 = half the CPUs / a wait queue four times that size.
+BCRYPT_MAX_CONCURRENT = int(os.environ.get("BCRYPT_MAX_CONCURRENT", 0))
+BCRYPT_MAX_QUEUE = int(os.environ.get("BCRYPT_MAX_QUEUE", 0))
+
+# RESUME BATCH
+# Most job descriptions accepted by one /resume/generate/batch/ call.
+RESUME_BATCH_MAX_ITEMS = int(os.environ.get("RESUME_BATCH_MAX_ITEMS", 50))
+
+# COLDCONNECT BULK OUTREACH
+# Most rows accepted by one /coldconnect/bulk/ call.
+COLDCONNECT_BULK_MAX_ROWS = int(os.environ.get("COLDCONNECT_BULK_MAX_ROWS", 200))
+
+# PROMPT BUDGETS
+# Estimated-token budgets per endpoint (backend/prompts.py). Inputs beyond
+# the budget are trimmed, least valuable first; templates and LaTeX sources
+# are never cut.
+PROMPT_CHARS_PER_TOKEN = int(os.environ.get("PROMPT_CHARS_PER_TOKEN", 4))
+PROMPT_DEFAULT_BUDGET = int(os.environ.get("PROMPT_DEFAULT_BUDGET", 8000))
+PROMPT_BUDGETS = {
+    "resume_generate": int(os.environ.get("PROMPT_BUDGET_RESUME_GENERATE", 12000)),
+    "resume_enhance": int(os.environ.get("PROMPT_BUDGET_RESUME_ENHANCE", 12000)),
+    "cold_mail": int(os.environ.get("PROMPT_BUDGET_COLD_MAIL", 4000)),
+    "cold_dm": int(os.environ.get("PROMPT_BUDGET_COLD_DM", 3000)),
+    "cover_letter": int(os.environ.get("PROMPT_BUDGET_COVER_LETTER", 5000)),
+}
+
+# LOGGING
+# Prompt / response sizes of every Gemini call, prompt trimming notes and
+# resume PDF extractions (pages, time, peak memory).
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "backend": {
+            "handlers": ["console"],
+            "level": os.environ.get("BACKEND_LOG_LEVEL", "INFO"),
+        },
+        "coldconnect": {
+            "handlers": ["console"],
+            "level": os.environ.get("BACKEND_LOG_LEVEL", "INFO"),
+        },
+    },
+}
+
+# METRICS
+# Stage timings per endpoint are served at /metrics (backend/timing.py);
+# set SERVER_TIMING_HEADER=1 to also send them as a Server-Timing header.
+# /metrics and the */stats/ endpoints need `Authorization: Bearer
+# <METRICS_TOKEN>`; they are closed while METRICS_TOKEN is unset.
+SERVER_TIMING_HEADER = os.environ.get("SERVER_TIMING_HEADER", "0") == "1"
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
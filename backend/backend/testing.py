@@ -0,0 +1,18 @@
+"""
+Helpers for the apps' test suites.
+
+``use_mongomock`` swaps the shared Mongo client (backend/mongo.py) for an
+in-memory mongomock client for the duration of one test.
+"""
+
+import mongomock
+
+from . import mongo
+
+
+def use_mongomock(test):
+    """Point every ``collection()`` at a fresh in-memory database until ``test`` ends."""
+    previous = mongo._client
+    mongo._client = mongomock.MongoClient()
+    test.addCleanup(setattr, mongo, "_client", previous)
+    return mongo._client
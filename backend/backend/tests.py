@@ -0,0 +1,238 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.test import SimpleTestCase, RequestFactory, override_settings
+
+from . import prompts, views
+from .timing import RequestTimings, _current, span, propagate
+from .gemini import call_gemini
+from .gemini_stub import GeminiStub
+from .ratelimit import TokenBucket, RateLimited, key_limiter, rate_limited_response
+
+
+# ============================================================
+#  Prompt Budgeting
+# ============================================================
+
+PROFILE = {
+    "name": "Ada",
+    "summary": "",
+    "skills": ["Python", "", "Go"],
+    "experience": [{"company": "Acme", "description": "Built APIs. " * 80}],
+    "projects": [{"name": f"P{n}", "description": "Side project. " * 20} for n in range(5)],
+    "certifications": [f"Cert {n}" for n in range(5)],
+}
+
+
+@override_settings(PROMPT_CHARS_PER_TOKEN=4)
+class FitProfileTests(SimpleTestCase):
+
+    def test_fits_untouched_apart_from_empty_fields(self):
+        data = json.loads(prompts.fit_profile(PROFILE))
+
+        self.assertNotIn("summary", data)
+        self.assertEqual(data["skills"], ["Python", "Go"])
+        self.assertEqual(len(data["projects"]), 5)
+
+    def test_low_value_sections_are_cut_to_two_first(self):
+        full = prompts.estimate_tokens(prompts.fit_profile(PROFILE))
+        data = json.loads(prompts.fit_profile(PROFILE, full - 50))
+
+        self.assertEqual(len(data["projects"]), 2)
+        self.assertEqual(data["certifications"], ["Cert 0", "Cert 1"])
+        self.assertEqual(data["experience"][0]["description"], PROFILE["experience"][0]["description"].strip())
+
+    def test_long_descriptions_are_shortened_next(self):
+        text = prompts.fit_profile(PROFILE, 200)
+        data = json.loads(text)
+
+        self.assertLessEqual(prompts.estimate_tokens(text), 200)
+        self.assertTrue(data["experience"][0]["description"].endswith(prompts.TRIMMED_MARKER))
+        self.assertEqual(data["name"], "Ada")
+
+    def test_low_value_sections_go_last(self):
+        data = json.loads(prompts.fit_profile(PROFILE, 60))
+
+        self.assertNotIn("projects", data)
+        self.assertNotIn("certifications", data)
+        self.assertIn("experience", data)
+
+
+@override_settings(PROMPT_CHARS_PER_TOKEN=4)
+class FitTextTests(SimpleTestCase):
+
+    def test_collapses_whitespace(self):
+        self.assertEqual(prompts.fit_text("a   b \n\n\n\n c"), "a b\n\nc")
+
+    def test_cuts_at_a_word_boundary(self):
+        text = prompts.fit_text("word " * 100, 10)
+
+        self.assertLessEqual(prompts.estimate_tokens(text), 10)
+        self.assertTrue(text.endswith("word" + prompts.TRIMMED_MARKER))
+
+
+# ============================================================
+#  Per-Key Rate Limiting
+# ============================================================
+
+@override_settings(GEMINI_KEY_RPM=60, GEMINI_KEY_MIN_RPM=2)
+class TokenBucketTests(SimpleTestCase):
+
+    def test_burst_then_waits_at_the_refill_rate(self):
+        bucket = TokenBucket(rpm=60, burst=2)
+        now = bucket.updated
+
+        self.assertEqual(bucket.reserve(now, 30), 0)
+        self.assertEqual(bucket.reserve(now, 30), 0)
+        self.assertAlmostEqual(bucket.reserve(now, 30), 1.0)
+        self.assertAlmostEqual(bucket.reserve(now, 30), 2.0)
+        self.assertEqual(bucket.snapshot(now)["waited"], 2)
+
+    def test_wait_past_max_wait_is_shed(self):
+        bucket = TokenBucket(rpm=60, burst=1)
+        now = bucket.updated
+        bucket.reserve(now, 30)
+
+        with self.assertRaises(RateLimited) as ctx:
+            bucket.reserve(now, 0.5)
+        self.assertAlmostEqual(ctx.exception.retry_after, 1.0)
+
+        # The shed call gave its token back.
+        self.assertAlmostEqual(bucket.reserve(now, 30), 1.0)
+        self.assertEqual(bucket.snapshot(now)["shed"], 1)
+
+    def test_throttled_halves_the_rate_and_blocks_the_key(self):
+        bucket = TokenBucket(rpm=60, burst=5)
+        now = bucket.updated
+
+        bucket.throttled(now, 10)
+
+        self.assertEqual(bucket.rpm, 30)
+        self.assertAlmostEqual(bucket.reserve(now, 30), 10.0)
+        with self.assertRaises(RateLimited):
+            bucket.reserve(now, 5)
+
+    def test_rate_never_drops_below_the_floor(self):
+        bucket = TokenBucket(rpm=3, burst=1)
+
+        bucket.throttled(bucket.updated, 1)
+        bucket.throttled(bucket.updated, 1)
+
+        self.assertEqual(bucket.rpm, 2)
+
+    def test_successes_recover_the_rate_up_to_the_limit(self):
+        bucket = TokenBucket(rpm=60, burst=1)
+        bucket.throttled(bucket.updated, 1)
+
+        for _ in range(29):
+            bucket.succeeded()
+        self.assertEqual(bucket.rpm, 59)
+        bucket.succeeded()
+        bucket.succeeded()
+        self.assertEqual(bucket.rpm, 60)
+
+    def test_shed_call_answers_429_with_retry_after(self):
+        response = rate_limited_response(RateLimited(4.2))
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "5")
+        self.assertEqual(json.loads(response.content)["retry_after"], 5)
+
+
+@override_settings(GEMINI_KEY_RPM=6000, GEMINI_KEY_BURST=10, GEMINI_KEY_MAX_WAIT=5, GEMINI_MAX_RETRIES=2)
+class GeminiThrottlingTests(SimpleTestCase):
+    """call_gemini against the local stub answering 429s."""
+
+    def setUp(self):
+        self.stub = GeminiStub(latency=0, jitter=0, payload_chars=100).start()
+        self.addCleanup(self.stub.stop)
+        override = override_settings(GEMINI_BASE_URL=self.stub.base_url)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.api_key = f"key-{self.id()}"
+        self.payload = {"contents": [{"parts": [{"text": "Write a note"}]}]}
+
+    def budget(self):
+        return key_limiter.budget(self.api_key)
+
+    def test_retries_after_a_short_429(self):
+        self.stub.throttle(1, retry_after=0)
+
+        data = call_gemini(self.api_key, self.payload)
+
+        self.assertIn("candidates", data)
+        self.assertEqual(self.stub.stats["requests"], 2)
+        self.assertEqual(self.budget()["throttled"], 1)
+        # Halved by the 429, then one step back up by the success.
+        self.assertEqual(self.budget()["rpm"], 3001)
+
+    def test_retry_after_past_max_wait_is_shed_without_calling_gemini(self):
+        self.stub.throttle(1, retry_after=60)
+
+        with self.assertRaises(RateLimited) as ctx:
+            call_gemini(self.api_key, self.payload)
+
+        self.assertGreater(ctx.exception.retry_after, 55)
+        self.assertEqual(self.stub.stats["requests"], 1)
+        self.assertEqual(self.budget()["shed"], 1)
+
+
+# ============================================================
+#  Stage Timings
+# ============================================================
+
+class RequestTimingsTests(SimpleTestCase):
+
+    def test_sequential_spans_add_up(self):
+        timings = RequestTimings()
+        timings.add("mongo", 1.0, end=11.0)
+        timings.add("mongo", 2.0, end=14.0)
+
+        self.assertAlmostEqual(timings.snapshot()["mongo"], 3.0)
+
+    def test_overlapping_spans_count_once(self):
+        timings = RequestTimings()
+        timings.add("gemini", 2.0, end=12.0)   # 10-12
+        timings.add("gemini", 2.0, end=13.0)   # 11-13
+        timings.add("gemini", 0.5, end=12.5)   # inside both
+        timings.add("gemini", 1.0, end=20.0)   # 19-20
+
+        self.assertAlmostEqual(timings.snapshot()["gemini"], 4.0)
+
+    def test_parallel_work_is_reported_at_wall_clock_time(self):
+        timings = RequestTimings()
+        token = _current.set(timings)
+        self.addCleanup(_current.reset, token)
+
+        def call(_):
+            with span("gemini"):
+                time.sleep(0.1)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            list(pool.map(propagate(call), range(4)))
+        wall = time.perf_counter() - started
+
+        self.assertGreaterEqual(timings.snapshot()["gemini"], 0.1)
+        self.assertLessEqual(timings.snapshot()["gemini"], wall)
+
+
+# ============================================================
+#  Operational Endpoints
+# ============================================================
+
+class MetricsAccessTests(SimpleTestCase):
+
+    def get(self, **headers):
+        return views.metrics(RequestFactory().get("/metrics", **headers))
+
+    @override_settings(METRICS_TOKEN="")
+    def test_closed_without_a_configured_token(self):
+        self.assertEqual(self.get(HTTP_AUTHORIZATION="Bearer ").status_code, 403)
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_needs_the_token(self):
+        self.assertEqual(self.get().status_code, 401)
+        self.assertEqual(self.get(HTTP_AUTHORIZATION="Bearer wrong").status_code, 401)
+        self.assertEqual(self.get(HTTP_AUTHORIZATION="Bearer secret").status_code, 200)
@@ -0,0 +1,254 @@
+"""
+Stage-level latency instrumentation.
+
+Code wraps the slow parts of a request in ``span(stage)``::
+
+    with timing.span("file_io"):
+        ...
+
+Stages used in this project: ``mongo`` (every Mongo command, through a
+pymongo command listener), ``gemini`` (every attempt, through the Gemini
+timing hooks), ``pdf_extract``, ``pdflatex``, ``compile_queue`` and
+``file_io``. Spans are collected per request through a context variable,
+so they follow the request into ``asyncio.to_thread``; code that fans out
+on its own thread pool wraps the task with ``propagate``. Spans of one
+stage that overlap, such as the parallel Gemini calls of a batch, are
+counted once: a stage reports the wall-clock time it was active, never
+more than the request took.
+
+``TimingMiddleware`` turns each request's spans into per-endpoint
+Prometheus histograms (served by ``/metrics``) and, with
+SERVER_TIMING_HEADER on, a Server-Timing response header. Time not
+covered by any span is reported as the ``other`` stage. For streamed
+responses only the work done before the first byte is counted.
+"""
+
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from pymongo import monitoring
+
+
+# Upper bounds in seconds; Prometheus adds +Inf.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+# ============================================================
+#  Histograms
+# ============================================================
+
+class Histogram:
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.count += 1
+        self.sum += seconds
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+
+
+class Registry:
+    """Histograms keyed by metric name and label values."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}   # name -> (help, {labels tuple: Histogram})
+
+    def observe(self, name, help_text, labels, seconds):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            _, series = self._metrics.setdefault(name, (help_text, {}))
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(seconds)
+
+    def render(self):
+        """Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name, (help_text, series) in sorted(self._metrics.items()):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, histogram in sorted(series.items()):
+                    labels = ",".join(f'{k}="{_escape(v)}"' for k, v in key)
+                    sep = "," if labels else ""
+                    cumulative = 0
+                    for bound, count in zip(BUCKETS, histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{{labels}{sep}le="{bound}"}} {cumulative}')
+                    lines.append(f'{name}_bucket{{{labels}{sep}le="+Inf"}} {histogram.count}')
+                    lines.append(f"{name}_sum{{{labels}}} {histogram.sum:.6f}")
+                    lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registry = Registry()
+
+
+# ============================================================
+#  Spans
+# ============================================================
+
+class RequestTimings:
+    """Seconds spent per stage during one request."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages = {}   # stage -> [(start, end)]
+
+    def add(self, stage, seconds, end=None):
+        """Record a span of ``stage`` that lasted ``seconds`` and ended at ``end`` (default: now)."""
+        if end is None:
+            end = time.perf_counter()
+        with self._lock:
+            self.stages.setdefault(stage, []).append((end - seconds, end))
+
+    def snapshot(self):
+        """Wall-clock seconds per stage; overlapping spans count once."""
+        with self._lock:
+            stages = {stage: sorted(spans) for stage, spans in self.stages.items()}
+        totals = {}
+        for stage, spans in stages.items():
+            total = 0.0
+            covered = float("-inf")
+            for start, end in spans:
+                start = max(start, covered)
+                if end > start:
+                    total += end - start
+                    covered = end
+            totals[stage] = total
+        return totals
+
+
+_current = contextvars.ContextVar("request_timings", default=None)
+
+
+def record(stage, seconds):
+    """Add ``seconds`` to ``stage`` of the current request, if there is one."""
+    timings = _current.get()
+    if timings is not None:
+        timings.add(stage, seconds)
+
+
+@contextmanager
+def span(stage):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - started)
+
+
+def propagate(fn):
+    """Wrap ``fn`` so it records into the calling request when run on another thread."""
+    timings = _current.get()
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        token = _current.set(timings)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current.reset(token)
+
+    return wrapper
+
+
+# ============================================================
+#  Sources
+# ============================================================
+
+class MongoTimingListener(monitoring.CommandListener):
+    """Record every Mongo command under the ``mongo`` stage."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        record("mongo", event.duration_micros / 1e6)
+
+    def failed(self, event):
+        record("mongo", event.duration_micros / 1e6)
+
+
+def gemini_timing_hook(event):
+    record("gemini", event["elapsed"])
+
+
+# ============================================================
+#  Middleware
+# ============================================================
+
+class TimingMiddleware:
+    """Aggregate request and stage durations per endpoint (URL route)."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = RequestTimings()
+        token = _current.set(timings)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, timings, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        timings = RequestTimings()
+        token = _current.set(timings)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, timings, time.perf_counter() - started)
+
+    def _finish(self, request, response, timings, total):
+        match = getattr(request, "resolver_match", None)
+        endpoint = f"/{match.route}" if match and match.route else "unmatched"
+        if endpoint == "/metrics":
+            return response
+
+        stages = timings.snapshot()
+        stages["other"] = max(0.0, total - sum(stages.values()))
+
+        registry.observe(
+            "jobplanet_request_duration_seconds", "Time until the response is returned, per endpoint.",
+            {"endpoint": endpoint, "method": request.method, "status": str(response.status_code)}, total,
+        )
+        for stage, seconds in stages.items():
+            registry.observe(
+                "jobplanet_stage_duration_seconds", "Time spent per stage of a request, per endpoint.",
+                {"endpoint": endpoint, "stage": stage}, seconds,
+            )
+
+        if settings.SERVER_TIMING_HEADER:
+            parts = [f"{stage};dur={1000 * seconds:.1f}" for stage, seconds in stages.items()]
+            parts.append(f"total;dur={1000 * total:.1f}")
+            response["Server-Timing"] = ", ".join(parts)
+        return response
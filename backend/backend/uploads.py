@@ -0,0 +1,37 @@
+"""
+Upload handling shared by every app.
+
+SpooledUploadHandler replaces Django's default pair of handlers (see
+FILE_UPLOAD_HANDLERS): every file is written straight to a temporary
+file, so an upload never sits whole in a worker's memory, and a file
+past UPLOAD_MAX_BYTES stops the upload right there. Views call
+``rejected_upload`` to answer 413 instead of treating the file as missing.
+"""
+
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler, StopUpload
+from django.http import JsonResponse
+
+
+class SpooledUploadHandler(TemporaryFileUploadHandler):
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > settings.UPLOAD_MAX_BYTES:
+            self.request.upload_rejected = f"{self.file_name} is larger than {settings.UPLOAD_MAX_BYTES} bytes"
+            self.upload_interrupted()
+            # Stop without reading the rest of the body.
+            raise StopUpload(connection_reset=True)
+        return super().receive_data_chunk(raw_data, start)
+
+
+def rejected_upload(request):
+    """A 413 response if the upload handler refused a file of this request, else None.
+
+    Check this before other form fields: the upload stops at the oversize
+    file, so fields sent after it are missing.
+    """
+    request.FILES  # parses the body
+    reason = getattr(request, "upload_rejected", None)
+    if reason is None:
+        return None
+    return JsonResponse({"error": reason}, status=413)
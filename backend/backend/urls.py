@@ -3,6 +3,8 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from . import views
+
 urlpatterns = [
     path('admin/', admin.site.urls),
 
@@ -10,6 +12,12 @@ urlpatterns = [
     path('user/', include('users.urls')),
     path('resume/', include('resume.urls')),
     path('coldconnect/', include('coldconnect.urls')),
+
+    # Shared Gemini client
+    path('gemini/cache/stats/', views.gemini_cache_stats),
+
+    # Prometheus scrape target
+    path('metrics', views.metrics),
 ]
 
 # serve media files
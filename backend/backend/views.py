@@ -0,0 +1,20 @@
+from django.http import JsonResponse, HttpResponse
+from django.views.decorators.http import require_http_methods
+
+from .decorators import metrics_required
+from .response_cache import response_cache
+from .timing import registry
+
+
+@require_http_methods(["GET"])
+@metrics_required
+def gemini_cache_stats(request):
+    """Hit ratios of the Gemini response cache, overall and per endpoint."""
+    return JsonResponse({"success": True, "gemini_cache": response_cache.snapshot()})
+
+
+@require_http_methods(["GET"])
+@metrics_required
+def metrics(request):
+    """Request and stage latency histograms in Prometheus text format."""
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
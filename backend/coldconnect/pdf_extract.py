@@ -0,0 +1,59 @@
+"""
+Page-by-page PDF text extraction, run in a child process by
+coldconnect/resume_text.py:
+
+    python -m coldconnect.pdf_extract <path> <max_chars> <max_pages> <max_memory_mb>
+
+The PDF is read from disk as pages are needed rather than loaded whole,
+and reading stops once ``max_chars`` characters or ``max_pages`` pages
+are in. Prints one JSON object: text, pages read, pages in the file,
+whether the text was cut short and the process's peak RSS in KB.
+Django is not imported so the child starts quickly.
+"""
+
+import sys
+import json
+
+from PyPDF2 import PdfReader
+
+try:
+    import resource
+except ImportError:  # Windows: no memory cap or RSS figure
+    resource = None
+
+
+def extract(path, max_chars, max_pages):
+    parts = []
+    chars = 0
+    with open(path, "rb") as fh:
+        reader = PdfReader(fh)
+        total = len(reader.pages)
+        for page in reader.pages:
+            if chars >= max_chars or len(parts) >= max_pages:
+                break
+            text = page.extract_text() or ""
+            parts.append(text)
+            chars += len(text) + 1
+
+    text = "\n".join(parts).strip()
+    return {
+        "text": text[:max_chars],
+        "pages": len(parts),
+        "pages_total": total,
+        "truncated": len(parts) < total or len(text) > max_chars,
+    }
+
+
+def main(argv):
+    path, max_chars, max_pages, max_memory_mb = argv[1], int(argv[2]), int(argv[3]), int(argv[4])
+    if resource and max_memory_mb > 0:
+        limit = max_memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    result = extract(path, max_chars, max_pages)
+    result["peak_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else None
+    json.dump(result, sys.stdout)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,261 @@
+"""
+Extracted resume text, cached by the SHA-256 of the uploaded PDF.
+
+Users upload the same resume to every coldconnect endpoint, so the PyPDF2
+parse only happens the first time a given file is seen. Texts live in a
+small in-process LRU in front of the ``resume_texts`` collection. Unpinned
+entries expire after RESUME_TEXT_TTL of not being used; a user's saved
+"current resume" is pinned so it never expires. Pins are kept per user
+(``pinned_by``), and a text nobody pins any more starts expiring again.
+
+Uploads are hashed chunk by chunk and parsed from disk in a child process
+(coldconnect/pdf_extract.py), so a large or hostile PDF is bounded by
+RESUME_TEXT_TIMEOUT and RESUME_TEXT_MAX_MEMORY_MB and never grows the
+worker itself.
+"""
+
+import sys
+import json
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+import subprocess
+from contextlib import contextmanager
+from collections import OrderedDict, deque
+from datetime import datetime
+
+from django.conf import settings
+from pymongo import ASCENDING
+
+from backend.mongo import collection
+from backend.timing import span
+
+
+logger = logging.getLogger("coldconnect.resume_text")
+
+
+def texts():
+    return collection("resume_texts")
+
+
+class PdfExtractError(Exception):
+    """The PDF could not be read within the extraction limits; ``status`` is the HTTP status to answer with."""
+
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+
+def extract_pdf_text(path):
+    """Extract plain text from the PDF at ``path``; return (text, info).
+
+    ``info`` has the pages read and in the file, whether the text was cut
+    short at RESUME_TEXT_MAX_CHARS / RESUME_TEXT_MAX_PAGES and the child
+    process's peak RSS in KB.
+    """
+    cmd = [
+        sys.executable, "-m", "coldconnect.pdf_extract", path,
+        str(settings.RESUME_TEXT_MAX_CHARS),
+        str(settings.RESUME_TEXT_MAX_PAGES),
+        str(settings.RESUME_TEXT_MAX_MEMORY_MB),
+    ]
+    with span("pdf_extract"):
+        try:
+            proc = subprocess.run(
+                cmd, cwd=settings.BASE_DIR, capture_output=True, timeout=settings.RESUME_TEXT_TIMEOUT,
+            )
+        except subprocess.TimeoutExpired:
+            raise PdfExtractError(f"Reading the PDF took longer than {settings.RESUME_TEXT_TIMEOUT}s", 422)
+
+    if proc.returncode != 0:
+        stderr = proc.stderr.decode("utf-8", errors="replace").strip()
+        if "MemoryError" in stderr:
+            raise PdfExtractError(
+                f"Reading the PDF needs more than {settings.RESUME_TEXT_MAX_MEMORY_MB} MB", 413
+            )
+        reason = stderr.splitlines()[-1] if stderr else f"exit code {proc.returncode}"
+        raise PdfExtractError(f"Could not read the PDF: {reason}", 400)
+
+    info = json.loads(proc.stdout)
+    return info.pop("text"), info
+
+
+@contextmanager
+def on_disk(file_obj):
+    """Path of an uploaded file, spooling it to a temporary file if it is held in memory."""
+    if hasattr(file_obj, "temporary_file_path"):
+        yield file_obj.temporary_file_path()
+        return
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as tmp:
+        for chunk in file_obj.chunks():
+            tmp.write(chunk)
+        tmp.flush()
+        yield tmp.name
+
+
+class ResumeTextCache:
+
+    def __init__(self, max_local):
+        self.max_local = max_local
+        self._lock = threading.Lock()
+        self._local = OrderedDict()
+        self._parse_times = deque(maxlen=200)
+        self._peak_rss = deque(maxlen=200)
+        self._indexes_ready = False
+        self.stats = {
+            "local_hits": 0,
+            "db_hits": 0,
+            "misses": 0,
+        }
+        self.extract_stats = {
+            "truncated": 0,
+            "failed": 0,
+        }
+
+    def ensure_indexes(self):
+        if self._indexes_ready:
+            return
+        texts().create_index(
+            [("last_used", ASCENDING)],
+            expireAfterSeconds=settings.RESUME_TEXT_TTL,
+            partialFilterExpression={"pinned": False},
+        )
+        self._indexes_ready = True
+
+    def _remember(self, sha, text):
+        with self._lock:
+            self._local[sha] = text
+            self._local.move_to_end(sha)
+            while len(self._local) > self.max_local:
+                self._local.popitem(last=False)
+
+    def lookup(self, sha):
+        """Return the cached text for ``sha`` or None."""
+        with self._lock:
+            text = self._local.get(sha)
+            if text is not None:
+                self._local.move_to_end(sha)
+                self.stats["local_hits"] += 1
+                return text
+
+        doc = texts().find_one_and_update(
+            {"_id": sha},
+            {"$set": {"last_used": datetime.utcnow()}},
+            projection={"text": 1},
+        )
+        if doc is None:
+            return None
+        with self._lock:
+            self.stats["db_hits"] += 1
+        self._remember(sha, doc["text"])
+        return doc["text"]
+
+    def text_for_upload(self, file_obj, pin_for=None):
+        """Return (text, sha256) for an uploaded PDF, parsing only on a miss.
+
+        ``pin_for`` (an email) pins the text for that user. Raises
+        PdfExtractError when the PDF cannot be read within the limits.
+        """
+        digest = hashlib.sha256()
+        for chunk in file_obj.chunks():
+            digest.update(chunk)
+        sha = digest.hexdigest()
+
+        text = self.lookup(sha)
+        if text is None:
+            started = time.perf_counter()
+            try:
+                with on_disk(file_obj) as path:
+                    text, info = extract_pdf_text(path)
+            except PdfExtractError as e:
+                with self._lock:
+                    self.extract_stats["failed"] += 1
+                logger.warning("pdf_extract %s failed: %s", sha[:12], e)
+                raise
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.stats["misses"] += 1
+                self.extract_stats["truncated"] += int(info["truncated"])
+                self._parse_times.append(elapsed)
+                if info["peak_rss_kb"] is not None:
+                    self._peak_rss.append(info["peak_rss_kb"])
+            logger.info(
+                "pdf_extract %s %.2fs pages=%d/%d chars=%d truncated=%s peak_rss=%s KB",
+                sha[:12], elapsed, info["pages"], info["pages_total"], len(text),
+                info["truncated"], info["peak_rss_kb"],
+            )
+            self._remember(sha, text)
+
+            self.ensure_indexes()
+            texts().update_one(
+                {"_id": sha},
+                {
+                    "$set": {"text": text, "last_used": datetime.utcnow()},
+                    "$setOnInsert": {
+                        "pinned": False,
+                        "parse_ms": round(1000 * elapsed, 1),
+                        "pages": info["pages"],
+                        "truncated": info["truncated"],
+                        "peak_rss_kb": info["peak_rss_kb"],
+                    },
+                },
+                upsert=True,
+            )
+
+        if pin_for:
+            self.pin(sha, text, pin_for)
+        return text, sha
+
+    def pin(self, sha, text, email):
+        # Upsert: a local hit does not prove the stored copy has not expired.
+        texts().update_one(
+            {"_id": sha},
+            {
+                "$set": {"text": text, "pinned": True, "last_used": datetime.utcnow()},
+                "$addToSet": {"pinned_by": email},
+            },
+            upsert=True,
+        )
+
+    def unpin(self, email, sha=None):
+        """Drop ``email``'s pin on ``sha`` (on every text when None).
+
+        Texts left without pins fall back under RESUME_TEXT_TTL.
+        """
+        query = {"pinned_by": email}
+        unpinned = {"pinned": True, "pinned_by": {"$size": 0}}
+        if sha:
+            query["_id"] = sha
+            # Pinned before pins were tracked per user: ``email`` held it.
+            unpinned = {"_id": sha, "pinned": True, "$or": [
+                {"pinned_by": {"$size": 0}}, {"pinned_by": {"$exists": False}},
+            ]}
+        texts().update_many(query, {"$pull": {"pinned_by": email}})
+        texts().update_many(unpinned, {"$set": {"pinned": False, "last_used": datetime.utcnow()}})
+
+    def snapshot(self):
+        with self._lock:
+            parses = sorted(self._parse_times)
+            peaks = list(self._peak_rss)
+            lookups = sum(self.stats.values())
+            hits = self.stats["local_hits"] + self.stats["db_hits"]
+            return {
+                **self.stats,
+                "hit_ratio": (hits / lookups) if lookups else 0.0,
+                "local_entries": len(self._local),
+                "parse_ms": {
+                    "count": len(parses),
+                    "avg": round(1000 * sum(parses) / len(parses), 1) if parses else 0.0,
+                    "max": round(1000 * parses[-1], 1) if parses else 0.0,
+                },
+                **self.extract_stats,
+                "peak_rss_kb": {
+                    "avg": round(sum(peaks) / len(peaks)) if peaks else 0,
+                    "max": max(peaks) if peaks else 0,
+                },
+            }
+
+
+resume_text_cache = ResumeTextCache(settings.RESUME_TEXT_LOCAL_ENTRIES)
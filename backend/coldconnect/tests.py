@@ -1,3 +1,136 @@
-from django.test import TestCase
+import json
+import inspect
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, RequestFactory, override_settings
+
+from backend.testing import use_mongomock
+
+from .resume_text import ResumeTextCache, texts
+from .views import extract_gemini_response, sse_stream, cold_mail_view
+
+
+def chunk(text=None, uris=()):
+    candidate = {"content": {"parts": [] if text is None else [{"text": text}]}}
+    if uris:
+        candidate["groundingMetadata"] = {
+            "groundingAttributions": [{"web": {"title": uri.upper(), "uri": uri}} for uri in uris]
+        }
+    return {"candidates": [candidate]}
+
+
+def events(stream):
+    """[(event, data)] of an SSE stream, skipping comments."""
+    out = []
+    for raw in stream:
+        if raw.startswith(":"):
+            continue
+        head, data = raw.strip().split("\n")
+        out.append((head[len("event: "):], json.loads(data[len("data: "):])))
+    return out
+
+
+# =========================================================
+# Gemini Responses
+# =========================================================
+
+class ExtractGeminiResponseTests(SimpleTestCase):
+
+    def test_text_and_sources(self):
+        text, sources = extract_gemini_response(chunk("Hi", ["https://a"]))
+
+        self.assertEqual(text, "Hi")
+        self.assertEqual(sources, ["Source: HTTPS://A (https://a)"])
+
+    def test_chunks_without_text(self):
+        self.assertEqual(extract_gemini_response(chunk()), ("", []))
+        self.assertEqual(extract_gemini_response({"candidates": []}), ("", []))
+        self.assertEqual(extract_gemini_response({}), ("", []))
+
+
+# =========================================================
+# Streaming
+# =========================================================
+
+class SseStreamTests(SimpleTestCase):
+
+    def test_cold_mail_subject_then_body(self):
+        stream = sse_stream(iter([chunk("Subject: Hel"), chunk("lo\n\nDear"), chunk(" team")]), "cold_mail")
+        result = events(stream)
+
+        self.assertEqual(result[0], ("subject", {"subject": "Hello"}))
+        self.assertEqual("".join(d["text"] for e, d in result if e == "delta"), "Dear team")
+        self.assertEqual(result[-1][1]["body"], "Dear team")
+
+    def test_empty_parts_chunk_does_not_break_the_stream(self):
+        result = events(sse_stream(iter([chunk("Hi"), chunk()]), "cold_dm"))
+
+        self.assertEqual(result[-1], ("done", {"success": True, "message": "Hi", "sources": []}))
+
+    def test_sources_repeated_across_chunks_are_listed_once(self):
+        chunks = [chunk("a", ["https://x"]), chunk("b", ["https://x", "https://y"])]
+        done = events(sse_stream(iter(chunks), "cover_letter"))[-1][1]
+
+        self.assertEqual(done["sources"], ["Source: HTTPS://X (https://x)", "Source: HTTPS://Y (https://y)"])
+
+
+# =========================================================
+# Saved Resume Pins
+# =========================================================
+
+class ResumeTextPinTests(SimpleTestCase):
+
+    def setUp(self):
+        use_mongomock(self)
+        self.cache = ResumeTextCache(max_local=8)
+
+    def pinned(self, sha):
+        return texts().find_one({"_id": sha})["pinned"]
+
+    def test_text_stays_pinned_while_any_user_holds_it(self):
+        self.cache.pin("a", "text", "u1@x.com")
+        self.cache.pin("a", "text", "u2@x.com")
+
+        self.cache.unpin("u1@x.com", "a")
+        self.assertTrue(self.pinned("a"))
+
+        self.cache.unpin("u2@x.com", "a")
+        self.assertFalse(self.pinned("a"))
+
+    def test_unpin_without_sha_releases_every_pin_of_the_user(self):
+        self.cache.pin("a", "text", "u1@x.com")
+        self.cache.pin("b", "text", "u1@x.com")
+        self.cache.pin("b", "text", "u2@x.com")
+
+        self.cache.unpin("u1@x.com")
+
+        self.assertFalse(self.pinned("a"))
+        self.assertTrue(self.pinned("b"))
+
+    def test_legacy_pin_is_released_by_its_user(self):
+        texts().insert_one({"_id": "old", "text": "t", "pinned": True})
+
+        self.cache.unpin("u1@x.com", "old")
+
+        self.assertFalse(self.pinned("old"))
+
+
+# =========================================================
+# Oversize Uploads
+# =========================================================
+
+@override_settings(UPLOAD_MAX_BYTES=1024)
+class OversizeUploadTests(SimpleTestCase):
+
+    def test_reported_before_the_fields_it_cut_off(self):
+        request = RequestFactory().post("/coldconnect/cold-mail/", {
+            "resume_file": SimpleUploadedFile("resume.pdf", b"x" * 4096, content_type="application/pdf"),
+            "job_description": "Backend engineer",
+            "company_name": "Acme",
+            "tone": "professional",
+        })
+        request.app_user = {"email": "a@x.com", "gemini_key": "key"}
+
+        response = inspect.unwrap(cold_mail_view)(request)
+
+        self.assertEqual(response.status_code, 413)
@@ -1,16 +1,26 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+ASYNC = settings.ASYNC_VIEWS
+
 
 
 urlpatterns = [
     # Endpoint for generating a Cold Email
     # Note: Using views.ViewName.as_view() for class-based views
-    path('cold-mail/', views.cold_mail_view, name='cold-mail'),
+    path('cold-mail/', views.cold_mail_view_async if ASYNC else views.cold_mail_view, name='cold-mail'),
     
     # Endpoint for generating a Cold DM/Connection Message
-    path('cold-dm/', views.cold_dm_view, name='cold-dm'),
+    path('cold-dm/', views.cold_dm_view_async if ASYNC else views.cold_dm_view, name='cold-dm'),
     
     # Endpoint for generating a Cover Letter
-    path('cover-letter/', views.cover_letter_view, name='cover-letter'),
-]
\ No newline at end of file
+    path('cover-letter/', views.cover_letter_view_async if ASYNC else views.cover_letter_view, name='cover-letter'),
+
+    # Many companies against one resume, streamed back row by row
+    path('bulk/', views.bulk_outreach_view_async if ASYNC else views.bulk_outreach_view, name='bulk-outreach'),
+
+    # Saved "current resume" used when no resume_file is uploaded
+    path('resume/', views.current_resume_view, name='current-resume'),
+    path('resume-cache/stats/', views.resume_text_cache_stats, name='resume-cache-stats'),
+]
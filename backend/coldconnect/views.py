@@ -1,71 +1,309 @@
 import json
-import time
 import io
-import requests
-from PyPDF2 import PdfReader
-from django.http import JsonResponse
+import math
+import csv
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
-from django.conf import settings
-from pymongo import MongoClient
-
-
-MODEL_NAME = "gemini-2.5-flash-preview-09-2025"
+from datetime import datetime
 
-# MongoDB Setup
-client = MongoClient(settings.MONGO_URI)
-db = client[settings.MONGO_DB_NAME]
-users = db["users"]
+from backend import prompts
+from backend.response_cache import bypass_requested
+from backend.uploads import rejected_upload
+from backend.ratelimit import RateLimited, rate_limited_response
+from backend.decorators import metrics_required
+from backend.gemini import call_gemini, acall_gemini, stream_gemini, astream_gemini, key_slot, akey_slot
+from users import store
+from users.decorators import user_required
+from .resume_text import resume_text_cache, PdfExtractError
 
 
 # ===========================
 # COMMON HELPERS
 # ===========================
 
-def extract_pdf_text(file_obj):
-    """Extract plain text from uploaded PDF file."""
-    pdf_reader = PdfReader(file_obj)
-    text = "\n".join(page.extract_text() or "" for page in pdf_reader.pages)
-    return text.strip()
+def gemini_text_and_sources(api_response):
+    """Return (text, {uri: source line}) for one response or streamed chunk.
 
-
-def extract_gemini_response(api_response):
-    """Extract text + sources."""
-    candidate = api_response.get("candidates", [{}])[0]
+    Safety and finish-reason chunks may carry no candidates or an empty
+    ``parts`` list; they give "".
+    """
+    candidate = (api_response.get("candidates") or [{}])[0]
 
     text = (
-        candidate
-        .get("content", {})
-        .get("parts", [{}])[0]
+        (candidate.get("content", {}).get("parts") or [{}])[0]
         .get("text", "")
     )
 
-    sources = []
-    grounding = candidate.get("groundingMetadata", {})
+    sources = {}
+    grounding = candidate.get("groundingMetadata") or {}
 
-    if grounding and grounding.get("groundingAttributions"):
-        sources = [
-            f"Source: {attr.get('web', {}).get('title', 'N/A')} ({attr.get('web', {}).get('uri', 'N/A')})"
-            for attr in grounding["groundingAttributions"]
-        ]
+    for attr in grounding.get("groundingAttributions") or []:
+        web = attr.get("web", {})
+        uri = web.get("uri", "N/A")
+        sources.setdefault(uri, f"Source: {web.get('title', 'N/A')} ({uri})")
 
     return text, sources
 
 
-def call_gemini(api_key, payload):
-    """Real Gemini API call with retry."""
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/{MODEL_NAME}:generateContent?key={api_key}"
-    headers = {"Content-Type": "application/json"}
+def extract_gemini_response(api_response):
+    """Extract text + sources."""
+    text, sources = gemini_text_and_sources(api_response)
+    return text, list(sources.values())
+
+
+# ===========================
+# PROMPT BUILDERS
+# (shared by the sync views and their async twins)
+# ===========================
+
+PLATFORM_PROMPTS = {
+    "linkedin": "Write a professional LinkedIn connection message that is concise and engaging. Keep it under the character limit.",
+    "whatsapp": "Write a friendly WhatsApp message that is casual yet professional. Keep it under the character limit.",
+    "twitter": "Write a concise Twitter/X DM that is engaging and to the point. Keep it under the character limit.",
+    "instagram": "Write a friendly Instagram DM that is casual and engaging. Keep it under the character limit.",
+    "other": "Write a professional direct message that is concise and engaging. Keep it under the character limit."
+}
+
+
+def missing_field_error(request, required):
+    """Return a 400 response for the first missing form field, else None."""
+    for field in required:
+        if not request.POST.get(field):
+            return JsonResponse({"error": f"Missing field: {field}"}, status=400)
 
-    for attempt in range(3):
+    return None
+
+
+def resolve_resume_text(request, user):
+    """Return (resume_text, error_response).
+
+    An uploaded resume_file wins; without one the user's saved current
+    resume is used. Either way the PDF is only parsed once per file.
+    """
+    rejected = rejected_upload(request)
+    if rejected:
+        return None, rejected
+
+    if "resume_file" in request.FILES:
         try:
-            res = requests.post(url, headers=headers, json=payload)
-            res.raise_for_status()
-            return res.json()
-        except requests.exceptions.RequestException as e:
-            if attempt == 2:
-                raise e
-            time.sleep(2 ** attempt)
+            text, _ = resume_text_cache.text_for_upload(request.FILES["resume_file"])
+        except PdfExtractError as e:
+            return None, JsonResponse({"error": str(e)}, status=e.status)
+        return text, None
+
+    saved = (user.get("current_resume") or {}).get("sha256")
+    if saved:
+        text = resume_text_cache.lookup(saved)
+        if text is not None:
+            return text, None
+
+    return None, JsonResponse({"error": "Missing PDF file: resume_file"}, status=400)
+
+
+def fit_resume_text(endpoint, fixed, resume_text):
+    """Compact the extracted resume text and trim it to the endpoint's prompt budget."""
+    return prompts.fit(endpoint, fixed, [
+        ("resume", prompts.fit_text(resume_text), lambda max_tokens: prompts.fit_text(resume_text, max_tokens)),
+    ])["resume"]
+
+
+def build_cold_mail_payload(form, resume_text):
+    system_prompt = (
+        "You are an expert career coach. Write a personalized cold email including a Subject line "
+        "using the resume content provided."
+    )
+
+    resume_text = fit_resume_text("cold_mail", system_prompt + form["job_description"], resume_text)
+
+    user_query = (
+        f"Write a cold email for the role of {form['job_description']} "
+        f"at {form['company_name']}.\n\n"
+        f"Resume:\n{resume_text}\n\n"
+        f"Tone: {form['tone']}"
+    )
+
+    return {
+        "contents": [{"parts": [{"text": user_query}]}],
+        "systemInstruction": {"parts": [{"text": system_prompt}]}
+    }
+
+
+def build_cold_dm_payload(form, resume_text):
+    platform = form.get("platform", "linkedin")
+    character_limit = form.get("character_limit", "300")
+
+    # Platform-specific prompts
+    system_prompt = PLATFORM_PROMPTS.get(platform, PLATFORM_PROMPTS["other"])
+
+    resume_text = fit_resume_text("cold_dm", system_prompt + form["job_description"], resume_text)
+
+    user_query = (
+        f"Cold DM for {platform} for role: {form['job_description']} at {form['company_name']}\n"
+        f"Resume:\n{resume_text}\n"
+        f"Character limit: {character_limit} characters"
+    )
+
+    return {
+        "contents": [{"parts": [{"text": user_query}]}],
+        "systemInstruction": {"parts": [{"text": system_prompt}]}
+    }
+
+
+def build_cover_letter_payload(form, resume_text):
+    system_prompt = (
+        "Write a detailed, professional, structured cover letter tailored to the role "
+        "and directly referencing the resume content."
+    )
+
+    resume_text = fit_resume_text("cover_letter", system_prompt + form["job_description"], resume_text)
+
+    user_query = (
+        f"Cover letter for {form['job_description']} at {form['company_name']}.\n\n"
+        f"Resume:\n{resume_text}"
+    )
+
+    return {
+        "contents": [{"parts": [{"text": user_query}]}],
+        "systemInstruction": {"parts": [{"text": system_prompt}]}
+    }
+
+
+def split_subject(text):
+    """Separate a leading "Subject:" line from the email body."""
+    subject = ""
+    body = text
+
+    if text.lower().startswith("subject:"):
+        parts = text.split("\n", 1)
+        subject = parts[0].replace("Subject:", "").strip()
+        body = parts[1].strip() if len(parts) > 1 else ""
+
+    return subject, body
+
+
+def outreach_result(kind, text, sources):
+    """The JSON body the cold mail / cold DM / cover letter views return."""
+    if kind == "cold_mail":
+        subject, body = split_subject(text)
+        return {"success": True, "subject": subject, "body": body, "sources": sources}
+    if kind == "cold_dm":
+        return {"success": True, "message": text.strip(), "sources": sources}
+    return {"success": True, "cover_letter": text.strip(), "sources": sources}
+
+
+# ===========================
+# STREAMING (SSE)
+# Send "stream=1" with any of the forms below to get tokens as
+# server-sent events instead of one JSON body:
+#   event: subject  {"subject": ...}          (cold mail only, once known)
+#   event: delta    {"text": ...}             (body text as it arrives)
+#   event: done     same JSON as the non-streaming response
+#   event: error    {"error": ...}
+# ===========================
+
+def wants_stream(request):
+    return request.POST.get("stream", "").lower() in ("1", "true", "yes")
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class StreamShaper:
+    """Turn Gemini text deltas into SSE events for one endpoint."""
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.text = ""
+        self.sources = {}   # uri -> source line; chunks repeat the metadata
+        # Cold mail holds text back until the "Subject:" line is complete.
+        self.in_head = kind == "cold_mail"
+        self.head = ""
+        self.body_started = False
+
+    def _body_delta(self, text):
+        if not self.body_started:
+            text = text.lstrip()
+            if not text:
+                return []
+            self.body_started = True
+        return [sse_event("delta", {"text": text})]
+
+    def feed(self, text, sources):
+        self.text += text
+        for uri, line in sources.items():
+            self.sources.setdefault(uri, line)
+        if not text:
+            return []
+        if not self.in_head:
+            return self._body_delta(text)
+
+        self.head += text
+        lowered = self.head.lower()
+        if lowered.startswith("subject:"):
+            if "\n" not in self.head:
+                return []
+            line, rest = self.head.split("\n", 1)
+            self.in_head = False
+            subject = line.replace("Subject:", "").strip()
+            return [sse_event("subject", {"subject": subject})] + self._body_delta(rest)
+        if "subject:".startswith(lowered):
+            return []
+
+        # No subject line after all; everything so far is body.
+        self.in_head = False
+        return [sse_event("subject", {"subject": ""})] + self._body_delta(self.head)
+
+    def finish(self):
+        events = []
+        if self.kind == "cold_mail" and self.in_head:
+            subject, _ = split_subject(self.text)
+            events.append(sse_event("subject", {"subject": subject}))
+        return events + [sse_event("done", outreach_result(self.kind, self.text, list(self.sources.values())))]
+
+
+def gemini_error(e):
+    """Error fields of an SSE event; a shed call also says when to retry."""
+    error = {"error": f"Gemini API error: {e}"}
+    if isinstance(e, RateLimited):
+        error["retry_after"] = math.ceil(e.retry_after)
+    return error
+
+
+def sse_stream(chunks, kind):
+    shaper = StreamShaper(kind)
+    # Flush headers right away so the client sees the stream open.
+    yield ": stream open\n\n"
+    try:
+        for chunk in chunks:
+            yield from shaper.feed(*gemini_text_and_sources(chunk))
+        yield from shaper.finish()
+    except Exception as e:
+        yield sse_event("error", gemini_error(e))
+
+
+async def asse_stream(chunks, kind):
+    shaper = StreamShaper(kind)
+    yield ": stream open\n\n"
+    try:
+        async for chunk in chunks:
+            for event in shaper.feed(*gemini_text_and_sources(chunk)):
+                yield event
+        for event in shaper.finish():
+            yield event
+    except Exception as e:
+        yield sse_event("error", gemini_error(e))
+
+
+def sse_response(events):
+    response = StreamingHttpResponse(events, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
 
 
 # =========================================================
@@ -73,67 +311,38 @@ def call_gemini(api_key, payload):
 # =========================================================
 @csrf_exempt
 @require_http_methods(["POST"])
+@user_required
 def cold_mail_view(request):
     try:
-        # Check authentication
-        email = request.session.get("email")
-        if not email:
-            return JsonResponse({"error": "Not logged in"}, status=401)
-
-        # Get user from database
-        user = users.find_one({"email": email})
-        if not user:
-            return JsonResponse({"error": "User not found"}, status=404)
+        user = request.app_user
 
         # Get Gemini API key from user's saved key
         gemini_key = user.get("gemini_key")
         if not gemini_key:
             return JsonResponse({"error": "Gemini API key not found. Please add it in Settings."}, status=400)
 
-        required = ["job_description", "company_name", "tone"]
-
-        for field in required:
-            if not request.POST.get(field):
-                return JsonResponse({"error": f"Missing field: {field}"}, status=400)
-
-        if "resume_file" not in request.FILES:
-            return JsonResponse({"error": "Missing PDF file: resume_file"}, status=400)
-
-        pdf_file = request.FILES["resume_file"]
-        resume_text = extract_pdf_text(pdf_file)
+        error = rejected_upload(request) or missing_field_error(request, ["job_description", "company_name", "tone"])
+        if error:
+            return error
 
-        system_prompt = (
-            "You are an expert career coach. Write a personalized cold email including a Subject line "
-            "using the resume content provided."
-        )
+        resume_text, error = resolve_resume_text(request, user)
+        if error:
+            return error
 
-        user_query = (
-            f"Write a cold email for the role of {request.POST['job_description']} "
-            f"at {request.POST['company_name']}.\n\n"
-            f"Resume:\n{resume_text}\n\n"
-            f"Tone: {request.POST['tone']}"
-        )
+        payload = build_cold_mail_payload(request.POST, resume_text)
 
-        payload = {
-            "contents": [{"parts": [{"text": user_query}]}],
-            "systemInstruction": {"parts": [{"text": system_prompt}]}
-        }
+        if wants_stream(request):
+            return sse_response(sse_stream(stream_gemini(gemini_key, payload, endpoint="cold_mail", cache=not bypass_requested(request)), "cold_mail"))
 
         try:
-            raw = call_gemini(gemini_key, payload)
+            raw = call_gemini(gemini_key, payload, endpoint="cold_mail", cache=not bypass_requested(request))
+        except RateLimited as e:
+            return rate_limited_response(e)
         except Exception as e:
             return JsonResponse({"error": f"Gemini API error: {e}"}, status=503)
 
         text, sources = extract_gemini_response(raw)
-
-        # Separate subject + body
-        subject = ""
-        body = text
-
-        if text.lower().startswith("subject:"):
-            parts = text.split("\n", 1)
-            subject = parts[0].replace("Subject:", "").strip()
-            body = parts[1].strip() if len(parts) > 1 else ""
+        subject, body = split_subject(text)
 
         return JsonResponse({
             "success": True,
@@ -153,60 +362,33 @@ def cold_mail_view(request):
 # =========================================================
 @csrf_exempt
 @require_http_methods(["POST"])
+@user_required
 def cold_dm_view(request):
     try:
-        # Check authentication
-        email = request.session.get("email")
-        if not email:
-            return JsonResponse({"error": "Not logged in"}, status=401)
-
-        # Get user from database
-        user = users.find_one({"email": email})
-        if not user:
-            return JsonResponse({"error": "User not found"}, status=404)
+        user = request.app_user
 
         # Get Gemini API key from user's saved key
         gemini_key = user.get("gemini_key")
         if not gemini_key:
             return JsonResponse({"error": "Gemini API key not found. Please add it in Settings."}, status=400)
 
-        required = ["job_description", "company_name", "platform", "character_limit"]
-
-        for field in required:
-            if not request.POST.get(field):
-                return JsonResponse({"error": f"Missing field: {field}"}, status=400)
-
-        if "resume_file" not in request.FILES:
-            return JsonResponse({"error": "Missing PDF file: resume_file"}, status=400)
-
-        resume_text = extract_pdf_text(request.FILES["resume_file"])
-        platform = request.POST.get("platform", "linkedin")
-        character_limit = request.POST.get("character_limit", "300")
-
-        # Platform-specific prompts
-        platform_prompts = {
-            "linkedin": "Write a professional LinkedIn connection message that is concise and engaging. Keep it under the character limit.",
-            "whatsapp": "Write a friendly WhatsApp message that is casual yet professional. Keep it under the character limit.",
-            "twitter": "Write a concise Twitter/X DM that is engaging and to the point. Keep it under the character limit.",
-            "instagram": "Write a friendly Instagram DM that is casual and engaging. Keep it under the character limit.",
-            "other": "Write a professional direct message that is concise and engaging. Keep it under the character limit."
-        }
+        error = rejected_upload(request) or missing_field_error(request, ["job_description", "company_name", "platform", "character_limit"])
+        if error:
+            return error
 
-        system_prompt = platform_prompts.get(platform, platform_prompts["other"])
+        resume_text, error = resolve_resume_text(request, user)
+        if error:
+            return error
 
-        user_query = (
-            f"Cold DM for {platform} for role: {request.POST['job_description']} at {request.POST['company_name']}\n"
-            f"Resume:\n{resume_text}\n"
-            f"Character limit: {character_limit} characters"
-        )
+        payload = build_cold_dm_payload(request.POST, resume_text)
 
-        payload = {
-            "contents": [{"parts": [{"text": user_query}]}],
-            "systemInstruction": {"parts": [{"text": system_prompt}]}
-        }
+        if wants_stream(request):
+            return sse_response(sse_stream(stream_gemini(gemini_key, payload, endpoint="cold_dm", cache=not bypass_requested(request)), "cold_dm"))
 
         try:
-            raw = call_gemini(gemini_key, payload)
+            raw = call_gemini(gemini_key, payload, endpoint="cold_dm", cache=not bypass_requested(request))
+        except RateLimited as e:
+            return rate_limited_response(e)
         except Exception as e:
             return JsonResponse({"error": f"Gemini API error: {e}"}, status=503)
 
@@ -229,51 +411,173 @@ def cold_dm_view(request):
 # =========================================================
 @csrf_exempt
 @require_http_methods(["POST"])
+@user_required
 def cover_letter_view(request):
     try:
-        # Check authentication
-        email = request.session.get("email")
-        if not email:
-            return JsonResponse({"error": "Not logged in"}, status=401)
-
-        # Get user from database
-        user = users.find_one({"email": email})
-        if not user:
-            return JsonResponse({"error": "User not found"}, status=404)
+        user = request.app_user
 
         # Get Gemini API key from user's saved key
         gemini_key = user.get("gemini_key")
         if not gemini_key:
             return JsonResponse({"error": "Gemini API key not found. Please add it in Settings."}, status=400)
 
-        required = ["job_description", "company_name"]
+        error = rejected_upload(request) or missing_field_error(request, ["job_description", "company_name"])
+        if error:
+            return error
 
-        for field in required:
-            if not request.POST.get(field):
-                return JsonResponse({"error": f"Missing field: {field}"}, status=400)
+        resume_text, error = resolve_resume_text(request, user)
+        if error:
+            return error
 
-        if "resume_file" not in request.FILES:
-            return JsonResponse({"error": "Missing PDF file: resume_file"}, status=400)
+        payload = build_cover_letter_payload(request.POST, resume_text)
 
-        resume_text = extract_pdf_text(request.FILES["resume_file"])
+        if wants_stream(request):
+            return sse_response(sse_stream(stream_gemini(gemini_key, payload, endpoint="cover_letter", cache=not bypass_requested(request)), "cover_letter"))
 
-        system_prompt = (
-            "Write a detailed, professional, structured cover letter tailored to the role "
-            "and directly referencing the resume content."
-        )
+        try:
+            raw = call_gemini(gemini_key, payload, endpoint="cover_letter", cache=not bypass_requested(request))
+        except RateLimited as e:
+            return rate_limited_response(e)
+        except Exception as e:
+            return JsonResponse({"error": f"Gemini API error: {e}"}, status=503)
 
-        user_query = (
-            f"Cover letter for {request.POST['job_description']} at {request.POST['company_name']}.\n\n"
-            f"Resume:\n{resume_text}"
-        )
+        text, sources = extract_gemini_response(raw)
 
-        payload = {
-            "contents": [{"parts": [{"text": user_query}]}],
-            "systemInstruction": {"parts": [{"text": system_prompt}]}
-        }
+        return JsonResponse({
+            "success": True,
+            "cover_letter": text.strip(),
+            "sources": sources
+        }, status=200)
+    except Exception as e:
+        import traceback
+        print(f"Cover letter error: {e}")
+        print(traceback.format_exc())
+        return JsonResponse({"error": f"Internal server error: {str(e)}"}, status=500)
+
+
+# =========================================================
+# ASYNC VIEWS
+# Served instead of the views above when settings.ASYNC_VIEWS
+# is on (ASGI). PDF parsing runs in a thread so the loop stays free.
+# =========================================================
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@user_required
+async def cold_mail_view_async(request):
+    try:
+        user = request.app_user
+        gemini_key = user.get("gemini_key")
+        if not gemini_key:
+            return JsonResponse({"error": "Gemini API key not found. Please add it in Settings."}, status=400)
+
+        error = rejected_upload(request) or missing_field_error(request, ["job_description", "company_name", "tone"])
+        if error:
+            return error
+
+        resume_text, error = await asyncio.to_thread(resolve_resume_text, request, user)
+        if error:
+            return error
+
+        payload = build_cold_mail_payload(request.POST, resume_text)
+
+        if wants_stream(request):
+            return sse_response(asse_stream(astream_gemini(gemini_key, payload, endpoint="cold_mail", cache=not bypass_requested(request)), "cold_mail"))
+
+        try:
+            raw = await acall_gemini(gemini_key, payload, endpoint="cold_mail", cache=not bypass_requested(request))
+        except RateLimited as e:
+            return rate_limited_response(e)
+        except Exception as e:
+            return JsonResponse({"error": f"Gemini API error: {e}"}, status=503)
+
+        text, sources = extract_gemini_response(raw)
+        subject, body = split_subject(text)
+
+        return JsonResponse({
+            "success": True,
+            "subject": subject,
+            "body": body,
+            "sources": sources
+        }, status=200)
+    except Exception as e:
+        import traceback
+        print(f"Cold mail error: {e}")
+        print(traceback.format_exc())
+        return JsonResponse({"error": f"Internal server error: {str(e)}"}, status=500)
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@user_required
+async def cold_dm_view_async(request):
+    try:
+        user = request.app_user
+        gemini_key = user.get("gemini_key")
+        if not gemini_key:
+            return JsonResponse({"error": "Gemini API key not found. Please add it in Settings."}, status=400)
+
+        error = rejected_upload(request) or missing_field_error(request, ["job_description", "company_name", "platform", "character_limit"])
+        if error:
+            return error
+
+        resume_text, error = await asyncio.to_thread(resolve_resume_text, request, user)
+        if error:
+            return error
+
+        payload = build_cold_dm_payload(request.POST, resume_text)
+
+        if wants_stream(request):
+            return sse_response(asse_stream(astream_gemini(gemini_key, payload, endpoint="cold_dm", cache=not bypass_requested(request)), "cold_dm"))
 
         try:
-            raw = call_gemini(gemini_key, payload)
+            raw = await acall_gemini(gemini_key, payload, endpoint="cold_dm", cache=not bypass_requested(request))
+        except RateLimited as e:
+            return rate_limited_response(e)
+        except Exception as e:
+            return JsonResponse({"error": f"Gemini API error: {e}"}, status=503)
+
+        text, sources = extract_gemini_response(raw)
+
+        return JsonResponse({
+            "success": True,
+            "message": text.strip(),
+            "sources": sources
+        }, status=200)
+    except Exception as e:
+        import traceback
+        print(f"Cold DM error: {e}")
+        print(traceback.format_exc())
+        return JsonResponse({"error": f"Internal server error: {str(e)}"}, status=500)
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@user_required
+async def cover_letter_view_async(request):
+    try:
+        user = request.app_user
+        gemini_key = user.get("gemini_key")
+        if not gemini_key:
+            return JsonResponse({"error": "Gemini API key not found. Please add it in Settings."}, status=400)
+
+        error = rejected_upload(request) or missing_field_error(request, ["job_description", "company_name"])
+        if error:
+            return error
+
+        resume_text, error = await asyncio.to_thread(resolve_resume_text, request, user)
+        if error:
+            return error
+
+        payload = build_cover_letter_payload(request.POST, resume_text)
+
+        if wants_stream(request):
+            return sse_response(asse_stream(astream_gemini(gemini_key, payload, endpoint="cover_letter", cache=not bypass_requested(request)), "cover_letter"))
+
+        try:
+            raw = await acall_gemini(gemini_key, payload, endpoint="cover_letter", cache=not bypass_requested(request))
+        except RateLimited as e:
+            return rate_limited_response(e)
         except Exception as e:
             return JsonResponse({"error": f"Gemini API error: {e}"}, status=503)
 
@@ -289,3 +593,248 @@ def cover_letter_view(request):
         print(f"Cover letter error: {e}")
         print(traceback.format_exc())
         return JsonResponse({"error": f"Internal server error: {str(e)}"}, status=500)
+
+
+# =========================================================
+# 4. CURRENT RESUME
+# GET / POST / DELETE /coldconnect/resume/
+# Save a resume once; the views above use it when no
+# resume_file is uploaded.
+# =========================================================
+@csrf_exempt
+@require_http_methods(["GET", "POST", "DELETE"])
+@user_required
+def current_resume_view(request):
+    try:
+        email = request.app_user["email"]
+        previous = (request.app_user.get("current_resume") or {}).get("sha256")
+
+        if request.method == "GET":
+            return JsonResponse({"success": True, "current_resume": request.app_user.get("current_resume")})
+
+        if request.method == "DELETE":
+            store.unset_fields(email, "current_resume")
+            if previous:
+                resume_text_cache.unpin(email, previous)
+            return JsonResponse({"success": True, "message": "Current resume removed"})
+
+        rejected = rejected_upload(request)
+        if rejected:
+            return rejected
+
+        if "resume_file" not in request.FILES:
+            return JsonResponse({"error": "Missing PDF file: resume_file"}, status=400)
+
+        pdf_file = request.FILES["resume_file"]
+        try:
+            text, sha = resume_text_cache.text_for_upload(pdf_file, pin_for=email)
+        except PdfExtractError as e:
+            return JsonResponse({"error": str(e)}, status=e.status)
+
+        current = {
+            "sha256": sha,
+            "filename": pdf_file.name,
+            "characters": len(text),
+            "saved_at": datetime.utcnow().isoformat(),
+        }
+        store.set_fields(email, current_resume=current)
+        if previous and previous != sha:
+            resume_text_cache.unpin(email, previous)
+
+        return JsonResponse({"success": True, "current_resume": current})
+    except Exception as e:
+        import traceback
+        print(f"Current resume error: {e}")
+        print(traceback.format_exc())
+        return JsonResponse({"error": f"Internal server error: {str(e)}"}, status=500)
+
+
+@require_http_methods(["GET"])
+@metrics_required
+def resume_text_cache_stats(request):
+    """Hit counters and parse times of the extracted-text cache."""
+    return JsonResponse({"success": True, "resume_text_cache": resume_text_cache.snapshot()})
+
+
+# =========================================================
+# 5. BULK OUTREACH
+# POST /coldconnect/bulk/
+# Many (company, role, tone, platform) rows against one resume.
+# Rows come as rows_file (CSV with those columns, or a JSON list)
+# or as a JSON list in the "rows" field; "kind" picks cold_mail
+# (default), cold_dm or cover_letter and a row may override it.
+# The resume is extracted once; Gemini calls run with at most
+# GEMINI_PER_KEY_CONCURRENCY in flight per API key and each row is
+# sent back as an SSE event as soon as it finishes:
+#   event: row   {"index", "company", "role", "kind", ...result}
+#   event: done  {"total", "succeeded", "failed"}
+# =========================================================
+
+OUTREACH_BUILDERS = {
+    "cold_mail": build_cold_mail_payload,
+    "cold_dm": build_cold_dm_payload,
+    "cover_letter": build_cover_letter_payload,
+}
+
+
+def parse_bulk_rows(request):
+    """Return (rows, error_response); each row is a dict of strings."""
+    rejected = rejected_upload(request)
+    if rejected:
+        return None, rejected
+
+    if "rows_file" in request.FILES:
+        raw = request.FILES["rows_file"].read().decode("utf-8-sig", errors="replace")
+    else:
+        raw = request.POST.get("rows", "")
+
+    if not raw.strip():
+        return None, JsonResponse({"error": "Missing rows or rows_file"}, status=400)
+
+    try:
+        if raw.lstrip().startswith("["):
+            rows = json.loads(raw)
+        else:
+            rows = list(csv.DictReader(io.StringIO(raw)))
+    except (ValueError, csv.Error):
+        return None, JsonResponse({"error": "rows must be CSV or a JSON list"}, status=400)
+
+    if not isinstance(rows, list) or not rows or not all(isinstance(row, dict) for row in rows):
+        return None, JsonResponse({"error": "rows must be a non-empty list of objects"}, status=400)
+    if len(rows) > settings.COLDCONNECT_BULK_MAX_ROWS:
+        return None, JsonResponse(
+            {"error": f"At most {settings.COLDCONNECT_BULK_MAX_ROWS} rows per request"}, status=400
+        )
+
+    default_kind = request.POST.get("kind", "cold_mail")
+    cleaned = []
+    for index, row in enumerate(rows):
+        row = {str(k).strip().lower(): str(v).strip() for k, v in row.items() if k is not None and v is not None}
+        if not row.get("company") or not row.get("role"):
+            return None, JsonResponse({"error": f"Row {index}: company and role are required"}, status=400)
+        kind = row.get("kind") or default_kind
+        if kind not in OUTREACH_BUILDERS:
+            return None, JsonResponse({"error": f"Row {index}: unknown kind {kind}"}, status=400)
+        row["kind"] = kind
+        cleaned.append(row)
+
+    return cleaned, None
+
+
+def bulk_payload(row, resume_text):
+    form = {
+        "job_description": row["role"],
+        "company_name": row["company"],
+        "tone": row.get("tone") or "professional",
+        "platform": row.get("platform") or "linkedin",
+        "character_limit": row.get("character_limit") or "300",
+    }
+    return OUTREACH_BUILDERS[row["kind"]](form, resume_text)
+
+
+def bulk_row_event(index, row, raw, error):
+    head = {"index": index, "company": row["company"], "role": row["role"], "kind": row["kind"]}
+    if error is not None:
+        return sse_event("row", {**head, "success": False, **gemini_error(error)})
+    return sse_event("row", {**head, **outreach_result(row["kind"], *extract_gemini_response(raw))})
+
+
+def bulk_stream(gemini_key, rows, resume_text, cache=True):
+    slot = key_slot(gemini_key)
+
+    def generate(row):
+        with slot:
+            return call_gemini(gemini_key, bulk_payload(row, resume_text), endpoint=row["kind"], cache=cache)
+
+    yield ": stream open\n\n"
+    succeeded = 0
+    pool = ThreadPoolExecutor(max_workers=min(len(rows), settings.GEMINI_PER_KEY_CONCURRENCY))
+    try:
+        futures = {pool.submit(generate, row): index for index, row in enumerate(rows)}
+        for future in as_completed(futures):
+            index = futures[future]
+            error = future.exception()
+            succeeded += error is None
+            yield bulk_row_event(index, rows[index], None if error else future.result(), error)
+    finally:
+        # Client gone or done: drop rows that have not started yet.
+        pool.shutdown(wait=False, cancel_futures=True)
+    yield sse_event("done", {"total": len(rows), "succeeded": succeeded, "failed": len(rows) - succeeded})
+
+
+async def abulk_stream(gemini_key, rows, resume_text, cache=True):
+    slot = akey_slot(gemini_key)
+
+    async def generate(index, row):
+        try:
+            async with slot:
+                return index, await acall_gemini(gemini_key, bulk_payload(row, resume_text), endpoint=row["kind"], cache=cache), None
+        except Exception as e:
+            return index, None, e
+
+    yield ": stream open\n\n"
+    succeeded = 0
+    tasks = [asyncio.ensure_future(generate(index, row)) for index, row in enumerate(rows)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            index, raw, error = await next_done
+            succeeded += error is None
+            yield bulk_row_event(index, rows[index], raw, error)
+    finally:
+        for task in tasks:
+            task.cancel()
+    yield sse_event("done", {"total": len(rows), "succeeded": succeeded, "failed": len(rows) - succeeded})
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@user_required
+def bulk_outreach_view(request):
+    try:
+        user = request.app_user
+
+        gemini_key = user.get("gemini_key")
+        if not gemini_key:
+            return JsonResponse({"error": "Gemini API key not found. Please add it in Settings."}, status=400)
+
+        rows, error = parse_bulk_rows(request)
+        if error:
+            return error
+
+        resume_text, error = resolve_resume_text(request, user)
+        if error:
+            return error
+
+        return sse_response(bulk_stream(gemini_key, rows, resume_text, cache=not bypass_requested(request)))
+    except Exception as e:
+        import traceback
+        print(f"Bulk outreach error: {e}")
+        print(traceback.format_exc())
+        return JsonResponse({"error": f"Internal server error: {str(e)}"}, status=500)
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@user_required
+async def bulk_outreach_view_async(request):
+    try:
+        user = request.app_user
+
+        gemini_key = user.get("gemini_key")
+        if not gemini_key:
+            return JsonResponse({"error": "Gemini API key not found. Please add it in Settings."}, status=400)
+
+        rows, error = parse_bulk_rows(request)
+        if error:
+            return error
+
+        resume_text, error = await asyncio.to_thread(resolve_resume_text, request, user)
+        if error:
+            return error
+
+        return sse_response(abulk_stream(gemini_key, rows, resume_text, cache=not bypass_requested(request)))
+    except Exception as e:
+        import traceback
+        print(f"Bulk outreach error: {e}")
+        print(traceback.format_exc())
+        return JsonResponse({"error": f"Internal server error: {str(e)}"}, status=500)
@@ -0,0 +1,538 @@
+"""
+Storage for generated .tex files.
+
+Files live in a pluggable backend picked by ARTIFACT_BACKEND:
+
+* ``local`` - sharded directories on disk (``ab/cd/<id>.tex`` by the hash
+  of the resume id) with atomic temp-file-and-rename writes. Only shared
+  between nodes if ARTIFACT_FOLDER is on a shared volume.
+* ``gridfs`` - a GridFS bucket in the app's MongoDB, so any node can serve
+  any resume. Each node keeps a read-through copy of what it served in a
+  local cache (the same sharded layout under ARTIFACT_CACHE_FOLDER),
+  bounded by ARTIFACT_CACHE_MAX_BYTES.
+
+Reads are streamed in ARTIFACT_CHUNK_SIZE pieces instead of loaded whole.
+Files are stored by resume id alone, so every read first checks that the
+id is a record of the asking user.
+
+A file is only a copy of the ``latex`` field of its record in the
+``resumes`` collection: deleting the record deletes the file, and the
+garbage collector removes files whose record is gone, files older than
+ARTIFACT_RETENTION_DAYS and, oldest first, whatever exceeds
+ARTIFACT_MAX_BYTES. A collected file that is asked for again is rebuilt
+from its record (see ``load``).
+
+Automatic GC passes start from writes, at most every ARTIFACT_GC_INTERVAL
+seconds per process, and a lease document in ``artifact_gc`` lets only one
+process per store run a pass in each interval; the others just trim their
+own node's read cache. ``manage.py gc_artifacts`` runs a pass directly.
+
+Files from before the store (flat ``TEMP_FOLDER/<id>.tex``) are moved in
+on first read or by ``manage.py gc_artifacts``.
+"""
+
+import os
+import time
+import socket
+import hashlib
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from gridfs import GridFSBucket
+from gridfs.errors import NoFile
+from pymongo.errors import DuplicateKeyError
+
+from backend.mongo import get_db
+from backend.timing import span
+
+from . import history
+
+
+SUFFIX = ".tex"
+GC_LEASES = "artifact_gc"
+
+
+def _valid_id(resume_id):
+    return bool(resume_id) and "/" not in resume_id and "\\" not in resume_id and not resume_id.startswith(".")
+
+
+def read_chunks(source, chunk_size=None):
+    """Yield ``source`` (a binary file object) in chunks, closing it at the end."""
+    chunk_size = chunk_size or settings.ARTIFACT_CHUNK_SIZE
+    try:
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+    finally:
+        source.close()
+
+
+# ============================================================
+#  Backends
+#  put / open / delete / scan; ``open`` returns a binary file
+#  object or None, ``scan`` yields (resume_id, size, mtime).
+# ============================================================
+
+class LocalBackend:
+    name = "local"
+
+    def __init__(self, folder):
+        self.folder = folder
+
+    def path(self, resume_id):
+        digest = hashlib.sha256(resume_id.encode()).hexdigest()
+        return os.path.join(self.folder, digest[:2], digest[2:4], resume_id + SUFFIX)
+
+    def lease_key(self):
+        # A local folder is only this host's, unless it is a shared volume.
+        return f"local:{socket.gethostname()}:{os.path.abspath(self.folder)}"
+
+    def put(self, resume_id, data):
+        path = self.path(resume_id)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with span("file_io"):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+    def put_stream(self, resume_id, source):
+        """Copy a binary stream into place chunk by chunk; returns the bytes written."""
+        path = self.path(resume_id)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        size = 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            with open(tmp_path, "wb") as f:
+                for chunk in read_chunks(source):
+                    with span("file_io"):
+                        f.write(chunk)
+                    size += len(chunk)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        return size
+
+    def open(self, resume_id):
+        try:
+            return open(self.path(resume_id), "rb")
+        except FileNotFoundError:
+            return None
+
+    def touch(self, resume_id):
+        try:
+            os.utime(self.path(resume_id))
+        except FileNotFoundError:
+            pass
+
+    def delete(self, resume_id):
+        try:
+            os.remove(self.path(resume_id))
+        except FileNotFoundError:
+            pass
+
+    def scan(self):
+        for root, _, files in os.walk(self.folder):
+            for name in files:
+                path = os.path.join(root, name)
+                if name.endswith(".tmp"):
+                    # Left behind by a crashed writer; ignore fresh ones still being written.
+                    try:
+                        if os.stat(path).st_mtime < time.time() - 3600:
+                            os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                    continue
+                if not name.endswith(SUFFIX):
+                    continue
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield name[:-len(SUFFIX)], st.st_size, st.st_mtime
+
+
+class GridFSBackend:
+    """One GridFS file per resume, named by its id.
+
+    A rebuilt file is uploaded as a new revision and older revisions are
+    removed afterwards, so readers always find a complete file.
+    """
+    name = "gridfs"
+
+    def __init__(self, bucket_name):
+        self.bucket_name = bucket_name
+
+    def _bucket(self):
+        return GridFSBucket(get_db(), bucket_name=self.bucket_name, chunk_size_bytes=settings.ARTIFACT_CHUNK_SIZE)
+
+    def _files(self):
+        return get_db()[f"{self.bucket_name}.files"]
+
+    def lease_key(self):
+        return f"gridfs:{self.bucket_name}"
+
+    def put(self, resume_id, data):
+        bucket = self._bucket()
+        file_id = bucket.upload_from_stream(resume_id, data)
+        for old in self._files().find({"filename": resume_id, "_id": {"$ne": file_id}}, {"_id": 1}):
+            self._delete_file(bucket, old["_id"])
+
+    def open(self, resume_id):
+        try:
+            return self._bucket().open_download_stream_by_name(resume_id)
+        except NoFile:
+            return None
+
+    def delete(self, resume_id):
+        bucket = self._bucket()
+        for old in self._files().find({"filename": resume_id}, {"_id": 1}):
+            self._delete_file(bucket, old["_id"])
+
+    def _delete_file(self, bucket, file_id):
+        try:
+            bucket.delete(file_id)
+        except NoFile:
+            pass
+
+    def scan(self):
+        for doc in self._files().find({}, {"filename": 1, "length": 1, "uploadDate": 1}):
+            uploaded = doc["uploadDate"].replace(tzinfo=timezone.utc).timestamp()
+            yield doc["filename"], doc.get("length", 0), uploaded
+
+
+# ============================================================
+#  Per-node read-through cache (remote backends only)
+# ============================================================
+
+class ReadCache:
+
+    def __init__(self, folder, max_bytes):
+        self.local = LocalBackend(folder)
+        self.max_bytes = max_bytes
+
+    def open(self, resume_id):
+        source = self.local.open(resume_id)
+        if source is not None:
+            self.local.touch(resume_id)
+        return source
+
+    def fill(self, resume_id, source):
+        """Copy ``source`` into the cache and return the cached file, opened."""
+        self.local.put_stream(resume_id, source)
+        return self.local.open(resume_id)
+
+    def collect(self, live_ids):
+        """Drop entries whose record is gone, then the least recently read beyond the quota."""
+        entries = list(self.local.scan())
+        kept = []
+        for resume_id, size, mtime in entries:
+            if resume_id in live_ids:
+                kept.append((mtime, size, resume_id))
+            else:
+                self.local.delete(resume_id)
+        total = sum(size for _, size, _ in kept)
+        for mtime, size, resume_id in sorted(kept):
+            if total <= self.max_bytes:
+                break
+            self.local.delete(resume_id)
+            total -= size
+        return total
+
+
+# ============================================================
+#  Store
+# ============================================================
+
+class ArtifactStore:
+
+    def __init__(self, backend, cache=None, max_bytes=0, retention_days=0):
+        self.backend = backend
+        self.cache = cache
+        self.max_bytes = max_bytes
+        self.retention_days = retention_days
+        self._lock = threading.Lock()
+        self._gc_running = False
+        # Not due right at startup; every process would scan at once.
+        self._last_gc = time.monotonic()
+        self._bytes = None     # rough running total, exact after each GC
+        self.stats = {
+            "writes": 0,
+            "reads": 0,
+            "cache_hits": 0,
+            "misses": 0,
+            "rebuilt": 0,
+            "migrated": 0,
+            "gc_runs": 0,
+            "gc_removed": 0,
+        }
+
+    def _count(self, field, n=1):
+        with self._lock:
+            self.stats[field] += n
+
+    # -------------------- Read / Write --------------------
+
+    def put(self, resume_id, latex):
+        """Store the .tex for ``resume_id``."""
+        if not _valid_id(resume_id):
+            raise ValueError(f"Invalid resume id: {resume_id!r}")
+        data = latex.encode("utf-8")
+        self.backend.put(resume_id, data)
+        if self.cache is not None:
+            # Whoever generated a resume usually downloads it next, from this node.
+            self.cache.local.put(resume_id, data)
+
+        with self._lock:
+            self.stats["writes"] += 1
+            if self._bytes is not None:
+                self._bytes += len(data)
+        self.maybe_collect()
+
+    def open(self, email, resume_id):
+        """Binary file object for the stored .tex of ``email``'s resume ``resume_id``, or None."""
+        if not _valid_id(resume_id) or not history.owns(email, resume_id):
+            return None
+        return self._open(resume_id)
+
+    def _open(self, resume_id):
+        if self.cache is not None:
+            source = self.cache.open(resume_id)
+            if source is not None:
+                self._count("cache_hits")
+                return source
+
+        source = self.backend.open(resume_id)
+        if source is None:
+            if not self._migrate(resume_id):
+                self._count("misses")
+                return None
+            source = self.backend.open(resume_id)
+            if source is None:
+                return None
+
+        self._count("reads")
+        if self.cache is not None:
+            return self.cache.fill(resume_id, source)
+        return source
+
+    def get(self, email, resume_id):
+        """Return the stored LaTeX of ``email``'s resume ``resume_id`` or None."""
+        source = self.open(email, resume_id)
+        if source is None:
+            return None
+        return b"".join(read_chunks(source)).decode("utf-8")
+
+    def _rebuild(self, email, resume_id):
+        entry = history.get_resume(email, resume_id)
+        if not entry or entry.get("latex") is None:
+            return None
+        self.put(resume_id, entry["latex"])
+        self._count("rebuilt")
+        return entry["latex"]
+
+    def load(self, email, resume_id):
+        """LaTeX of ``email``'s resume ``resume_id``, rebuilding a collected file from its record."""
+        latex = self.get(email, resume_id)
+        if latex is None:
+            latex = self._rebuild(email, resume_id)
+        return latex
+
+    def stream(self, email, resume_id):
+        """Like ``load`` but yields the UTF-8 bytes in chunks; None if there is no such resume."""
+        source = self.open(email, resume_id)
+        if source is not None:
+            return read_chunks(source)
+        latex = self._rebuild(email, resume_id)
+        if latex is None:
+            return None
+        return iter([latex.encode("utf-8")])
+
+    def delete(self, resume_ids):
+        """Remove the files of deleted records."""
+        for resume_id in resume_ids:
+            if not _valid_id(resume_id):
+                continue
+            self.backend.delete(resume_id)
+            if self.cache is not None:
+                self.cache.local.delete(resume_id)
+            try:
+                os.remove(self._legacy_path(resume_id))
+            except FileNotFoundError:
+                pass
+
+    # -------------------- Legacy flat files --------------------
+
+    def _legacy_path(self, resume_id):
+        return os.path.join(settings.TEMP_FOLDER, resume_id + SUFFIX)
+
+    def _migrate(self, resume_id):
+        """Move a flat pre-store file into the backend; True if there was one."""
+        legacy = self._legacy_path(resume_id)
+        try:
+            with span("file_io"), open(legacy, "r", encoding="utf-8") as f:
+                latex = f.read()
+        except FileNotFoundError:
+            return False
+        self.put(resume_id, latex)
+        try:
+            os.remove(legacy)
+        except FileNotFoundError:
+            pass
+        self._count("migrated")
+        return True
+
+    def migrate_legacy(self):
+        """Move every flat TEMP_FOLDER .tex that still has a record into the store."""
+        folder = settings.TEMP_FOLDER
+        if not os.path.isdir(folder):
+            return 0
+        ids = [name[:-len(SUFFIX)] for name in os.listdir(folder) if name.endswith(SUFFIX)]
+        live = history.existing_ids(ids)
+        moved = 0
+        for resume_id in ids:
+            if resume_id in live:
+                moved += self._migrate(resume_id)
+            else:
+                self.delete([resume_id])
+        return moved
+
+    # -------------------- Garbage collection --------------------
+
+    def collect(self, dry_run=False):
+        """One GC pass; returns counts of what was (or would be) removed."""
+        cutoff = time.time() - self.retention_days * 86400 if self.retention_days else None
+        files = list(self.backend.scan())
+        live = history.existing_ids([resume_id for resume_id, _, _ in files])
+
+        removed = {"orphaned": [], "expired": [], "over_quota": []}
+        kept = []
+        for resume_id, size, mtime in files:
+            if resume_id not in live:
+                removed["orphaned"].append(resume_id)
+            elif cutoff is not None and mtime < cutoff:
+                removed["expired"].append(resume_id)
+            else:
+                kept.append((mtime, size, resume_id))
+
+        total = sum(size for _, size, _ in kept)
+        if self.max_bytes:
+            for mtime, size, resume_id in sorted(kept):
+                if total <= self.max_bytes:
+                    break
+                removed["over_quota"].append(resume_id)
+                total -= size
+
+        summary = {reason: len(ids) for reason, ids in removed.items()}
+        summary["kept_bytes"] = total
+        if dry_run:
+            return summary
+
+        for ids in removed.values():
+            for resume_id in ids:
+                self.backend.delete(resume_id)
+        if self.cache is not None:
+            summary["cache_bytes"] = self.collect_cache()
+
+        with self._lock:
+            self._bytes = total
+            self.stats["gc_runs"] += 1
+            self.stats["gc_removed"] += sum(summary[k] for k in removed)
+        return summary
+
+    def collect_cache(self):
+        """Trim this node's read cache; returns the bytes kept."""
+        cached = [resume_id for resume_id, _, _ in self.cache.local.scan()]
+        return self.cache.collect(history.existing_ids(cached))
+
+    def claim_gc(self, over_quota=False):
+        """True if this process may run the next pass on the store.
+
+        One pass per ARTIFACT_GC_INTERVAL across all processes (sooner
+        when over the quota), never two at once.
+        """
+        now = datetime.utcnow()
+        due = {} if over_quota else {"last_run": {"$lte": now - timedelta(seconds=settings.ARTIFACT_GC_INTERVAL)}}
+        try:
+            get_db()[GC_LEASES].update_one(
+                {"_id": self.backend.lease_key(), "running_until": {"$lte": now}, **due},
+                {"$set": {"last_run": now, "running_until": now + timedelta(hours=1), "by": socket.gethostname()}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            # The lease document exists and did not match: not ours this time.
+            return False
+        return True
+
+    def release_gc(self):
+        get_db()[GC_LEASES].update_one(
+            {"_id": self.backend.lease_key()}, {"$set": {"running_until": datetime.utcnow()}},
+        )
+
+    def maybe_collect(self):
+        """Start a background GC pass if the interval has passed or the quota is exceeded."""
+        with self._lock:
+            due = time.monotonic() - self._last_gc >= settings.ARTIFACT_GC_INTERVAL
+            over = self.max_bytes and self._bytes is not None and self._bytes > self.max_bytes
+            if self._gc_running or not (due or over):
+                return
+            self._gc_running = True
+            self._last_gc = time.monotonic()
+
+        def run():
+            try:
+                if self.claim_gc(over_quota=bool(over)):
+                    try:
+                        self.collect()
+                    finally:
+                        self.release_gc()
+                elif self.cache is not None:
+                    self.collect_cache()
+            except Exception as e:
+                print(f"Artifact GC error: {e}")
+            finally:
+                with self._lock:
+                    self._gc_running = False
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                **self.stats,
+                "backend": self.backend.name,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "retention_days": self.retention_days,
+                "cache_max_bytes": self.cache.max_bytes if self.cache is not None else None,
+                "gc_running": self._gc_running,
+            }
+
+
+def _build_store():
+    if settings.ARTIFACT_BACKEND == "gridfs":
+        backend = GridFSBackend(settings.ARTIFACT_GRIDFS_BUCKET)
+        cache = None
+        if settings.ARTIFACT_CACHE_MAX_BYTES:
+            cache = ReadCache(settings.ARTIFACT_CACHE_FOLDER, settings.ARTIFACT_CACHE_MAX_BYTES)
+    elif settings.ARTIFACT_BACKEND == "local":
+        backend = LocalBackend(settings.ARTIFACT_FOLDER)
+        cache = None
+    else:
+        raise ValueError(f"Unknown ARTIFACT_BACKEND: {settings.ARTIFACT_BACKEND}")
+    return ArtifactStore(
+        backend, cache,
+        max_bytes=settings.ARTIFACT_MAX_BYTES,
+        retention_days=settings.ARTIFACT_RETENTION_DAYS,
+    )
+
+
+artifact_store = _build_store()
@@ -0,0 +1,116 @@
+"""
+Admission control for pdflatex.
+
+At most ``max_concurrent`` compiles run at once (one per CPU by default)
+and at most ``max_queue`` more may wait for a slot. Anything beyond that is
+rejected immediately with ``SchedulerFull`` so the view can answer 429
+instead of forking yet another TeX process. Waiting and running compiles
+can be abandoned through a cancel event once their client has gone away.
+"""
+
+import os
+import math
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+from backend.timing import record
+
+
+class SchedulerFull(Exception):
+    """The wait queue is full; ``retry_after`` is a hint in seconds."""
+
+    def __init__(self, retry_after):
+        super().__init__("compile queue is full")
+        self.retry_after = retry_after
+
+
+class CompileCancelled(Exception):
+    """The requesting client disconnected before the compile finished."""
+
+
+class CompileScheduler:
+
+    def __init__(self, max_concurrent, max_queue):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self._cond = threading.Condition()
+        self._running = 0
+        self._waiting = 0
+        self._waits = deque(maxlen=500)
+        self._durations = deque(maxlen=100)
+        self.stats = {
+            "admitted": 0,
+            "rejected": 0,
+            "cancelled": 0,
+        }
+
+    def _retry_after(self):
+        """Rough seconds until a queue slot frees up."""
+        avg = (sum(self._durations) / len(self._durations)) if self._durations else 1.0
+        rounds = (self._waiting + 1) / self.max_concurrent
+        return max(1, math.ceil(avg * rounds))
+
+    def _acquire(self, cancel):
+        started = time.perf_counter()
+        with self._cond:
+            if self._running >= self.max_concurrent and self._waiting >= self.max_queue:
+                self.stats["rejected"] += 1
+                raise SchedulerFull(self._retry_after())
+
+            self._waiting += 1
+            try:
+                while self._running >= self.max_concurrent:
+                    if cancel is not None and cancel.is_set():
+                        self.stats["cancelled"] += 1
+                        raise CompileCancelled()
+                    self._cond.wait(timeout=0.25)
+            finally:
+                self._waiting -= 1
+
+            self._running += 1
+            self.stats["admitted"] += 1
+            self._waits.append(time.perf_counter() - started)
+        record("compile_queue", time.perf_counter() - started)
+
+    def _release(self, duration):
+        with self._cond:
+            self._running -= 1
+            self._durations.append(duration)
+            self._cond.notify()
+
+    def run(self, fn, cancel=None):
+        """Call ``fn()`` once a slot is free; see the module docstring for failures."""
+        self._acquire(cancel)
+        started = time.perf_counter()
+        try:
+            return fn()
+        finally:
+            self._release(time.perf_counter() - started)
+
+    def snapshot(self):
+        with self._cond:
+            waits = sorted(self._waits)
+            return {
+                **self.stats,
+                "running": self._running,
+                "queue_depth": self._waiting,
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "wait_ms": {
+                    "count": len(waits),
+                    "avg": round(1000 * sum(waits) / len(waits), 1) if waits else 0.0,
+                    "p95": round(1000 * waits[int(len(waits) * 0.95)], 1) if waits else 0.0,
+                    "max": round(1000 * waits[-1], 1) if waits else 0.0,
+                },
+            }
+
+
+_concurrency = settings.LATEX_MAX_CONCURRENT or (os.cpu_count() or 1)
+
+compile_scheduler = CompileScheduler(
+    max_concurrent=_concurrency,
+    max_queue=settings.LATEX_MAX_QUEUE or 2 * _concurrency,
+)
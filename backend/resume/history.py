@@ -0,0 +1,106 @@
+"""
+Generated resume history.
+
+Each generated or enhanced resume is its own document in the ``resumes``
+collection, indexed on (email, generated_at), instead of an ever-growing
+``generated_resumes`` array inside the user document. Indexes are made
+at startup (users/apps.py) and again on first sync use if that failed.
+"""
+
+from pymongo import ASCENDING, DESCENDING
+
+from backend.mongo import collection, async_collection
+
+
+COLLECTION = "resumes"
+
+
+def resumes():
+    return collection(COLLECTION)
+
+
+# Everything but the LaTeX body.
+SUMMARY_FIELDS = {"_id": 0, "id": 1, "kind": 1, "job_description_snippet": 1, "generated_at": 1}
+
+_indexes_ready = False
+
+
+def ensure_indexes():
+    global _indexes_ready
+    if _indexes_ready:
+        return
+    resumes().create_index([("email", ASCENDING), ("generated_at", DESCENDING)])
+    resumes().create_index([("id", ASCENDING)], unique=True)
+    _indexes_ready = True
+
+
+def _document(email, entry, kind):
+    return {**entry, "email": email, "kind": kind}
+
+
+def save_resume(email, entry, kind):
+    """Store a generated_resumes-style ``entry`` for ``email``."""
+    ensure_indexes()
+    resumes().insert_one(_document(email, entry, kind))
+
+
+async def asave_resume(email, entry, kind):
+    await async_collection(COLLECTION).insert_one(_document(email, entry, kind))
+
+
+def save_resumes(email, entries, kind):
+    """Store several entries in one bulk insert."""
+    if not entries:
+        return
+    ensure_indexes()
+    resumes().insert_many([_document(email, entry, kind) for entry in entries], ordered=False)
+
+
+async def asave_resumes(email, entries, kind):
+    if not entries:
+        return
+    await async_collection(COLLECTION).insert_many(
+        [_document(email, entry, kind) for entry in entries], ordered=False
+    )
+
+
+def get_resume(email, resume_id):
+    ensure_indexes()
+    return resumes().find_one({"email": email, "id": resume_id}, {"_id": 0, "email": 0})
+
+
+def owns(email, resume_id):
+    """True if ``resume_id`` is a record of ``email``."""
+    ensure_indexes()
+    return resumes().find_one({"id": resume_id, "email": email}, {"_id": 1}) is not None
+
+
+def list_resumes(email, page=1, page_size=20):
+    """Return (summaries, total) for one page of ``email``'s history, newest first."""
+    ensure_indexes()
+    query = {"email": email}
+    total = resumes().count_documents(query)
+    cursor = (
+        resumes().find(query, SUMMARY_FIELDS)
+        .sort("generated_at", DESCENDING)
+        .skip((page - 1) * page_size)
+        .limit(page_size)
+    )
+    return list(cursor), total
+
+
+def existing_ids(resume_ids):
+    """The subset of ``resume_ids`` that still have a record."""
+    ids = list(resume_ids)
+    found = set()
+    for start in range(0, len(ids), 1000):
+        cursor = resumes().find({"id": {"$in": ids[start:start + 1000]}}, {"_id": 0, "id": 1})
+        found.update(doc["id"] for doc in cursor)
+    return found
+
+
+def delete_for_user(email):
+    """Delete ``email``'s history and return the ids that were removed."""
+    ids = [doc["id"] for doc in resumes().find({"email": email}, {"_id": 0, "id": 1})]
+    resumes().delete_many({"email": email})
+    return ids
@@ -0,0 +1,182 @@
+"""
+Mongo-backed job queue for resume generation and enhancement.
+
+Web processes only insert jobs and read their status; the LLM call and the
+DB / .tex writes happen in ``manage.py resume_worker`` processes, which can
+be scaled separately. Jobs live in the ``resume_jobs`` collection so they
+survive restarts. A worker claims a job with a time-limited lease; if the
+worker dies the lease runs out and another worker picks the job up again,
+or the job fails once it has used all its attempts. Results and errors
+are only recorded by the worker that still holds the lease.
+"""
+
+import uuid
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from pymongo import ReturnDocument, ASCENDING
+
+from backend.mongo import collection
+
+
+def jobs():
+    return collection("resume_jobs")
+
+
+KINDS = ("generate", "enhance")
+
+
+class PermanentJobError(Exception):
+    """The job cannot succeed on a retry (e.g. its user or template is gone)."""
+
+_indexes_ready = False
+
+
+def ensure_indexes():
+    global _indexes_ready
+    if _indexes_ready:
+        return
+    jobs().create_index([("status", ASCENDING), ("created_at", ASCENDING)])
+    jobs().create_index([("email", ASCENDING), ("created_at", ASCENDING)])
+    _indexes_ready = True
+
+
+def _new_job(kind, email, params):
+    if kind not in KINDS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    return {
+        "_id": str(uuid.uuid4()),
+        "kind": kind,
+        "email": email,
+        "params": params,
+        "status": "queued",
+        "attempts": 0,
+        "result": None,
+        "error": None,
+        "created_at": datetime.utcnow(),
+        "started_at": None,
+        "finished_at": None,
+        "lease_until": None,
+    }
+
+
+def enqueue(kind, email, params):
+    """Queue a job and return its id."""
+    ensure_indexes()
+    job = _new_job(kind, email, params)
+    jobs().insert_one(job)
+    return job["_id"]
+
+
+def enqueue_many(kind, email, params_list):
+    """Queue one job per ``params`` in a single insert; returns the ids in order."""
+    ensure_indexes()
+    docs = [_new_job(kind, email, params) for params in params_list]
+    jobs().insert_many(docs)
+    return [doc["_id"] for doc in docs]
+
+
+def expire_leases(now=None):
+    """Fail running jobs whose lease ran out on their last attempt; returns how many."""
+    now = now or datetime.utcnow()
+    result = jobs().update_many(
+        {
+            "status": "running",
+            "lease_until": {"$lt": now},
+            "attempts": {"$gte": settings.RESUME_JOB_MAX_ATTEMPTS},
+        },
+        {"$set": {
+            "status": "failed",
+            "error": "Worker stopped before finishing the last attempt",
+            "finished_at": now,
+            "lease_until": None,
+        }},
+    )
+    return result.modified_count
+
+
+def claim(worker_id):
+    """Lease the oldest runnable job to ``worker_id``; None when the queue is empty."""
+    now = datetime.utcnow()
+    expire_leases(now)
+    return jobs().find_one_and_update(
+        {
+            "$or": [
+                {"status": "queued"},
+                # Picked up by a worker that died before finishing.
+                {"status": "running", "lease_until": {"$lt": now}},
+            ],
+            "attempts": {"$lt": settings.RESUME_JOB_MAX_ATTEMPTS},
+        },
+        {
+            "$set": {
+                "status": "running",
+                "worker": worker_id,
+                "started_at": now,
+                "lease_until": now + timedelta(seconds=settings.RESUME_JOB_LEASE_SECONDS),
+            },
+            "$inc": {"attempts": 1},
+        },
+        sort=[("created_at", ASCENDING)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+def _owned(job):
+    """Filter matching ``job`` only while the worker that claimed it still holds it."""
+    return {"_id": job["_id"], "worker": job["worker"], "status": "running"}
+
+
+def complete(job, result):
+    """Store ``result``; False when the lease was lost to another worker meanwhile."""
+    updated = jobs().update_one(
+        _owned(job),
+        {"$set": {
+            "status": "done",
+            "result": result,
+            "finished_at": datetime.utcnow(),
+            "lease_until": None,
+        }}
+    )
+    return updated.modified_count > 0
+
+
+def fail(job, error):
+    """Record ``error``; the job goes back to the queue while it has attempts left.
+
+    PermanentJobError fails it right away. Returns False when the lease
+    was lost to another worker meanwhile.
+    """
+    retry = (
+        not isinstance(error, PermanentJobError)
+        and job.get("attempts", 0) < settings.RESUME_JOB_MAX_ATTEMPTS
+    )
+    updated = jobs().update_one(
+        _owned(job),
+        {"$set": {
+            "status": "queued" if retry else "failed",
+            "error": str(error),
+            "finished_at": None if retry else datetime.utcnow(),
+            "lease_until": None,
+        }}
+    )
+    return updated.modified_count > 0
+
+
+def get_job(job_id, email):
+    """Return the job if it belongs to ``email``."""
+    return jobs().find_one({"_id": job_id, "email": email}, {"params": 0})
+
+
+def job_status(job):
+    """JSON-safe view of a job document."""
+    return {
+        "job_id": job["_id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "attempts": job.get("attempts", 0),
+        "result": job.get("result"),
+        "error": job.get("error"),
+        "created_at": job["created_at"].isoformat() if job.get("created_at") else None,
+        "finished_at": job["finished_at"].isoformat() if job.get("finished_at") else None,
+    }
@@ -0,0 +1,466 @@
+"""
+pdflatex compile engine with precompiled preambles and warm workers.
+
+Most of a one-page resume compile is pdflatex starting up and loading the
+preamble's packages. For every distinct preamble (everything before
+``\\begin{document}``) the engine dumps a format file once, using
+``mylatexformat``, and later compiles load that format instead. A few
+``pdflatex -fmt=<preamble>`` processes per hot format are kept spawned and
+parked on their ``**`` prompt, so a compile only has to hand them a file
+name. Anything that goes wrong on the fast path falls back to a plain
+cold compile.
+
+Format dumps are background work queued by ``warm_up``: one builder
+thread runs them one at a time, each holding a compile_scheduler slot
+like any compile. Idle warm workers are capped across all formats by
+``max_idle_workers``; a hot format takes them from the least recently
+used ones.
+"""
+
+import os
+import re
+import shutil
+import hashlib
+import tempfile
+import threading
+import subprocess
+import time
+import atexit
+from collections import OrderedDict, deque
+
+from django.conf import settings
+
+from .compile_scheduler import compile_scheduler, CompileCancelled, SchedulerFull
+
+
+PDFLATEX = "pdflatex"
+COMPILE_ARGS = ["-interaction=nonstopmode", "-halt-on-error"]
+
+# pdflatex output when the precompiled format itself could not be loaded.
+FORMAT_ERROR_RE = re.compile(r"format file|\.fmt\b", re.IGNORECASE)
+
+
+class LatexCompileError(Exception):
+    """pdflatex ran but produced no PDF."""
+
+    def __init__(self, stdout="", stderr="", log=""):
+        super().__init__("pdflatex failed")
+        self.stdout = stdout
+        self.stderr = stderr
+        self.log = log
+
+
+def clean_latex(text):
+    """Remove characters that break pdflatex."""
+    text = text.replace("\u2013", "-")
+    text = text.replace("\u2014", "-")
+    text = text.replace("\u00A0", " ")
+    text = re.sub(r"[^\x00-\x7F]+", " ", text)  # remove all unicode
+    return text
+
+
+def split_preamble(latex):
+    """Return the preamble of ``latex`` or None when it has no document body."""
+    idx = latex.find("\\begin{document}")
+    if idx <= 0:
+        return None
+    return latex[:idx]
+
+
+def preamble_hash(preamble):
+    return hashlib.sha256(preamble.encode("utf-8")).hexdigest()[:32]
+
+
+def _read_result(workdir, result_stdout, result_stderr):
+    """Return the PDF bytes from ``workdir`` or raise LatexCompileError."""
+    local_pdf = os.path.join(workdir, "resume.pdf")
+
+    if not os.path.exists(local_pdf):
+        log_path = os.path.join(workdir, "resume.log")
+        log_text = ""
+        if os.path.exists(log_path):
+            with open(log_path, "r", errors="ignore") as lf:
+                log_text = lf.read()
+
+        raise LatexCompileError(result_stdout, result_stderr, log_text)
+
+    with open(local_pdf, "rb") as f:
+        return f.read()
+
+
+def _communicate(proc, input, timeout, cancel):
+    """``proc.communicate`` that also gives up when ``cancel`` is set."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return proc.communicate(input, timeout=0.25)
+        except subprocess.TimeoutExpired:
+            if cancel is not None and cancel.is_set():
+                proc.kill()
+                proc.communicate()
+                raise CompileCancelled()
+            if time.monotonic() >= deadline:
+                proc.kill()
+                proc.communicate()
+                raise subprocess.TimeoutExpired(proc.args, timeout)
+
+
+def _run(args, cwd, timeout, cancel, env=None):
+    proc = subprocess.Popen(
+        args,
+        cwd=cwd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        env=env,
+        text=True,
+    )
+    return _communicate(proc, None, timeout, cancel)
+
+
+# ============================================================
+#  Warm Worker
+# ============================================================
+
+class _WarmWorker:
+    """A pdflatex process that has loaded its format and waits for a file name."""
+
+    def __init__(self, fmt_key, fmt_folder):
+        self.fmt_key = fmt_key
+        self.workdir = tempfile.mkdtemp(prefix="latexw-")
+        env = dict(os.environ)
+        # Trailing separator keeps the default format search path.
+        env["TEXFORMATS"] = fmt_folder + os.pathsep
+        self.proc = subprocess.Popen(
+            [PDFLATEX, *COMPILE_ARGS, f"-fmt={fmt_key}"],
+            cwd=self.workdir,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            env=env,
+            text=True,
+        )
+
+    def alive(self):
+        return self.proc.poll() is None
+
+    def compile(self, latex_cleaned, timeout, cancel=None):
+        with open(os.path.join(self.workdir, "resume.tex"), "w", encoding="utf-8") as f:
+            f.write(latex_cleaned)
+        stdout, stderr = _communicate(self.proc, "resume.tex\n", timeout, cancel)
+        return _read_result(self.workdir, stdout, stderr)
+
+    def close(self):
+        if self.alive():
+            self.proc.kill()
+            self.proc.communicate()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+# ============================================================
+#  Engine
+# ============================================================
+
+class CompileEngine:
+
+    def __init__(self, fmt_folder, warm_workers, max_formats, timeout, max_idle_workers=None, scheduler=None):
+        self.fmt_folder = fmt_folder
+        self.warm_workers = warm_workers
+        self.max_formats = max_formats
+        self.timeout = timeout
+        self.max_idle_workers = warm_workers if max_idle_workers is None else max_idle_workers
+        self.scheduler = scheduler
+        self._lock = threading.Lock()
+        self._pools = OrderedDict()   # fmt_key -> [idle _WarmWorker], most recent last
+        self._spawning = 0
+        self._building = set()        # queued or being built
+        self._pending = deque()       # (fmt_key, preamble) waiting for the builder
+        self._builder_running = False
+        self._failed = set()          # preambles that could not be dumped
+        self._latencies = deque(maxlen=500)
+        self.stats = {
+            "warm": 0,
+            "format": 0,
+            "cold": 0,
+            "fallbacks": 0,
+            "formats_built": 0,
+            "format_failures": 0,
+        }
+        atexit.register(self.shutdown)
+
+    # -------------------- Formats --------------------
+
+    def _fmt_path(self, key):
+        return os.path.join(self.fmt_folder, f"{key}.fmt")
+
+    def has_format(self, key):
+        return os.path.exists(self._fmt_path(key))
+
+    def build_format(self, preamble):
+        """Dump ``preamble`` into a .fmt file; return its key or None."""
+        key = preamble_hash(preamble)
+        if self.has_format(key):
+            return key
+
+        os.makedirs(self.fmt_folder, exist_ok=True)
+        with tempfile.TemporaryDirectory() as tmp:
+            with open(os.path.join(tmp, "preamble.tex"), "w", encoding="utf-8") as f:
+                f.write(preamble)
+                f.write("\\begin{document}\n\\end{document}\n")
+            try:
+                subprocess.run(
+                    [PDFLATEX, "-ini", *COMPILE_ARGS, f"-jobname={key}",
+                     "&pdflatex", "mylatexformat.ltx", "preamble.tex"],
+                    cwd=tmp,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    timeout=self.timeout,
+                    text=True,
+                )
+            except (subprocess.TimeoutExpired, OSError):
+                pass
+
+            built = os.path.join(tmp, f"{key}.fmt")
+            if not os.path.exists(built):
+                with self._lock:
+                    self._failed.add(key)
+                    self.stats["format_failures"] += 1
+                return None
+            os.replace(built, self._fmt_path(key))
+
+        with self._lock:
+            self.stats["formats_built"] += 1
+        return key
+
+    def warm_up(self, preamble):
+        """Queue a background format build for ``preamble``, then pre-spawn workers.
+
+        At most ``max_formats`` builds wait; further ones are dropped until
+        the preamble is asked for again.
+        """
+        key = preamble_hash(preamble)
+        with self._lock:
+            if key in self._building or key in self._failed or len(self._pending) >= self.max_formats:
+                return
+            self._building.add(key)
+            self._pending.append((key, preamble))
+            if self._builder_running:
+                return
+            self._builder_running = True
+
+        threading.Thread(target=self._build_pending, daemon=True).start()
+
+    def _build_pending(self):
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._builder_running = False
+                    return
+                key, preamble = self._pending.popleft()
+            try:
+                if self.has_format(key) or self._scheduled(lambda: self.build_format(preamble)):
+                    self._refill(key)
+            except SchedulerFull:
+                pass  # busy compiling; the next warm_up queues it again
+            except Exception as e:
+                print(f"Format build error: {e}")
+            finally:
+                with self._lock:
+                    self._building.discard(key)
+
+    def _scheduled(self, fn):
+        return self.scheduler.run(fn) if self.scheduler is not None else fn()
+
+    # -------------------- Worker Pools --------------------
+
+    def _take_worker(self, key):
+        found = None
+        dead = []
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is not None:
+                self._pools.move_to_end(key)
+                while pool:
+                    worker = pool.pop()
+                    if worker.alive():
+                        found = worker
+                        break
+                    dead.append(worker)
+
+        # Reaping and removing the work dir can block; not under the lock.
+        for worker in dead:
+            worker.close()
+        return found
+
+    def _idle_workers(self):
+        return sum(len(pool) for pool in self._pools.values())
+
+    def _refill(self, key):
+        """Top the pool for ``key`` back up to ``warm_workers`` idle processes, within ``max_idle_workers``."""
+        if self.warm_workers <= 0 or self.max_idle_workers <= 0 or not self.has_format(key):
+            return
+        retired = []
+        with self._lock:
+            pool = self._pools.setdefault(key, [])
+            self._pools.move_to_end(key)
+            while len(self._pools) > self.max_formats:
+                _, old_pool = self._pools.popitem(last=False)
+                retired.extend(old_pool)
+
+            wanted = max(0, min(self.warm_workers, self.max_idle_workers) - len(pool))
+            # Least recently used formats give up their workers first.
+            for other in list(self._pools):
+                over = self._idle_workers() + self._spawning + wanted - self.max_idle_workers
+                if over <= 0:
+                    break
+                if other == key:
+                    continue
+                other_pool = self._pools[other]
+                retired.extend(other_pool[:over])
+                del other_pool[:over]
+                if not other_pool:
+                    del self._pools[other]
+            missing = max(0, min(wanted, self.max_idle_workers - self._idle_workers() - self._spawning))
+            self._spawning += missing
+
+        for worker in retired:
+            worker.close()
+
+        try:
+            for _ in range(missing):
+                try:
+                    worker = _WarmWorker(key, self.fmt_folder)
+                except OSError:
+                    return
+                with self._lock:
+                    self._spawning -= 1
+                    missing -= 1
+                    pool = self._pools.get(key)
+                    if pool is not None:
+                        pool.append(worker)
+                        continue
+                # The format was retired meanwhile.
+                worker.close()
+                return
+        finally:
+            with self._lock:
+                self._spawning -= missing
+
+    # -------------------- Compiling --------------------
+
+    def compile_cold(self, latex_cleaned, cancel=None):
+        """Plain pdflatex run in a throwaway directory."""
+        with tempfile.TemporaryDirectory() as tmp:
+            with open(os.path.join(tmp, "resume.tex"), "w", encoding="utf-8") as f:
+                f.write(latex_cleaned)
+
+            stdout, stderr = _run(
+                [PDFLATEX, *COMPILE_ARGS, "resume.tex"],
+                tmp, self.timeout, cancel,
+            )
+            return _read_result(tmp, stdout, stderr)
+
+    def compile_with_format(self, key, latex_cleaned, cancel=None):
+        with tempfile.TemporaryDirectory() as tmp:
+            with open(os.path.join(tmp, "resume.tex"), "w", encoding="utf-8") as f:
+                f.write(latex_cleaned)
+
+            env = dict(os.environ)
+            env["TEXFORMATS"] = self.fmt_folder + os.pathsep
+            stdout, stderr = _run(
+                [PDFLATEX, *COMPILE_ARGS, f"-fmt={key}", "resume.tex"],
+                tmp, self.timeout, cancel, env=env,
+            )
+            return _read_result(tmp, stdout, stderr)
+
+    def compile(self, latex_cleaned, cancel=None):
+        """Return PDF bytes for ``latex_cleaned`` using the fastest path available.
+
+        Setting ``cancel`` (a threading.Event) kills the running pdflatex and
+        raises CompileCancelled.
+        """
+        started = time.perf_counter()
+        preamble = split_preamble(latex_cleaned)
+        key = preamble_hash(preamble) if preamble else None
+        mode = "cold"
+
+        try:
+            if key and self.has_format(key):
+                try:
+                    worker = self._take_worker(key)
+                    if worker:
+                        mode = "warm"
+                        try:
+                            return worker.compile(latex_cleaned, self.timeout, cancel)
+                        finally:
+                            worker.close()
+                            threading.Thread(target=self._refill, args=(key,), daemon=True).start()
+                    mode = "format"
+                    if key not in self._pools:
+                        threading.Thread(target=self._refill, args=(key,), daemon=True).start()
+                    return self.compile_with_format(key, latex_cleaned, cancel)
+                except (subprocess.TimeoutExpired, CompileCancelled):
+                    raise
+                except LatexCompileError as e:
+                    # An error in the document itself would fail cold too.
+                    if not FORMAT_ERROR_RE.search(f"{e.stdout}\n{e.log}"):
+                        raise
+                    with self._lock:
+                        self.stats["fallbacks"] += 1
+                    mode = "cold"
+                except Exception:
+                    # A stale or incompatible format must never cost a preview.
+                    with self._lock:
+                        self.stats["fallbacks"] += 1
+                    mode = "cold"
+            elif preamble:
+                self.warm_up(preamble)
+
+            return self.compile_cold(latex_cleaned, cancel)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.stats[mode] += 1
+                self._latencies.append((mode, elapsed))
+
+    # -------------------- Reporting --------------------
+
+    def snapshot(self):
+        with self._lock:
+            by_mode = {}
+            for mode, elapsed in self._latencies:
+                by_mode.setdefault(mode, []).append(elapsed)
+            latency = {}
+            for mode, values in by_mode.items():
+                values.sort()
+                latency[mode] = {
+                    "count": len(values),
+                    "avg_ms": round(1000 * sum(values) / len(values), 1),
+                    "p50_ms": round(1000 * values[len(values) // 2], 1),
+                    "max_ms": round(1000 * values[-1], 1),
+                }
+            return {
+                **self.stats,
+                "warm_formats": len(self._pools),
+                "idle_workers": self._idle_workers(),
+                "max_idle_workers": self.max_idle_workers,
+                "formats_queued": len(self._pending),
+                "latency": latency,
+            }
+
+    def shutdown(self):
+        with self._lock:
+            pools = list(self._pools.values())
+            self._pools.clear()
+        for pool in pools:
+            for worker in pool:
+                worker.close()
+
+
+compile_engine = CompileEngine(
+    settings.LATEX_FORMAT_FOLDER,
+    warm_workers=settings.LATEX_WARM_WORKERS,
+    max_formats=settings.LATEX_MAX_WARM_FORMATS,
+    timeout=settings.LATEX_COMPILE_TIMEOUT,
+    max_idle_workers=settings.LATEX_MAX_IDLE_WORKERS,
+    scheduler=compile_scheduler,
+)
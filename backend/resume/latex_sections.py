@@ -0,0 +1,194 @@
+"""
+Section-level view of a LaTeX resume, for incremental enhance.
+
+``split`` cuts a document into a preamble, one ``Section`` per
+``\\section{...}`` block and a tail (``\\end{document}`` onwards); joining
+the pieces gives back the input byte for byte. ``plan`` picks the
+sections an enhance context is about, ``merge`` puts Gemini's rewrites of
+just those sections back. Everything that was not sent keeps its exact
+bytes, so the compiled-PDF cache still recognises unchanged documents.
+"""
+
+import re
+
+
+SECTION_RE = re.compile(r"\\section\*?\s*(?:\[[^\]]*\]\s*)?\{")
+ITEM_RE = re.compile(r"\\(?:resumeItem|resumeSubItem|item)\b\s*(?:\{([^\n]*)\}|([^\n]*))")
+MARKER_RE = re.compile(r"^%%% SECTION (\d+)[ \t]*$", re.MULTILINE)
+WORD_RE = re.compile(r"[a-z][a-z+#.]{2,}")
+
+MARKER = "%%% SECTION {}"
+
+
+class RewriteRejected(ValueError):
+    """None of the sections Gemini sent back could be merged; ``sections`` names the ones asked for."""
+
+    def __init__(self, sections):
+        super().__init__(f"Gemini's rewrite of {', '.join(sections)} was not valid LaTeX; nothing was changed")
+        self.sections = sections
+
+
+# Words in an enhance context that point at a section, by title keyword.
+TOPICS = {
+    "experience": {"experience", "work", "job", "jobs", "role", "roles", "employment", "internship", "internships"},
+    "skill": {"skill", "skills", "technologies", "technical", "tools", "stack", "languages"},
+    "project": {"project", "projects", "portfolio"},
+    "education": {"education", "degree", "university", "college", "gpa", "coursework"},
+    "summary": {"summary", "objective", "profile", "about"},
+    "certification": {"certification", "certifications", "certificate", "certificates"},
+    "achievement": {"achievement", "achievements", "awards", "honors"},
+}
+
+
+class Section:
+
+    def __init__(self, index, title, text):
+        self.index = index
+        self.title = title
+        # "\\textbf{Experience}" -> "Experience"
+        self.name = " ".join(re.sub(r"\\[a-zA-Z]+\*?|[{}]", " ", title).split())
+        self.text = text
+        self.items = [(a or b).strip() for a, b in ITEM_RE.findall(text)]
+
+    def words(self):
+        return set(WORD_RE.findall(" ".join([self.title] + self.items).lower()))
+
+
+def _closing_brace(text, start):
+    """Index just past the brace group opened at ``text[start - 1]``, or None."""
+    depth = 1
+    i = start
+    while i < len(text):
+        ch = text[i]
+        if ch == "\\":
+            i += 2
+            continue
+        if ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    return None
+
+
+def _in_comment(text, pos):
+    line_start = text.rfind("\n", 0, pos) + 1
+    return re.search(r"(?<!\\)%", text[line_start:pos]) is not None
+
+
+def split(latex):
+    """Return (preamble, sections, tail), or None when there are no sections."""
+    end = latex.rfind("\\end{document}")
+    body_end = end if end != -1 else len(latex)
+
+    starts = []
+    for match in SECTION_RE.finditer(latex, 0, body_end):
+        if _in_comment(latex, match.start()):
+            continue
+        close = _closing_brace(latex, match.end())
+        if close is None:
+            continue
+        starts.append((match.start(), latex[match.end():close - 1]))
+
+    if not starts:
+        return None
+
+    sections = []
+    for n, (start, title) in enumerate(starts):
+        stop = starts[n + 1][0] if n + 1 < len(starts) else body_end
+        sections.append(Section(n, title, latex[start:stop]))
+    return latex[:starts[0][0]], sections, latex[body_end:]
+
+
+def plan(latex, context, requested=None):
+    """Sections to send for ``context``: (preamble, sections, tail, chosen) or None.
+
+    ``requested`` is an optional list of section titles from the client.
+    Otherwise sections whose title topic the context names are chosen,
+    then bullet sections sharing words with the context, then all bullet
+    sections. None means the document should be enhanced as a whole.
+    """
+    parts = split(latex)
+    if parts is None:
+        return None
+    preamble, sections, tail = parts
+
+    if requested:
+        wanted = {t.strip().lower() for t in requested if isinstance(t, str)}
+        chosen = [s for s in sections if s.name.lower() in wanted and balanced(s.text)]
+        return (preamble, sections, tail, chosen) if chosen else None
+
+    # A section whose own braces or environments do not close cannot be swapped on its own.
+    sections_ok = [s for s in sections if balanced(s.text)]
+    words = set(WORD_RE.findall(context.lower()))
+    chosen = [
+        s for s in sections_ok
+        if any(topic in s.name.lower() and words & synonyms for topic, synonyms in TOPICS.items())
+    ]
+    if not chosen:
+        bullets = [s for s in sections_ok if s.items]
+        chosen = [s for s in bullets if words & s.words()] or bullets
+    if not chosen:
+        return None
+    return preamble, sections, tail, chosen
+
+
+def render(chosen):
+    """The chosen sections, each after its marker line, for the prompt."""
+    return "\n".join(f"{MARKER.format(s.index)}\n{s.text.rstrip()}\n" for s in chosen)
+
+
+def balanced(text):
+    """True when braces close in order and every \\begin has an \\end."""
+    if text.count("\\begin{") != text.count("\\end{"):
+        return False
+    depth = 0
+    i = 0
+    while i < len(text):
+        ch = text[i]
+        if ch == "\\":
+            i += 2
+            continue
+        if ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth < 0:
+                return False
+        i += 1
+    return depth == 0
+
+
+def parse_response(text, chosen):
+    """Map section index -> rewritten text for every usable section in Gemini's answer."""
+    text = re.sub(r"^```[a-zA-Z]*[ \t]*$", "", text, flags=re.MULTILINE)
+    pieces = MARKER_RE.split(text)
+    by_index = {s.index: s for s in chosen}
+    rewrites = {}
+
+    if len(pieces) == 1 and len(chosen) == 1:
+        pieces = ["", str(chosen[0].index), text]
+
+    for marker, body in zip(pieces[1::2], pieces[2::2]):
+        index = int(marker)
+        body = body.strip()
+        if index in by_index and SECTION_RE.match(body) and balanced(body):
+            rewrites[index] = body
+    return rewrites
+
+
+def merge(preamble, sections, tail, rewrites):
+    """Reassemble the document; sections without a rewrite keep their bytes."""
+    out = [preamble]
+    for section in sections:
+        new = rewrites.get(section.index)
+        if new is None:
+            out.append(section.text)
+        else:
+            # Keep the original spacing before the next section.
+            trailing = section.text[len(section.text.rstrip()):]
+            out.append(new + trailing)
+    out.append(tail)
+    return "".join(out)
@@ -0,0 +1,511 @@
+import io
+import os
+import json
+import time
+import shutil
+import tempfile
+import threading
+import subprocess
+from datetime import datetime
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from reportlab.pdfgen import canvas
+
+from backend import mongo
+from backend.gemini_stub import GeminiStub
+from resume.artifacts import artifact_store
+
+import users.urls
+import resume.urls
+import coldconnect.urls
+
+
+APPS = (("/user/", users.urls), ("/resume/", resume.urls), ("/coldconnect/", coldconnect.urls))
+
+TEMPLATE = (
+    "\\documentclass{article}\n\\begin{document}\n"
+    "\\section{Experience}\n%EXPERIENCE%\n\\section{Skills}\n%SKILLS%\n"
+    "\\end{document}\n"
+)
+
+RESUME_LATEX = (
+    "\\documentclass{article}\n\\begin{document}\n"
+    "\\section{Summary}\nBackend engineer.\n\n"
+    "\\section{Experience}\n\\begin{itemize}\n"
+    + "".join(f"  \\item Built and ran Python APIs at Company {n}.\n" for n in range(6))
+    + "\\end{itemize}\n\n"
+    "\\section{Skills}\nPython, Django, MongoDB\n"
+    "\\end{document}\n"
+)
+
+PROFILE = {
+    "name": "Bench User",
+    "skills": ["Python", "Django", "MongoDB", "Redis", "Kubernetes"],
+    "experience": [
+        {"company": f"Company {n}", "role": "Backend Engineer", "description": "Built and ran APIs. " * 20}
+        for n in range(4)
+    ],
+    "projects": [{"name": f"Project {n}", "description": "Side project. " * 10} for n in range(4)],
+}
+
+METRICS_TOKEN = "bench-metrics-token"
+
+JOB_DESCRIPTION = "Backend engineer working on Python services, queues and data pipelines. " * 15
+
+
+# ============================================================
+#  Fixtures
+# ============================================================
+
+def resume_pdf():
+    """A one-page text PDF standing in for an uploaded resume."""
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer)
+    c.setFont("Helvetica", 10)
+    y = 800
+    for line in ["Bench User - Backend Engineer"] + [f"Company {n}: built and ran Python APIs." for n in range(40)]:
+        c.drawString(50, y, line)
+        y -= 18
+    c.save()
+    return buffer.getvalue()
+
+
+def post_json(client, path, data, **extra):
+    return client.post(path, data=json.dumps(data), content_type="application/json", **extra)
+
+
+def read_all(response):
+    """Consume the body, including streamed (SSE) responses."""
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    else:
+        response.content
+    return response
+
+
+class Worker:
+    """One simulated user with its own session, saved resume, history entry and queued job."""
+
+    def __init__(self, run_id, n, pdf):
+        self.pdf = pdf
+        self.email = f"bench-{run_id}-{n}@example.com"
+        self.password = "bench-password"
+        self.gemini_key = f"bench-key-{run_id}-{n}"
+        self.client = Client()
+        self.resume_id = None
+        self.job_id = None
+        self.template_id = None
+        self.sequence = 0
+
+    def next(self):
+        self.sequence += 1
+        return f"{self.email}-{self.sequence}"
+
+    def signup(self, client, email):
+        res = post_json(client, "/user/signup/", {
+            "username": email.split("@")[0], "email": email,
+            "password": self.password, "gemini_key": self.gemini_key,
+        })
+        _expect(res, "signup")
+
+    def setup(self):
+        self.signup(self.client, self.email)
+        _expect(post_json(self.client, "/user/profile/update/", {"profile_data": PROFILE}), "profile update")
+        upload = SimpleUploadedFile("resume.pdf", self.pdf, content_type="application/pdf")
+        _expect(self.client.post("/coldconnect/resume/", {"resume_file": upload}), "resume upload")
+
+        res = _expect(post_json(self.client, "/resume/generate/", {"template": TEMPLATE, "job_description": JOB_DESCRIPTION}), "generate")
+        self.resume_id = res.json()["id"]
+        res = _expect(post_json(self.client, "/resume/generate/", {
+            "template": TEMPLATE, "job_description": JOB_DESCRIPTION, "background": True,
+        }), "enqueue")
+        self.job_id = res.json()["job_id"]
+        res = _expect(post_json(self.client, "/resume/templates/", {"template": TEMPLATE, "name": "Bench"}), "template upload")
+        self.template_id = res.json()["template"]["id"]
+
+
+def _expect(response, what):
+    if response.status_code >= 400:
+        raise CommandError(f"Benchmark setup failed at {what}: {response.status_code} {response.content[:300]!r}")
+    return response
+
+
+# ============================================================
+#  Scenarios
+#  Keyed by URL route, the same label /metrics uses. Each one may do
+#  untimed setup and returns the request to time.
+# ============================================================
+
+def _outreach(kind):
+    def scenario(worker, i):
+        form = {
+            "company_name": f"Company {worker.next()}",
+            "job_description": "Backend Engineer",
+            "tone": "professional",
+            "platform": "linkedin",
+            "character_limit": "300",
+        }
+        return lambda: worker.client.post(f"/coldconnect/{kind}/", form)
+    return scenario
+
+
+def _logout(worker, i):
+    client = Client()
+    _expect(post_json(client, "/user/login/", {"email": worker.email, "password": worker.password}), "login")
+    return lambda: client.post("/user/logout/")
+
+
+def _delete(worker, i):
+    client = Client()
+    worker.signup(client, worker.next())
+    return lambda: client.delete("/user/delete/")
+
+
+def _bulk(worker, i):
+    rows = [{"company": f"Company {worker.next()}", "role": "Backend Engineer"} for _ in range(5)]
+    return lambda: worker.client.post("/coldconnect/bulk/", {"rows": json.dumps(rows), "kind": "cold_dm"})
+
+
+def _template(worker):
+    # A distinct template per call, so every registration is a new one.
+    return TEMPLATE.replace("\\end{document}", f"% {worker.next()}\n\\end{{document}}")
+
+
+def _stats(path):
+    return lambda w, i: lambda: w.client.get(path, HTTP_AUTHORIZATION=f"Bearer {METRICS_TOKEN}")
+
+
+def _upload(worker, i):
+    upload = SimpleUploadedFile("resume.pdf", worker.pdf, content_type="application/pdf")
+    return lambda: worker.client.post("/coldconnect/resume/", {"resume_file": upload})
+
+
+SCENARIOS = {
+    # users
+    "/user/signup/": lambda w, i: lambda: post_json(Client(), "/user/signup/", {
+        "username": "bench", "email": w.next(), "password": w.password, "gemini_key": w.gemini_key,
+    }),
+    "/user/login/": lambda w, i: lambda: post_json(Client(), "/user/login/", {"email": w.email, "password": w.password}),
+    "/user/logout/": _logout,
+    "/user/profile/": lambda w, i: lambda: w.client.get("/user/profile/"),
+    "/user/profile/update/": lambda w, i: lambda: post_json(w.client, "/user/profile/update/", {"profile_data": PROFILE}),
+    "/user/gemini/update/": lambda w, i: lambda: post_json(w.client, "/user/gemini/update/", {"gemini_key": w.gemini_key}),
+    "/user/gemini/budget/": lambda w, i: lambda: w.client.get("/user/gemini/budget/"),
+    "/user/delete/": _delete,
+    "/user/password-hasher/stats/": _stats("/user/password-hasher/stats/"),
+
+    # resume
+    "/resume/generate-pdf/": lambda w, i: lambda: w.client.get("/resume/generate-pdf/"),
+    "/resume/generate/": lambda w, i: lambda: post_json(w.client, "/resume/generate/", {
+        "template": TEMPLATE, "job_description": f"{JOB_DESCRIPTION} ({w.next()})",
+    }),
+    "/resume/generate/batch/": lambda w, i: lambda: post_json(w.client, "/resume/generate/batch/", {
+        "template": TEMPLATE, "job_descriptions": [f"{JOB_DESCRIPTION} ({w.next()})" for _ in range(3)],
+    }),
+    "/resume/enhance/": lambda w, i: lambda: post_json(w.client, "/resume/enhance/", {
+        "latex": RESUME_LATEX, "context": f"Emphasise distributed systems in my experience ({w.next()})",
+    }),
+    "/resume/jobs/<str:job_id>/": lambda w, i: lambda: w.client.get(f"/resume/jobs/{w.job_id}/"),
+    "/resume/history/": lambda w, i: lambda: w.client.get("/resume/history/"),
+    "/resume/history/<str:id>/": lambda w, i: lambda: w.client.get(f"/resume/history/{w.resume_id}/"),
+    "/resume/download/<str:id>/": lambda w, i: lambda: w.client.get(f"/resume/download/{w.resume_id}/"),
+    "/resume/pdf/<str:id>/": lambda w, i: lambda: w.client.get(f"/resume/pdf/{w.resume_id}/"),
+    "/resume/pdf-cache/stats/": _stats("/resume/pdf-cache/stats/"),
+    "/resume/prep-hub/search/": lambda w, i: lambda: post_json(w.client, "/resume/prep-hub/search/", {
+        "company_name": f"Company {w.next()}",
+    }),
+    "/resume/templates/": lambda w, i: lambda: post_json(w.client, "/resume/templates/", {"template": _template(w)}),
+    "/resume/templates/<str:template_id>/": lambda w, i: lambda: w.client.get(f"/resume/templates/{w.template_id}/"),
+
+    # coldconnect
+    "/coldconnect/cold-mail/": _outreach("cold-mail"),
+    "/coldconnect/cold-dm/": _outreach("cold-dm"),
+    "/coldconnect/cover-letter/": _outreach("cover-letter"),
+    "/coldconnect/bulk/": _bulk,
+    "/coldconnect/resume/": _upload,
+    "/coldconnect/resume-cache/stats/": _stats("/coldconnect/resume-cache/stats/"),
+}
+
+
+def app_routes():
+    return [prefix + str(p.pattern) for prefix, module in APPS for p in module.urlpatterns]
+
+
+# ============================================================
+#  Statistics
+# ============================================================
+
+def percentile(ordered, q):
+    """Nearest-rank percentile of an ascending list."""
+    if not ordered:
+        return 0.0
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+
+def summarize(latencies, statuses, wall):
+    ordered = sorted(latencies)
+    counts = {}
+    for status in statuses:
+        counts[str(status)] = counts.get(str(status), 0) + 1
+    return {
+        "requests": len(ordered),
+        "errors": sum(1 for status in statuses if status >= 400),
+        "status_counts": counts,
+        "throughput_rps": round(len(ordered) / wall, 2) if wall else 0.0,
+        "mean_ms": round(1000 * sum(ordered) / len(ordered), 2) if ordered else 0.0,
+        "p50_ms": round(1000 * percentile(ordered, 50), 2),
+        "p95_ms": round(1000 * percentile(ordered, 95), 2),
+        "p99_ms": round(1000 * percentile(ordered, 99), 2),
+        "max_ms": round(1000 * ordered[-1], 2) if ordered else 0.0,
+    }
+
+
+def git_commit():
+    def git(*args):
+        return subprocess.run(
+            ["git", *args], cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=10,
+        ).stdout.strip()
+
+    try:
+        return git("rev-parse", "--short", "HEAD") or "unknown", bool(git("status", "--porcelain"))
+    except (OSError, subprocess.SubprocessError):
+        return "unknown", False
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark every users/resume/coldconnect endpoint in-process against a local Gemini stub "
+        "and a Mongo stand-in; reports throughput and p50/p95/p99 and stores the results as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency", default="1,4,16",
+            help="Comma-separated concurrency levels to run each endpoint at.",
+        )
+        parser.add_argument(
+            "--requests", type=int, default=50,
+            help="Requests per endpoint and concurrency level.",
+        )
+        parser.add_argument(
+            "--only", action="append", default=[],
+            help="Only run routes containing this text (repeatable).",
+        )
+        parser.add_argument("--latency", type=float, default=0.5, help="Mean Gemini stub latency in seconds.")
+        parser.add_argument("--jitter", type=float, default=0.2, help="Latency spread as a fraction of --latency.")
+        parser.add_argument("--payload-chars", type=int, default=3000, help="Size of each stub answer in characters.")
+        parser.add_argument(
+            "--mongo-uri",
+            help="Run against this MongoDB (a scratch *_bench database, dropped afterwards) "
+                 "instead of the in-memory mongomock stand-in.",
+        )
+        parser.add_argument(
+            "--keep-rate-limits", action="store_true",
+            help="Keep the per-key Gemini rate limits instead of lifting them for the run.",
+        )
+        parser.add_argument("--output", help="Where to write the JSON results (default: benchmarks/<time>-<commit>.json).")
+        parser.add_argument("--compare", help="Earlier results file to compare against.")
+
+    def handle(self, *args, **options):
+        try:
+            levels = sorted({int(n) for n in options["concurrency"].split(",") if n.strip()})
+        except ValueError:
+            raise CommandError("--concurrency must be a comma-separated list of integers")
+        if not levels or min(levels) < 1:
+            raise CommandError("--concurrency levels must be >= 1")
+
+        routes = [r for r in app_routes() if not options["only"] or any(o in r for o in options["only"])]
+        uncovered = [r for r in routes if r not in SCENARIOS]
+        for route in uncovered:
+            self.stderr.write(f"No benchmark scenario for {route}, skipping")
+        routes = [r for r in routes if r in SCENARIOS]
+
+        stub = GeminiStub(
+            latency=options["latency"], jitter=options["jitter"], payload_chars=options["payload_chars"],
+        ).start()
+        cleanup = self.use_mongo_standin(options["mongo_uri"])
+
+        # Sessions live in a signed cookie and generated files in a scratch
+        # folder, so runs never touch db.sqlite3 or media/.
+        scratch = tempfile.mkdtemp(prefix="jobplanet-bench-")
+        settings.TEMP_FOLDER = scratch
+        if artifact_store.backend.name == "local":
+            artifact_store.backend.folder = os.path.join(scratch, "artifacts")
+        if artifact_store.cache is not None:
+            artifact_store.cache.local.folder = os.path.join(scratch, "artifact_cache")
+        settings.SESSION_ENGINE = "django.contrib.sessions.backends.signed_cookies"
+        settings.GEMINI_BASE_URL = stub.base_url
+        settings.METRICS_TOKEN = METRICS_TOKEN
+        if not options["keep_rate_limits"]:
+            settings.GEMINI_KEY_RPM = settings.GEMINI_KEY_BURST = 10 ** 6
+
+        commit, dirty = git_commit()
+        started_at = datetime.utcnow().isoformat()
+        try:
+            results = self.run(routes, levels, options["requests"])
+        finally:
+            stub.stop()
+            cleanup()
+            shutil.rmtree(scratch, ignore_errors=True)
+
+        report = {
+            "commit": commit,
+            "dirty": dirty,
+            "started_at": started_at,
+            "options": {
+                "concurrency": levels,
+                "requests": options["requests"],
+                "latency": options["latency"],
+                "jitter": options["jitter"],
+                "payload_chars": options["payload_chars"],
+                "mongo": "mongodb" if options["mongo_uri"] else "mongomock",
+                "rate_limits": options["keep_rate_limits"],
+                "async_views": settings.ASYNC_VIEWS,
+            },
+            "gemini_stub": stub.stats,
+            "results": results,
+        }
+
+        output = options["output"] or os.path.join(
+            settings.BASE_DIR, "benchmarks", f"{datetime.utcnow():%Y%m%dT%H%M%S}-{commit}.json",
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+        self.print_table(results)
+        if options["compare"]:
+            self.print_comparison(options["compare"], results)
+        self.stdout.write(f"Results written to {output}")
+
+    # --------------------------------------------------------
+
+    def use_mongo_standin(self, uri):
+        """Point backend.mongo at the stand-in; returns the cleanup callback."""
+        if uri:
+            if settings.ASYNC_VIEWS:
+                self.stderr.write("Async views use their own AsyncMongoClient against --mongo-uri")
+            settings.MONGO_URI = uri
+            settings.MONGO_DB_NAME = f"{settings.MONGO_DB_NAME}_bench"
+            with mongo._client_lock:
+                mongo._client = None
+            mongo.ensure_indexes()
+            return lambda: mongo.get_client().drop_database(settings.MONGO_DB_NAME)
+
+        if settings.ASYNC_VIEWS:
+            raise CommandError("DJANGO_ASYNC_VIEWS=1 needs a real MongoDB: pass --mongo-uri")
+        try:
+            import mongomock
+        except ImportError:
+            raise CommandError("The in-memory Mongo stand-in needs mongomock (pip install -r requirements-dev.txt), or pass --mongo-uri")
+
+        with mongo._client_lock:
+            mongo._client = mongomock.MongoClient()
+        mongo.ensure_indexes()
+        return lambda: None
+
+    def run(self, routes, levels, requests):
+        run_id = f"{os.getpid()}-{int(time.time())}"
+        pdf = resume_pdf()
+        workers = []
+        self.stdout.write(f"Setting up {max(levels)} benchmark users...")
+        for n in range(max(levels)):
+            worker = Worker(run_id, n, pdf)
+            worker.setup()
+            workers.append(worker)
+
+        results = {}
+        for route in routes:
+            results[route] = {}
+            for level in levels:
+                results[route][str(level)] = self.run_level(SCENARIOS[route], workers[:level], max(requests, level))
+                stats = results[route][str(level)]
+                self.stdout.write(
+                    f"{route} x{level}: {stats['throughput_rps']} req/s, p95 {stats['p95_ms']} ms, {stats['errors']} errors"
+                )
+        return results
+
+    def run_level(self, scenario, workers, total):
+        """Send ``total`` requests spread over ``workers``.
+
+        Every request's untimed setup (signups, logins, uploads) runs before
+        the clock starts, so it counts towards neither the latencies nor the
+        wall time the throughput is computed from.
+        """
+        lock = threading.Lock()
+        latencies = []
+        statuses = []
+        ready = threading.Barrier(len(workers) + 1)
+
+        def loop(worker, indexes):
+            sends = []
+            try:
+                for i in indexes:
+                    sends.append(scenario(worker, i))
+            finally:
+                ready.wait()
+            for send in sends:
+                started = time.perf_counter()
+                try:
+                    status = read_all(send()).status_code
+                except Exception as e:
+                    self.stderr.write(f"Request failed: {e}")
+                    status = 599
+                elapsed = time.perf_counter() - started
+                with lock:
+                    latencies.append(elapsed)
+                    statuses.append(status)
+
+        # Request i (1-based) goes to worker (i - 1) % len(workers).
+        threads = [
+            threading.Thread(target=loop, args=(worker, range(n + 1, total + 1, len(workers))), daemon=True)
+            for n, worker in enumerate(workers)
+        ]
+        for t in threads:
+            t.start()
+        ready.wait()
+        started = time.perf_counter()
+        for t in threads:
+            t.join()
+        return summarize(latencies, statuses, time.perf_counter() - started)
+
+    # --------------------------------------------------------
+
+    def print_table(self, results):
+        self.stdout.write("")
+        self.stdout.write(f"{'endpoint':40} {'conc':>4} {'req':>5} {'err':>4} {'req/s':>8} {'p50':>9} {'p95':>9} {'p99':>9}")
+        for route, levels in results.items():
+            for level, s in levels.items():
+                self.stdout.write(
+                    f"{route:40} {level:>4} {s['requests']:>5} {s['errors']:>4} {s['throughput_rps']:>8} "
+                    f"{s['p50_ms']:>9} {s['p95_ms']:>9} {s['p99_ms']:>9}"
+                )
+
+    def print_comparison(self, path, results):
+        try:
+            with open(path, encoding="utf-8") as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Could not read {path}: {e}")
+
+        def change(new, old):
+            return f"{100 * (new - old) / old:+.1f}%" if old else "n/a"
+
+        self.stdout.write("")
+        self.stdout.write(f"Compared with {baseline.get('commit', '?')} ({path}):")
+        self.stdout.write(f"{'endpoint':40} {'conc':>4} {'req/s':>9} {'p50':>9} {'p95':>9} {'p99':>9}")
+        for route, levels in results.items():
+            for level, s in levels.items():
+                old = baseline.get("results", {}).get(route, {}).get(level)
+                if not old:
+                    continue
+                self.stdout.write(
+                    f"{route:40} {level:>4} {change(s['throughput_rps'], old['throughput_rps']):>9} "
+                    f"{change(s['p50_ms'], old['p50_ms']):>9} {change(s['p95_ms'], old['p95_ms']):>9} "
+                    f"{change(s['p99_ms'], old['p99_ms']):>9}"
+                )
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from resume.artifacts import artifact_store
+
+
+class Command(BaseCommand):
+    help = "Garbage-collect stored .tex files: orphaned, past retention or over the byte quota."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run", action="store_true",
+            help="Only report what would be removed.",
+        )
+        parser.add_argument(
+            "--migrate-legacy", action="store_true",
+            help="First move flat TEMP_FOLDER/<id>.tex files into the store.",
+        )
+
+    def handle(self, *args, **options):
+        if options["migrate_legacy"] and not options["dry_run"]:
+            moved = artifact_store.migrate_legacy()
+            self.stdout.write(f"Moved {moved} legacy .tex files into the {artifact_store.backend.name} backend")
+
+        summary = artifact_store.collect(dry_run=options["dry_run"])
+        verb = "Would remove" if options["dry_run"] else "Removed"
+        self.stdout.write(
+            f"{verb} {summary['orphaned']} orphaned, {summary['expired']} expired and "
+            f"{summary['over_quota']} over-quota files from the {artifact_store.backend.name} backend; "
+            f"{summary['kept_bytes']} bytes kept"
+        )
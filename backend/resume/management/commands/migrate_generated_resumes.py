@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from pymongo.errors import BulkWriteError
+
+from resume import history
+from backend.mongo import users
+
+
+class Command(BaseCommand):
+    help = "Move users.generated_resumes arrays into the resumes collection."
+
+    def handle(self, *args, **options):
+        history.ensure_indexes()
+
+        moved = 0
+        for user in users().find({"generated_resumes.0": {"$exists": True}}, {"email": 1, "generated_resumes": 1}):
+            docs = [
+                {
+                    **entry,
+                    "email": user["email"],
+                    "kind": "generate" if "job_description_snippet" in entry else "enhance",
+                }
+                for entry in user["generated_resumes"]
+            ]
+            try:
+                history.resumes().insert_many(docs, ordered=False)
+            except BulkWriteError as e:
+                # Entries already copied by an earlier, interrupted run.
+                if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])):
+                    raise
+
+            users().update_one({"_id": user["_id"]}, {"$unset": {"generated_resumes": ""}})
+            moved += len(docs)
+            self.stdout.write(f"{user['email']}: {len(docs)} resumes")
+
+        self.stdout.write(f"Moved {moved} resumes")
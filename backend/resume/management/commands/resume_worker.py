@@ -0,0 +1,74 @@
+import os
+import time
+import socket
+import threading
+import traceback
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from resume import jobs
+from resume.views import run_resume_job
+
+
+class Command(BaseCommand):
+    help = "Run background resume generate/enhance jobs from the resume_jobs queue."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency", type=int, default=4,
+            help="Number of jobs this process runs at once.",
+        )
+        parser.add_argument(
+            "--once", action="store_true",
+            help="Exit once the queue is empty instead of polling.",
+        )
+
+    def handle(self, *args, **options):
+        jobs.ensure_indexes()
+
+        concurrency = options["concurrency"]
+        once = options["once"]
+        stop = threading.Event()
+        base_id = f"{socket.gethostname()}:{os.getpid()}"
+
+        def loop(n):
+            worker_id = f"{base_id}:{n}"
+            while not stop.is_set():
+                job = jobs.claim(worker_id)
+                if job is None:
+                    if once:
+                        return
+                    stop.wait(settings.RESUME_JOB_POLL_SECONDS)
+                    continue
+
+                started = time.perf_counter()
+                try:
+                    result = run_resume_job(job)
+                except Exception as e:
+                    print(f"Resume job {job['_id']} failed: {e}")
+                    print(traceback.format_exc())
+                    if not jobs.fail(job, e):
+                        print(f"Resume job {job['_id']}: lease lost, error not recorded")
+                    continue
+
+                if not jobs.complete(job, result):
+                    self.stdout.write(f"Job {job['_id']}: lease lost to another worker, result dropped")
+                    continue
+                self.stdout.write(
+                    f"Job {job['_id']} ({job['kind']}) done in {time.perf_counter() - started:.1f}s"
+                )
+
+        threads = [threading.Thread(target=loop, args=(n,), daemon=True) for n in range(concurrency)]
+        for t in threads:
+            t.start()
+
+        self.stdout.write(f"resume_worker {base_id} running with {concurrency} threads")
+        try:
+            for t in threads:
+                while t.is_alive():
+                    t.join(timeout=1)
+        except KeyboardInterrupt:
+            stop.set()
+            for t in threads:
+                t.join()
@@ -0,0 +1,213 @@
+"""
+Content-addressed cache of compiled resume PDFs.
+
+PDFs are stored on disk under the SHA-256 of the cleaned LaTeX they were
+compiled from, so the same .tex never goes through pdflatex twice. The
+directory is kept under a byte budget by evicting least-recently-used
+entries, and concurrent requests for the same hash share one compile.
+
+Files are opened under the cache lock, so an eviction running at the same
+time can only remove a PDF that a request already holds open.
+"""
+
+import io
+import os
+import time
+import hashlib
+import threading
+import uuid
+
+from django.conf import settings
+
+from backend.timing import span
+
+from .compile_scheduler import CompileCancelled
+
+
+def latex_hash(latex_cleaned):
+    return hashlib.sha256(latex_cleaned.encode("utf-8")).hexdigest()
+
+
+class _Flight:
+    """One in-progress compile that other requests can wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.pdf = None
+        self.error = None
+
+
+class PdfCache:
+
+    def __init__(self, folder, max_bytes):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._index = None  # key -> [size, last_used], loaded lazily
+        self._total = 0
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "evictions": 0,
+        }
+
+    # -------------------- Index --------------------
+
+    def _path(self, key):
+        return os.path.join(self.folder, f"{key}.pdf")
+
+    def _load_index(self):
+        """Rebuild the LRU index from what is already on disk."""
+        os.makedirs(self.folder, exist_ok=True)
+        index = {}
+        for name in os.listdir(self.folder):
+            if not name.endswith(".pdf"):
+                continue
+            try:
+                st = os.stat(os.path.join(self.folder, name))
+            except FileNotFoundError:
+                continue
+            index[name[:-4]] = [st.st_size, st.st_mtime]
+        self._index = index
+        self._total = sum(size for size, _ in index.values())
+
+    def _touch(self, key):
+        entry = self._index.get(key)
+        if entry is None:
+            return
+        entry[1] = time.time()
+        try:
+            os.utime(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self):
+        """Drop least-recently-used PDFs until the cache fits its budget."""
+        if self._total <= self.max_bytes:
+            return
+        for key, (size, _) in sorted(self._index.items(), key=lambda kv: kv[1][1]):
+            if self._total <= self.max_bytes:
+                break
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+            except PermissionError:
+                # Open elsewhere (Windows); try again on the next eviction.
+                continue
+            del self._index[key]
+            self._total -= size
+            self.stats["evictions"] += 1
+
+    # -------------------- Public API --------------------
+
+    def _open_locked(self, key):
+        if key not in self._index:
+            return None
+        try:
+            pdf_file = open(self._path(key), "rb")
+        except FileNotFoundError:
+            size, _ = self._index.pop(key)
+            self._total -= size
+            return None
+        self._touch(key)
+        return pdf_file
+
+    def open(self, key):
+        """Return the cached PDF for ``key`` as an open binary file, or None."""
+        with self._lock:
+            if self._index is None:
+                self._load_index()
+            return self._open_locked(key)
+
+    def put(self, key, pdf_bytes):
+        """Atomically store ``pdf_bytes`` under ``key`` and return its path."""
+        os.makedirs(self.folder, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with span("file_io"):
+            with open(tmp_path, "wb") as f:
+                f.write(pdf_bytes)
+            os.replace(tmp_path, path)
+
+        with self._lock:
+            if self._index is None:
+                self._load_index()
+            old = self._index.get(key)
+            if old:
+                self._total -= old[0]
+            self._index[key] = [len(pdf_bytes), time.time()]
+            self._total += len(pdf_bytes)
+            self._evict()
+        return path
+
+    def get_or_compile(self, latex_cleaned, compile_fn):
+        """Return the PDF for ``latex_cleaned`` as an open binary file, compiling at most once.
+
+        ``compile_fn(latex_cleaned)`` must return the PDF bytes or raise;
+        requests that arrive while a compile for the same hash is running
+        wait for it and receive its result (or its exception).
+        """
+        key = latex_hash(latex_cleaned)
+
+        with self._lock:
+            if self._index is None:
+                self._load_index()
+            pdf_file = self._open_locked(key)
+            if pdf_file:
+                self.stats["hits"] += 1
+                return pdf_file
+
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._inflight[key] = flight
+                self.stats["misses"] += 1
+            else:
+                self.stats["coalesced"] += 1
+
+        if not leader:
+            flight.done.wait()
+            if isinstance(flight.error, CompileCancelled):
+                # The leader's client went away; this request takes over.
+                return self.get_or_compile(latex_cleaned, compile_fn)
+            if flight.error:
+                raise flight.error
+            return self._open_fresh(key, flight.pdf)
+
+        try:
+            flight.pdf = compile_fn(latex_cleaned)
+            self.put(key, flight.pdf)
+            return self._open_fresh(key, flight.pdf)
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.done.set()
+
+    def _open_fresh(self, key, pdf_bytes):
+        """The just-compiled PDF, from memory if it was already evicted again."""
+        return self.open(key) or io.BytesIO(pdf_bytes)
+
+    def snapshot(self):
+        """Counters plus current size, for the stats endpoint."""
+        with self._lock:
+            if self._index is None:
+                self._load_index()
+            lookups = self.stats["hits"] + self.stats["misses"] + self.stats["coalesced"]
+            return {
+                **self.stats,
+                "hit_ratio": (self.stats["hits"] / lookups) if lookups else 0.0,
+                "entries": len(self._index),
+                "bytes": self._total,
+                "max_bytes": self.max_bytes,
+                "inflight": len(self._inflight),
+            }
+
+
+pdf_cache = PdfCache(settings.PDF_CACHE_FOLDER, settings.PDF_CACHE_MAX_BYTES)
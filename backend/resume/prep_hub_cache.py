@@ -0,0 +1,211 @@
+"""
+Company-level cache for Prep Hub results.
+
+Prep Hub data is not user specific, so results are stored once per
+normalized company name in the ``prep_hub_cache`` collection:
+
+- fresh (younger than PREP_HUB_CACHE_TTL): served straight from Mongo.
+- stale (up to PREP_HUB_CACHE_MAX_STALE): served, and refreshed in the
+  background.
+- missing or too old: generated, with concurrent searches for the same
+  company sharing one in-flight Gemini call.
+"""
+
+import re
+import asyncio
+import threading
+from datetime import datetime, timedelta
+
+from django.conf import settings
+
+from backend.mongo import collection, async_collection
+
+
+COLLECTION = "prep_hub_cache"
+
+_SUFFIXES = {"inc", "ltd", "llc", "corp", "corporation", "co", "company", "plc", "limited"}
+
+
+def normalize_company(name):
+    """'  Google, Inc. ' -> 'google'; '' when the name has no letters or digits."""
+    words = re.sub(r"[\W_]+", " ", name.casefold()).split()
+    while len(words) > 1 and words[-1] in _SUFFIXES:
+        words.pop()
+    return " ".join(words)
+
+
+def _state(doc, now):
+    if doc is None:
+        return "miss"
+    age = now - doc["generated_at"]
+    if age < timedelta(seconds=settings.PREP_HUB_CACHE_TTL):
+        return "hit"
+    if age < timedelta(seconds=settings.PREP_HUB_CACHE_MAX_STALE):
+        return "stale"
+    return "miss"
+
+
+def _doc(key, company_name, data):
+    return {
+        "_id": key,
+        "company_name": company_name,
+        "data": data,
+        "generated_at": datetime.utcnow(),
+    }
+
+
+class _Flight:
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.data = None
+        self.error = None
+
+
+class PrepHubCache:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._async_inflight = {}
+        self._tasks = set()
+        self.stats = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "refreshes": 0,
+            "refresh_failures": 0,
+        }
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    # -------------------- Sync --------------------
+
+    def _generate(self, key, company_name, generate_fn):
+        """Run ``generate_fn`` once per key at a time and store the result."""
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._inflight[key] = flight
+
+        if not leader:
+            self._count("coalesced")
+            flight.done.wait()
+            if flight.error:
+                raise flight.error
+            return flight.data
+
+        try:
+            flight.data = generate_fn(company_name)
+            collection(COLLECTION).replace_one({"_id": key}, _doc(key, company_name, flight.data), upsert=True)
+            return flight.data
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.done.set()
+
+    def _refresh_in_background(self, key, company_name, generate_fn):
+        with self._lock:
+            if key in self._inflight:
+                return
+            self.stats["refreshes"] += 1
+
+        def run():
+            try:
+                self._generate(key, company_name, generate_fn)
+            except Exception as e:
+                self._count("refresh_failures")
+                print(f"Prep hub refresh for {company_name} failed: {e}")
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def get_or_generate(self, company_name, generate_fn):
+        """Return (data, cache_state) for ``company_name``.
+
+        ``generate_fn(company_name)`` is only called on a miss or, in the
+        background, for a stale entry.
+        """
+        key = normalize_company(company_name)
+        doc = collection(COLLECTION).find_one({"_id": key})
+        state = _state(doc, datetime.utcnow())
+
+        if state == "hit":
+            self._count("hits")
+            return doc["data"], state
+        if state == "stale":
+            self._count("stale_hits")
+            self._refresh_in_background(key, company_name, generate_fn)
+            return doc["data"], state
+
+        self._count("misses")
+        return self._generate(key, company_name, generate_fn), state
+
+    # -------------------- Async --------------------
+
+    async def _store(self, key, company_name, agenerate_fn):
+        data = await agenerate_fn(company_name)
+        await async_collection(COLLECTION).replace_one(
+            {"_id": key}, _doc(key, company_name, data), upsert=True
+        )
+        return data
+
+    async def _agenerate(self, key, company_name, agenerate_fn):
+        """Await the one generation task for ``key``, starting it if needed.
+
+        The task is not owned by any request, so a client that disconnects
+        does not cancel the call for everyone else waiting on it.
+        """
+        loop = asyncio.get_running_loop()
+        inflight = self._async_inflight.setdefault(loop, {})
+        task = inflight.get(key)
+        if task is None:
+            task = loop.create_task(self._store(key, company_name, agenerate_fn))
+            inflight[key] = task
+            task.add_done_callback(lambda t: inflight.pop(key, None))
+        else:
+            self._count("coalesced")
+        return await asyncio.shield(task)
+
+    async def aget_or_generate(self, company_name, agenerate_fn):
+        """Async twin of ``get_or_generate``; ``agenerate_fn`` is a coroutine function."""
+        key = normalize_company(company_name)
+        doc = await async_collection(COLLECTION).find_one({"_id": key})
+        state = _state(doc, datetime.utcnow())
+
+        if state == "hit":
+            self._count("hits")
+            return doc["data"], state
+        if state == "stale":
+            self._count("stale_hits")
+            inflight = self._async_inflight.get(asyncio.get_running_loop(), {})
+            if key not in inflight:
+                self._count("refreshes")
+                task = asyncio.create_task(self._arefresh(key, company_name, agenerate_fn))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+            return doc["data"], state
+
+        self._count("misses")
+        return await self._agenerate(key, company_name, agenerate_fn), state
+
+    async def _arefresh(self, key, company_name, agenerate_fn):
+        try:
+            await self._agenerate(key, company_name, agenerate_fn)
+        except Exception as e:
+            self._count("refresh_failures")
+            print(f"Prep hub refresh for {company_name} failed: {e}")
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats)
+
+
+prep_hub_cache = PrepHubCache()
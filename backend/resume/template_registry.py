@@ -0,0 +1,257 @@
+"""
+Registry of uploaded LaTeX resume templates.
+
+A template is uploaded once (``POST /resume/templates/``), validated and
+preprocessed, and generation requests then send only its ``template_id``.
+Ids are content hashes, so the same template uploaded by several users is
+stored, preprocessed and warmed up once; ``owners`` lists who may use it.
+The name and upload time are each owner's own, kept under
+``uploads.<owner key>``, and a user only ever sees their own.
+
+Preprocessing records:
+
+- ``preamble_hash``: the format key the compile engine uses for the
+  template's (cleaned) preamble; its format is built and warm workers are
+  spawned in the background at upload time.
+- ``placeholders``: every ``%NAME%``, ``{{name}}``, ``<<name>>`` or
+  ``\\VAR{name}`` marker with its count and the sections it appears in.
+- ``sections``: the ``\\section`` titles, in order.
+
+Template content never changes, so lookups are served from a small
+per-process cache; ownership changes reach other processes within
+TEMPLATE_CACHE_TTL seconds.
+"""
+
+import re
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from django.conf import settings
+from pymongo import ASCENDING
+
+from backend.mongo import collection, async_collection
+
+from . import latex_sections
+from .latex_engine import compile_engine, clean_latex, split_preamble, preamble_hash
+
+
+COLLECTION = "resume_templates"
+
+PLACEHOLDER_RE = re.compile(
+    r"%([A-Z][A-Z0-9_]*)%|\{\{\s*([A-Za-z_][\w.]*)\s*\}\}|<<\s*([A-Za-z_][\w.]*)\s*>>|\\VAR\{([^{}]+)\}"
+)
+
+# Primitives a template has no business using.
+FORBIDDEN_RE = re.compile(r"\\(write18|immediate\s*\\write|openout|openin|input\s*\{\s*/|include\s*\{\s*/)")
+
+# Everything but the LaTeX body; ``list_for`` adds the caller's upload entry.
+SUMMARY_FIELDS = {
+    "_id": 0, "id": 1, "preamble_hash": 1, "placeholders": 1, "sections": 1, "size": 1,
+}
+
+
+class TemplateError(ValueError):
+    """The uploaded template is not usable; the message says why."""
+
+
+def templates():
+    return collection(COLLECTION)
+
+
+_indexes_ready = False
+
+
+def ensure_indexes():
+    global _indexes_ready
+    if _indexes_ready:
+        return
+    templates().create_index([("owners", ASCENDING)])
+    _indexes_ready = True
+
+
+# ============================================================
+#  Validation & Preprocessing
+# ============================================================
+
+def template_id(latex):
+    return hashlib.sha256(latex.encode("utf-8")).hexdigest()[:24]
+
+
+def validate(latex):
+    """Raise TemplateError unless ``latex`` is a complete, compilable-looking document."""
+    if not isinstance(latex, str) or not latex.strip():
+        raise TemplateError("Template is empty")
+    if len(latex.encode("utf-8")) > settings.TEMPLATE_MAX_BYTES:
+        raise TemplateError(f"Template is larger than {settings.TEMPLATE_MAX_BYTES} bytes")
+    if "\\documentclass" not in latex:
+        raise TemplateError("Template has no \\documentclass")
+    if split_preamble(latex) is None or "\\end{document}" not in latex:
+        raise TemplateError("Template needs \\begin{document} and \\end{document}")
+    if not latex_sections.balanced(latex):
+        raise TemplateError("Template has unbalanced braces or environments")
+    forbidden = FORBIDDEN_RE.search(latex)
+    if forbidden:
+        raise TemplateError(f"Template uses a forbidden command: {forbidden.group(0)}")
+
+
+def placeholder_map(latex):
+    """{placeholder: {"count", "sections"}} for the markers found in ``latex``."""
+    parts = latex_sections.split(latex)
+    spans = []
+    if parts is not None:
+        preamble, sections, _ = parts
+        offset = len(preamble)
+        for section in sections:
+            spans.append((offset, offset + len(section.text), section.name))
+            offset += len(section.text)
+
+    found = {}
+    for match in PLACEHOLDER_RE.finditer(latex):
+        name = next(group for group in match.groups() if group).strip()
+        entry = found.setdefault(name, {"count": 0, "sections": []})
+        entry["count"] += 1
+        section = next((title for start, stop, title in spans if start <= match.start() < stop), None)
+        if section and section not in entry["sections"]:
+            entry["sections"].append(section)
+    return found
+
+
+def preprocess(latex):
+    parts = latex_sections.split(latex)
+    return {
+        "preamble_hash": preamble_hash(split_preamble(clean_latex(latex))),
+        "placeholders": placeholder_map(latex),
+        "sections": [s.name for s in parts[1]] if parts else [],
+        "size": len(latex.encode("utf-8")),
+    }
+
+
+# ============================================================
+#  Cache
+# ============================================================
+
+_cache = OrderedDict()   # id -> (expires_at, doc)
+_cache_lock = threading.Lock()
+
+
+def _cached(tid):
+    with _cache_lock:
+        entry = _cache.get(tid)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del _cache[tid]
+            return None
+        _cache.move_to_end(tid)
+        return entry[1]
+
+
+def _remember(tid, doc):
+    if doc is None or settings.TEMPLATE_CACHE_TTL <= 0:
+        return
+    with _cache_lock:
+        _cache[tid] = (time.monotonic() + settings.TEMPLATE_CACHE_TTL, doc)
+        _cache.move_to_end(tid)
+        while len(_cache) > settings.TEMPLATE_CACHE_MAX_ENTRIES:
+            _cache.popitem(last=False)
+
+
+def _invalidate(tid):
+    with _cache_lock:
+        _cache.pop(tid, None)
+
+
+def _owner_key(email):
+    """Field name for ``email`` under ``uploads`` (emails contain dots)."""
+    return hashlib.sha256(email.encode()).hexdigest()[:16]
+
+
+def _public(doc, email):
+    """A stored template as ``email`` sees it: shared fields plus their own name and upload time."""
+    if doc is None or email not in doc.get("owners", ()):
+        return None
+    upload = (doc.get("uploads") or {}).get(_owner_key(email)) or {}
+    public = {k: v for k, v in doc.items() if k not in ("_id", "owners", "uploads")}
+    public["name"] = upload.get("name", "Untitled template")
+    public["created_at"] = upload.get("created_at")
+    return public
+
+
+# ============================================================
+#  Public API
+# ============================================================
+
+def register(email, latex, name=None):
+    """Validate, preprocess and store ``latex`` for ``email``; return (template, created).
+
+    ``created`` is True when ``email`` did not have this template yet; a
+    repeated upload only renames it when a ``name`` is given.
+    """
+    validate(latex)
+    ensure_indexes()
+    tid = template_id(latex)
+    upload = f"uploads.{_owner_key(email)}"
+
+    doc = {"id": tid, "latex": latex, **preprocess(latex)}
+    templates().update_one(
+        {"_id": tid}, {"$setOnInsert": doc, "$addToSet": {"owners": email}}, upsert=True,
+    )
+    result = templates().update_one(
+        {"_id": tid, upload: {"$exists": False}},
+        {"$set": {upload: {"name": name or "Untitled template", "created_at": datetime.utcnow().isoformat()}}},
+    )
+    created = result.modified_count > 0
+    if not created and name:
+        templates().update_one({"_id": tid}, {"$set": {f"{upload}.name": name}})
+    _invalidate(tid)
+
+    # Dump the preamble format and spawn warm pdflatex workers ahead of the first compile.
+    compile_engine.warm_up(split_preamble(clean_latex(latex)))
+    return get(email, tid), created
+
+
+def get(email, tid):
+    """The template ``tid`` if ``email`` owns it, else None."""
+    doc = _cached(tid)
+    if doc is None:
+        doc = templates().find_one({"_id": tid})
+        _remember(tid, doc)
+    return _public(doc, email)
+
+
+async def aget(email, tid):
+    doc = _cached(tid)
+    if doc is None:
+        doc = await async_collection(COLLECTION).find_one({"_id": tid})
+        _remember(tid, doc)
+    return _public(doc, email)
+
+
+def list_for(email):
+    """Summaries of ``email``'s templates, oldest upload first."""
+    ensure_indexes()
+    upload = f"uploads.{_owner_key(email)}"
+    cursor = templates().find({"owners": email}, {**SUMMARY_FIELDS, upload: 1}).sort(f"{upload}.created_at", ASCENDING)
+    summaries = []
+    for doc in cursor:
+        mine = doc.pop("uploads", {}).get(_owner_key(email)) or {}
+        summaries.append({**doc, "name": mine.get("name", "Untitled template"), "created_at": mine.get("created_at")})
+    return summaries
+
+
+def remove(email, tid):
+    """Drop ``email`` from the owners; the template goes when nobody owns it."""
+    result = templates().update_one(
+        {"_id": tid, "owners": email},
+        {"$pull": {"owners": email}, "$unset": {f"uploads.{_owner_key(email)}": ""}},
+    )
+    templates().delete_one({"_id": tid, "owners": {"$size": 0}})
+    _invalidate(tid)
+    return result.modified_count > 0
+
+
+def format_ready(template):
+    return compile_engine.has_format(template["preamble_hash"])
@@ -1,3 +1,601 @@
-from django.test import TestCase
+import time
+import shutil
+import tempfile
+import threading
+from unittest import mock
+from datetime import datetime, timedelta
 
-# Create your tests here.
+from django.test import SimpleTestCase, override_settings
+
+from backend.testing import use_mongomock
+
+from . import jobs, history, latex_sections, template_registry, latex_engine
+from .artifacts import ArtifactStore, LocalBackend
+from .prep_hub_cache import normalize_company
+from .views import company_name_error, enhance_request
+from .pdf_cache import PdfCache
+from .compile_scheduler import CompileScheduler, SchedulerFull, CompileCancelled
+from .latex_engine import CompileEngine, LatexCompileError, preamble_hash
+
+
+# ============================================================
+#  Compiled PDF Cache
+# ============================================================
+
+class PdfCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder, ignore_errors=True)
+        self.compiles = []
+
+    def compile_fn(self, latex):
+        self.compiles.append(latex)
+        return f"PDF of {latex}".encode()
+
+    def read(self, cache, latex):
+        with cache.get_or_compile(latex, self.compile_fn) as pdf_file:
+            return pdf_file.read()
+
+    def test_same_latex_compiles_once(self):
+        cache = PdfCache(self.folder, 10_000)
+
+        self.assertEqual(self.read(cache, "a"), b"PDF of a")
+        self.assertEqual(self.read(cache, "a"), b"PDF of a")
+
+        self.assertEqual(self.compiles, ["a"])
+        self.assertEqual(cache.snapshot()["hits"], 1)
+        self.assertEqual(cache.snapshot()["misses"], 1)
+
+    def test_index_is_rebuilt_from_disk(self):
+        self.read(PdfCache(self.folder, 10_000), "a")
+
+        self.assertEqual(self.read(PdfCache(self.folder, 10_000), "a"), b"PDF of a")
+        self.assertEqual(self.compiles, ["a"])
+
+    def test_concurrent_requests_share_one_compile(self):
+        cache = PdfCache(self.folder, 10_000)
+        release = threading.Event()
+        results = []
+
+        def slow_compile(latex):
+            release.wait(5)
+            return self.compile_fn(latex)
+
+        def request():
+            with cache.get_or_compile("a", slow_compile) as pdf_file:
+                results.append(pdf_file.read())
+
+        threads = [threading.Thread(target=request) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        while cache.snapshot()["coalesced"] < 3:
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(self.compiles, ["a"])
+        self.assertEqual(results, [b"PDF of a"] * 4)
+
+    def test_waiters_get_the_leaders_error(self):
+        cache = PdfCache(self.folder, 10_000)
+        release = threading.Event()
+        errors = []
+
+        def failing_compile(latex):
+            release.wait(5)
+            raise RuntimeError("pdflatex failed")
+
+        def request():
+            try:
+                cache.get_or_compile("a", failing_compile)
+            except RuntimeError as e:
+                errors.append(str(e))
+
+        threads = [threading.Thread(target=request) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        while cache.snapshot()["coalesced"] < 1:
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(errors, ["pdflatex failed"] * 2)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = PdfCache(self.folder, 20)  # room for two 8-byte PDFs
+
+        self.read(cache, "a")
+        self.read(cache, "b")
+        self.read(cache, "a")
+        self.read(cache, "c")
+
+        self.assertEqual(cache.snapshot()["evictions"], 1)
+        self.read(cache, "a")
+        self.read(cache, "b")
+        self.assertEqual(self.compiles, ["a", "b", "c", "b"])
+
+    def test_open_file_survives_eviction(self):
+        cache = PdfCache(self.folder, 10)
+        pdf_file = cache.get_or_compile("a", self.compile_fn)
+        self.addCleanup(pdf_file.close)
+
+        self.read(cache, "b")  # evicts "a"
+
+        self.assertEqual(pdf_file.read(), b"PDF of a")
+
+    def test_pdf_larger_than_the_budget_is_still_served(self):
+        cache = PdfCache(self.folder, 4)
+
+        self.assertEqual(self.read(cache, "a"), b"PDF of a")
+        self.assertEqual(cache.snapshot()["entries"], 0)
+
+
+# ============================================================
+#  Stored .tex Files
+# ============================================================
+
+@override_settings(ARTIFACT_GC_INTERVAL=10 ** 9)  # no background GC pass
+class ArtifactOwnerTests(SimpleTestCase):
+
+    def setUp(self):
+        use_mongomock(self)
+        folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, folder, ignore_errors=True)
+        self.store = ArtifactStore(LocalBackend(folder))
+        history.save_resume("a@x.com", {"id": "r1", "latex": "\\section{A}"}, "generate")
+        self.store.put("r1", "\\section{A}")
+
+    def test_owner_reads_the_file(self):
+        self.assertEqual(self.store.load("a@x.com", "r1"), "\\section{A}")
+        self.assertEqual(b"".join(self.store.stream("a@x.com", "r1")), b"\\section{A}")
+
+    def test_other_users_cannot_read_it(self):
+        self.assertIsNone(self.store.open("b@x.com", "r1"))
+        self.assertIsNone(self.store.load("b@x.com", "r1"))
+        self.assertIsNone(self.store.stream("b@x.com", "r1"))
+
+
+class ArtifactGcLeaseTests(SimpleTestCase):
+
+    def setUp(self):
+        use_mongomock(self)
+        folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, folder, ignore_errors=True)
+        self.backend = LocalBackend(folder)
+
+    def test_a_new_process_does_not_start_a_pass_on_its_first_write(self):
+        store = ArtifactStore(self.backend)
+        store.put("r1", "x")
+
+        self.assertFalse(store.snapshot()["gc_running"])
+
+    def test_one_process_per_interval_runs_the_pass(self):
+        first, second = ArtifactStore(self.backend), ArtifactStore(self.backend)
+
+        self.assertTrue(first.claim_gc())
+        self.assertFalse(second.claim_gc())
+        first.release_gc()
+        self.assertFalse(second.claim_gc())
+
+    def test_over_quota_pass_waits_only_for_the_running_one(self):
+        first, second = ArtifactStore(self.backend), ArtifactStore(self.backend)
+        first.claim_gc()
+
+        self.assertFalse(second.claim_gc(over_quota=True))
+        first.release_gc()
+        self.assertTrue(second.claim_gc(over_quota=True))
+
+
+# ============================================================
+#  Section-Level Enhance
+# ============================================================
+
+RESUME = (
+    "\\documentclass{article}\n"
+    "% \\section{Commented out}\n"
+    "\\begin{document}\n"
+    "\\section*{Summary}\nBackend engineer.\n\n"
+    "\\section[Work]{\\textbf{Experience}}\n\\begin{itemize}\n"
+    "  \\item Built Python APIs\n  \\item Ran the on-call rotation\n\\end{itemize}\n\n\n"
+    "\\section{Skills}\r\nPython, Go \\{and\\} SQL\r\n"
+    "\\end{document}\n"
+)
+
+
+class LatexSectionsTests(SimpleTestCase):
+
+    def test_split_then_merge_is_byte_identical(self):
+        for latex in [RESUME, RESUME.replace("\\end{document}\n", ""), RESUME + "% trailing\n"]:
+            preamble, sections, tail = latex_sections.split(latex)
+            self.assertEqual(latex_sections.merge(preamble, sections, tail, {}), latex)
+
+    def test_sections_and_titles(self):
+        preamble, sections, tail = latex_sections.split(RESUME)
+
+        self.assertEqual([s.name for s in sections], ["Summary", "Experience", "Skills"])
+        self.assertIn("Commented out", preamble)
+        self.assertEqual(tail, "\\end{document}\n")
+        self.assertEqual(sections[1].items, ["Built Python APIs", "Ran the on-call rotation"])
+
+    def test_document_without_sections(self):
+        self.assertIsNone(latex_sections.split("\\begin{document}\nHi\n\\end{document}\n"))
+
+    def test_unchanged_answer_gives_back_the_document(self):
+        preamble, sections, tail, chosen = latex_sections.plan(RESUME, "Polish my work experience")
+        answer = "```latex\n" + latex_sections.render(chosen) + "```\n"
+
+        rewrites = latex_sections.parse_response(answer, chosen)
+
+        self.assertEqual([s.name for s in chosen], ["Experience"])
+        self.assertEqual(latex_sections.merge(preamble, sections, tail, rewrites), RESUME)
+
+    def test_rewrite_replaces_only_its_section(self):
+        preamble, sections, tail, chosen = latex_sections.plan(RESUME, "Polish my work experience")
+        answer = "%%% SECTION 1\n\\section{Experience}\nLed the payments team.\n"
+
+        merged = latex_sections.merge(preamble, sections, tail, latex_sections.parse_response(answer, chosen))
+
+        expected = RESUME.replace(sections[1].text.rstrip(), "\\section{Experience}\nLed the payments team.")
+        self.assertEqual(merged, expected)
+
+    def test_unusable_rewrites_are_dropped(self):
+        _, _, _, chosen = latex_sections.plan(RESUME, "Polish my work experience")
+        answer = (
+            "%%% SECTION 1\n\\section{Experience}\n\\begin{itemize}\n"   # unclosed environment
+            "%%% SECTION 2\n\\section{Skills}\nRust\n"                  # not a chosen section
+        )
+
+        self.assertEqual(latex_sections.parse_response(answer, chosen), {})
+
+
+def gemini_answer(text):
+    return {"candidates": [{"content": {"parts": [{"text": text}]}}]}
+
+
+class EnhanceSectionsTests(SimpleTestCase):
+
+    def test_rejected_rewrite_is_an_error_not_the_original(self):
+        _, finish = enhance_request(RESUME, "Polish my work experience")
+
+        with self.assertRaises(latex_sections.RewriteRejected) as ctx:
+            finish(gemini_answer("%%% SECTION 1\n\\section{Experience}\n\\begin{itemize}\n"))
+        self.assertEqual(ctx.exception.sections, ["Experience"])
+
+    def test_partly_rejected_rewrite_lists_what_was_dropped(self):
+        _, finish = enhance_request(RESUME, "Polish my summary and skills")
+
+        latex, info = finish(gemini_answer(
+            "%%% SECTION 0\n\\section*{Summary}\nStaff engineer.\n"
+            "%%% SECTION 2\n\\section{Skills}\n{Python\n"
+        ))
+
+        self.assertIn("Staff engineer.", latex)
+        self.assertEqual(info["sections"], ["Summary"])
+        self.assertEqual(info["rejected"], ["Skills"])
+
+
+# ============================================================
+#  Compile Engine
+# ============================================================
+
+class CompileEngineFallbackTests(SimpleTestCase):
+
+    LATEX = "\\documentclass{article}\n\\begin{document}\nHi\n\\end{document}\n"
+
+    def setUp(self):
+        folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, folder, ignore_errors=True)
+        self.engine = CompileEngine(folder, warm_workers=0, max_formats=1, timeout=5)
+        key = preamble_hash("\\documentclass{article}\n")
+        with open(self.engine._fmt_path(key), "w") as f:
+            f.write("fmt")
+        self.cold = []
+        self.engine.compile_cold = lambda latex, cancel=None: self.cold.append(latex) or b"PDF"
+
+    def test_document_error_is_not_compiled_again_cold(self):
+        def broken(key, latex, cancel=None):
+            raise LatexCompileError("! Undefined control sequence.", "", "")
+        self.engine.compile_with_format = broken
+
+        with self.assertRaises(LatexCompileError):
+            self.engine.compile(self.LATEX)
+        self.assertEqual(self.cold, [])
+        self.assertEqual(self.engine.snapshot()["fallbacks"], 0)
+
+    def test_unloadable_format_falls_back_to_cold(self):
+        def stale(key, latex, cancel=None):
+            raise LatexCompileError("---! x.fmt was written by a different pdfTeX", "", "")
+        self.engine.compile_with_format = stale
+
+        self.assertEqual(self.engine.compile(self.LATEX), b"PDF")
+        self.assertEqual(self.engine.snapshot()["fallbacks"], 1)
+
+
+class FakeWarmWorker:
+
+    closed = 0
+
+    def __init__(self, fmt_key, fmt_folder):
+        self.fmt_key = fmt_key
+
+    def alive(self):
+        return True
+
+    def close(self):
+        FakeWarmWorker.closed += 1
+
+
+class CompileEngineWarmUpTests(SimpleTestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder, ignore_errors=True)
+        self.scheduler = CompileScheduler(max_concurrent=4, max_queue=4)
+
+    def engine(self, **kwargs):
+        options = {"warm_workers": 0, "max_formats": 8, "timeout": 5, "scheduler": self.scheduler, **kwargs}
+        return CompileEngine(self.folder, **options)
+
+    def add_format(self, engine, name):
+        key = preamble_hash(name)
+        with open(engine._fmt_path(key), "w") as f:
+            f.write("fmt")
+        return key
+
+    def test_format_builds_run_one_at_a_time_through_the_scheduler(self):
+        engine = self.engine()
+        lock = threading.Lock()
+        running = [0, 0]   # now, most at once
+
+        def build_format(preamble):
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            time.sleep(0.02)
+            with lock:
+                running[0] -= 1
+
+        engine.build_format = build_format
+        for n in range(5):
+            engine.warm_up(f"\\documentclass{{article}} % {n}\n")
+        while engine.snapshot()["formats_queued"] or engine._builder_running:
+            time.sleep(0.01)
+
+        self.assertEqual(running[1], 1)
+        self.assertEqual(self.scheduler.snapshot()["admitted"], 5)
+
+    def test_idle_workers_are_capped_across_formats(self):
+        engine = self.engine(warm_workers=2, max_idle_workers=3)
+        FakeWarmWorker.closed = 0
+        patcher = mock.patch.object(latex_engine, "_WarmWorker", FakeWarmWorker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        first, second, third = (self.add_format(engine, name) for name in "abc")
+
+        engine._refill(first)
+        engine._refill(second)
+        self.assertEqual(engine.snapshot()["idle_workers"], 3)
+
+        engine._refill(third)
+
+        self.assertEqual(engine.snapshot()["idle_workers"], 3)
+        self.assertEqual(len(engine._pools[third]), 2)
+        self.assertEqual(len(engine._pools[second]), 1)
+        self.assertNotIn(first, engine._pools)
+        self.assertEqual(FakeWarmWorker.closed, 3)
+
+
+# ============================================================
+#  Compile Scheduler
+# ============================================================
+
+class CompileSchedulerTests(SimpleTestCase):
+
+    def setUp(self):
+        self.scheduler = CompileScheduler(max_concurrent=1, max_queue=1)
+        self.release = threading.Event()
+
+    def occupy(self):
+        """Start a compile that holds the only slot until ``release`` is set."""
+        thread = threading.Thread(target=self.scheduler.run, args=(lambda: self.release.wait(5),))
+        thread.start()
+        self.addCleanup(thread.join, 5)
+        self.addCleanup(self.release.set)  # runs before the join
+        while self.scheduler.snapshot()["running"] < 1:
+            time.sleep(0.01)
+
+    def queue(self, cancel=None):
+        results = []
+        thread = threading.Thread(target=lambda: results.append(self.scheduler.run(lambda: "done", cancel)))
+        thread.start()
+        self.addCleanup(thread.join, 5)
+        self.addCleanup(self.release.set)  # runs before the join
+        while self.scheduler.snapshot()["queue_depth"] < 1:
+            time.sleep(0.01)
+        return thread, results
+
+    def test_runs_the_function(self):
+        self.assertEqual(self.scheduler.run(lambda: 42), 42)
+        self.assertEqual(self.scheduler.snapshot()["admitted"], 1)
+
+    def test_waiter_runs_when_the_slot_frees(self):
+        self.occupy()
+        thread, results = self.queue()
+
+        self.release.set()
+        thread.join(5)
+
+        self.assertEqual(results, ["done"])
+
+    def test_rejects_when_the_queue_is_full(self):
+        self.occupy()
+        self.queue()
+
+        with self.assertRaises(SchedulerFull) as ctx:
+            self.scheduler.run(lambda: None)
+        self.assertGreaterEqual(ctx.exception.retry_after, 1)
+        self.assertEqual(self.scheduler.snapshot()["rejected"], 1)
+
+    def test_cancelled_waiter_leaves_the_queue(self):
+        self.occupy()
+        cancel = threading.Event()
+        errors = []
+
+        def waiter():
+            try:
+                self.scheduler.run(lambda: None, cancel)
+            except CompileCancelled:
+                errors.append("cancelled")
+
+        thread = threading.Thread(target=waiter)
+        thread.start()
+        while self.scheduler.snapshot()["queue_depth"] < 1:
+            time.sleep(0.01)
+        cancel.set()
+        thread.join(5)
+
+        self.assertEqual(errors, ["cancelled"])
+        self.assertEqual(self.scheduler.snapshot()["queue_depth"], 0)
+
+
+# ============================================================
+#  Background Job Queue
+# ============================================================
+
+@override_settings(RESUME_JOB_MAX_ATTEMPTS=2, RESUME_JOB_LEASE_SECONDS=60)
+class JobQueueTests(SimpleTestCase):
+
+    def setUp(self):
+        use_mongomock(self)
+        self.job_id = jobs.enqueue("generate", "a@x.com", {"template": "t", "job_description": "jd"})
+
+    def expire_lease(self):
+        jobs.jobs().update_one(
+            {"_id": self.job_id}, {"$set": {"lease_until": datetime.utcnow() - timedelta(seconds=1)}}
+        )
+
+    def status(self):
+        return jobs.jobs().find_one({"_id": self.job_id})["status"]
+
+    def test_claim_leases_the_job_once(self):
+        job = jobs.claim("w1")
+
+        self.assertEqual(job["_id"], self.job_id)
+        self.assertEqual(job["attempts"], 1)
+        self.assertEqual(job["worker"], "w1")
+        self.assertIsNone(jobs.claim("w2"))
+
+    def test_expired_lease_is_claimed_again(self):
+        jobs.claim("w1")
+        self.expire_lease()
+
+        job = jobs.claim("w2")
+
+        self.assertEqual(job["worker"], "w2")
+        self.assertEqual(job["attempts"], 2)
+
+    def test_expired_lease_on_the_last_attempt_fails_the_job(self):
+        jobs.claim("w1")
+        self.expire_lease()
+        jobs.claim("w2")
+        self.expire_lease()
+
+        self.assertIsNone(jobs.claim("w3"))
+        self.assertEqual(self.status(), "failed")
+
+    def test_worker_that_lost_its_lease_cannot_record_a_result(self):
+        stale = jobs.claim("w1")
+        self.expire_lease()
+        current = jobs.claim("w2")
+
+        self.assertFalse(jobs.complete(stale, {"id": "old"}))
+        self.assertFalse(jobs.fail(stale, RuntimeError("late")))
+        self.assertTrue(jobs.complete(current, {"id": "new"}))
+
+        job = jobs.jobs().find_one({"_id": self.job_id})
+        self.assertEqual(job["status"], "done")
+        self.assertEqual(job["result"], {"id": "new"})
+
+    def test_failure_is_retried_while_attempts_remain(self):
+        jobs.fail(jobs.claim("w1"), RuntimeError("Gemini 503"))
+        self.assertEqual(self.status(), "queued")
+
+        jobs.fail(jobs.claim("w1"), RuntimeError("Gemini 503"))
+        self.assertEqual(self.status(), "failed")
+
+    def test_permanent_failure_is_not_retried(self):
+        jobs.fail(jobs.claim("w1"), jobs.PermanentJobError("Template not found"))
+
+        job = jobs.get_job(self.job_id, "a@x.com")
+        self.assertEqual(job["status"], "failed")
+        self.assertEqual(job["error"], "Template not found")
+
+
+# ============================================================
+#  Prep Hub Company Keys
+# ============================================================
+
+class CompanyNameTests(SimpleTestCase):
+
+    def test_variants_share_a_key(self):
+        self.assertEqual(normalize_company("  Google, Inc. "), "google")
+        self.assertEqual(normalize_company("GOOGLE LLC"), "google")
+
+    def test_non_ascii_names_keep_their_letters(self):
+        self.assertEqual(normalize_company("Nestlé"), "nestlé")
+        self.assertEqual(normalize_company("株式会社"), "株式会社")
+
+    def test_names_without_letters_or_digits_are_rejected(self):
+        for name in ["!!!", "   ", "-.-", None, 42]:
+            self.assertEqual(company_name_error(name).status_code, 400, name)
+        self.assertIsNone(company_name_error("Stripe"))
+
+
+# ============================================================
+#  Template Registry
+# ============================================================
+
+TEMPLATE = "\\documentclass{article}\n\\begin{document}\n\\section{Experience}\n%EXPERIENCE%\n\\end{document}\n"
+
+
+class TemplateRegistryTests(SimpleTestCase):
+
+    def setUp(self):
+        use_mongomock(self)
+        patcher = mock.patch.object(template_registry.compile_engine, "warm_up")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(template_registry._cache.clear)
+
+    def test_each_owner_keeps_their_own_name(self):
+        mine, created_mine = template_registry.register("a@x.com", TEMPLATE, "Mine")
+        theirs, created_theirs = template_registry.register("b@x.com", TEMPLATE, "Theirs")
+
+        self.assertEqual(mine["id"], theirs["id"])
+        self.assertTrue(created_mine and created_theirs)
+        self.assertEqual(template_registry.get("a@x.com", mine["id"])["name"], "Mine")
+        self.assertEqual(template_registry.get("b@x.com", mine["id"])["name"], "Theirs")
+        self.assertEqual([t["name"] for t in template_registry.list_for("b@x.com")], ["Theirs"])
+        self.assertIsNone(template_registry.get("c@x.com", mine["id"]))
+
+    def test_upload_again_renames_only_when_named(self):
+        template, _ = template_registry.register("a@x.com", TEMPLATE, "First")
+
+        _, created = template_registry.register("a@x.com", TEMPLATE)
+        self.assertFalse(created)
+        self.assertEqual(template_registry.get("a@x.com", template["id"])["name"], "First")
+
+        template_registry.register("a@x.com", TEMPLATE, "Second")
+        self.assertEqual(template_registry.get("a@x.com", template["id"])["name"], "Second")
+
+    def test_remove_keeps_the_template_for_other_owners(self):
+        template, _ = template_registry.register("a@x.com", TEMPLATE, "Mine")
+        template_registry.register("b@x.com", TEMPLATE, "Theirs")
+
+        self.assertTrue(template_registry.remove("a@x.com", template["id"]))
+
+        self.assertIsNone(template_registry.get("a@x.com", template["id"]))
+        self.assertEqual(template_registry.get("b@x.com", template["id"])["name"], "Theirs")
@@ -1,11 +1,21 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+ASYNC = settings.ASYNC_VIEWS
+
 urlpatterns = [
     path('generate-pdf/', views.generate_pdf, name="generate_pdf"),
-    path("generate/", views.resume_generate, name="resume-generate"),
-    path("enhance/", views.resume_enhance),
+    path("generate/", views.resume_generate_async if ASYNC else views.resume_generate, name="resume-generate"),
+    path("generate/batch/", views.resume_generate_batch_async if ASYNC else views.resume_generate_batch),
+    path("enhance/", views.resume_enhance_async if ASYNC else views.resume_enhance),
+    path("jobs/<str:job_id>/", views.resume_job_status),
+    path("history/", views.resume_history),
+    path("history/<str:id>/", views.resume_history_detail),
     path("download/<str:id>/", views.resume_download),
-    path("pdf/<str:id>/", views.resume_pdf),
-    path("prep-hub/search/", views.prep_hub_search, name="prep-hub-search"),
+    path("pdf/<str:id>/", views.resume_pdf_async if ASYNC else views.resume_pdf),
+    path("pdf-cache/stats/", views.resume_pdf_cache_stats),
+    path("templates/", views.resume_templates),
+    path("templates/<str:template_id>/", views.resume_template_detail),
+    path("prep-hub/search/", views.prep_hub_search_async if ASYNC else views.prep_hub_search, name="prep-hub-search"),
 ]
@@ -33,63 +33,330 @@ def generate_pdf(request):
 
 import os
 import json
+import math
 import uuid
 import time
+import asyncio
+import threading
 import subprocess
 import tempfile
 from datetime import datetime
 
 from django.conf import settings
-from django.http import JsonResponse, HttpResponse, FileResponse
+from django.http import JsonResponse, HttpResponse, FileResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 
-from pymongo import MongoClient
-import requests
+from concurrent.futures import ThreadPoolExecutor
+
+from backend import prompts
+from backend.response_cache import bypass_requested
+from backend.timing import span, propagate
+from backend.ratelimit import RateLimited, rate_limited_response
+from backend.decorators import metrics_required
+from backend.gemini import call_gemini, acall_gemini, key_slot, akey_slot
+from users import store
+from users.decorators import user_required
+from . import jobs, history, latex_sections, template_registry
+from .pdf_cache import pdf_cache
+from .artifacts import artifact_store
+from .prep_hub_cache import prep_hub_cache, normalize_company
+from .latex_engine import compile_engine, clean_latex, LatexCompileError
+from .compile_scheduler import compile_scheduler, SchedulerFull
 
 
 # ============================================================
-#  MongoDB Setup
+#  Gemini Helpers
 # ============================================================
 
-client = MongoClient(settings.MONGO_URI)
-db = client[settings.MONGO_DB_NAME]
-users = db["users"]
+def extract_text(resp):
+    """Extract final pure text from Gemini LLM response."""
+    try:
+        return resp["candidates"][0]["content"]["parts"][0]["text"]
+    except:
+        return ""
 
 
 # ============================================================
-#  Gemini Model Info
+#  Prompt & Storage Helpers
+#  (shared by the sync views and their async twins)
 # ============================================================
 
-MODEL_NAME = "gemini-2.5-flash-preview-09-2025"
+GENERATE_SYSTEM_PROMPT = (
+    "You are a senior resume writer & LaTeX engineer. "
+    "Using the template, generate a ONE-PAGE ATS optimized LaTeX resume. "
+    "STRICT RULES:\n"
+    "- Output ONLY LaTeX.\n"
+    "- Do NOT modify template structure or LaTeX commands.\n"
+    "- Use profile_data exactly.\n"
+    "- Align text with the JD.\n"
+    "- Do not invent skills.\n"
+    "- End with: % ATS_SCORE: 85"
+)
 
+ENHANCE_SYSTEM_PROMPT = (
+    "You are an expert LaTeX resume optimizer. "
+    "Enhance the resume content using context but DO NOT modify the template structure. "
+    "Return ONLY LaTeX."
+)
 
-# ============================================================
-#  Gemini Helpers
-# ============================================================
 
-def call_gemini(api_key, payload):
-    """Send request to Gemini with retry."""
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/{MODEL_NAME}:generateContent?key={api_key}"
-    headers = {"Content-Type": "application/json"}
+def build_generate_payload(profile_data, template, jd):
+    return build_generate_payloads(profile_data, template, [jd])[0]
 
-    for attempt in range(3):
-        try:
-            res = requests.post(url, headers=headers, json=payload, timeout=60)
-            res.raise_for_status()
-            return res.json()
-        except Exception:
-            if attempt == 2:
-                raise
-            time.sleep(1.5 ** attempt)
 
+def build_generate_payloads(profile_data, template, jds):
+    """One payload per JD; the profile is serialized once for the whole batch.
 
-def extract_text(resp):
-    """Extract final pure text from Gemini LLM response."""
+    ``template`` is a registry entry (see resolve_template).
+    """
+    profile_json = prompts.fit_profile(profile_data)
+    return [_generate_payload(jd, profile_data, profile_json, template) for jd in jds]
+
+
+def _placeholder_note(placeholders):
+    if not placeholders:
+        return ""
+    names = ", ".join(
+        f"{name} ({', '.join(info['sections'])})" if info["sections"] else name
+        for name, info in placeholders.items()
+    )
+    return f"Placeholders to fill: {names}\n"
+
+
+def _generate_payload(jd, profile_data, profile_json, template):
+    # The template goes first and is sent as is, so every request for the
+    # same template shares a prompt prefix; the JD goes first when trimming.
+    latex = template["latex"]
+    fitted = prompts.fit("resume_generate", GENERATE_SYSTEM_PROMPT + latex, [
+        ("jd", prompts.fit_text(jd), lambda max_tokens: prompts.fit_text(jd, max_tokens)),
+        ("profile", profile_json, lambda max_tokens: prompts.fit_profile(profile_data, max_tokens)),
+    ])
+
+    user_prompt = f"""
+LaTeX Template:
+{latex}
+{_placeholder_note(template.get("placeholders"))}
+Job Description:
+{fitted["jd"]}
+
+User Profile JSON:
+{fitted["profile"]}
+
+Follow the rules and output only LaTeX.
+"""
+
+    return {
+        "systemInstruction": {"parts": [{"text": GENERATE_SYSTEM_PROMPT}]},
+        "contents": [{"parts": [{"text": user_prompt}]}]
+    }
+
+
+def build_enhance_payload(latex_input, context):
+    # The LaTeX source is sent as is; only the context is trimmed.
+    fitted = prompts.fit("resume_enhance", ENHANCE_SYSTEM_PROMPT + latex_input, [
+        ("context", prompts.fit_text(context), lambda max_tokens: prompts.fit_text(context, max_tokens)),
+    ])
+
+    user_prompt = f"""
+Context for Enhancement:
+{fitted["context"]}
+
+Original LaTeX Resume:
+{latex_input}
+
+Improve wording, strengthen achievements, match the new context.
+Keep format exactly same. Output only LaTeX.
+"""
+
+    return {
+        "systemInstruction": {"parts": [{"text": ENHANCE_SYSTEM_PROMPT}]},
+        "contents": [{"parts": [{"text": user_prompt}]}]
+    }
+
+
+ENHANCE_SECTIONS_SYSTEM_PROMPT = (
+    "You are an expert LaTeX resume optimizer. "
+    "You receive some sections of a LaTeX resume, each after a line of the form '%%% SECTION <n>'. "
+    "Enhance their content using context but DO NOT modify the template structure: keep every "
+    "\\section line, command and environment. "
+    "Return ONLY the same marker lines, each followed by its enhanced section, in the same order."
+)
+
+
+def build_section_enhance_payload(chosen, context):
+    """Enhance payload carrying only the ``chosen`` sections (see latex_sections.py)."""
+    sections_text = latex_sections.render(chosen)
+    fitted = prompts.fit("resume_enhance", ENHANCE_SECTIONS_SYSTEM_PROMPT + sections_text, [
+        ("context", prompts.fit_text(context), lambda max_tokens: prompts.fit_text(context, max_tokens)),
+    ])
+
+    user_prompt = f"""
+Context for Enhancement:
+{fitted["context"]}
+
+Resume Sections:
+{sections_text}
+Improve wording, strengthen achievements, match the new context.
+Keep format exactly same. Output only the marker lines and LaTeX.
+"""
+
+    return {
+        "systemInstruction": {"parts": [{"text": ENHANCE_SECTIONS_SYSTEM_PROMPT}]},
+        "contents": [{"parts": [{"text": user_prompt}]}]
+    }
+
+
+def enhance_request(latex_input, context, sections=None):
+    """Return (payload, finish); ``finish(raw)`` turns Gemini's answer into (latex, info).
+
+    Only the sections the context is about are sent when the document has
+    ``\\section`` blocks; the rest is merged back untouched. ``finish``
+    raises latex_sections.RewriteRejected when no rewritten section is
+    usable; ``info["rejected"]`` lists chosen sections whose rewrite was dropped.
+    """
+    plan = latex_sections.plan(latex_input, context, sections)
+    if plan is None:
+        def finish_full(raw):
+            return extract_text(raw), {"mode": "full"}
+        return build_enhance_payload(latex_input, context), finish_full
+
+    preamble, all_sections, tail, chosen = plan
+
+    def finish_sections(raw):
+        rewrites = latex_sections.parse_response(extract_text(raw), chosen)
+        if not rewrites:
+            raise latex_sections.RewriteRejected([s.name for s in chosen])
+        latex = latex_sections.merge(preamble, all_sections, tail, rewrites)
+        return latex, {
+            "mode": "sections",
+            "sections": [all_sections[i].name for i in sorted(rewrites)],
+            "rejected": [s.name for s in chosen if s.index not in rewrites],
+            "unchanged": [s.name for s in all_sections if s.index not in rewrites],
+        }
+
+    return build_section_enhance_payload(chosen, context), finish_sections
+
+
+def new_resume_entry(latex, jd=None):
+    """Build the resume history entry for a fresh LaTeX document."""
+    entry = {
+        "id": str(uuid.uuid4()),
+        "latex": latex,
+    }
+    if jd is not None:
+        entry["job_description_snippet"] = jd[:400]
+    entry["generated_at"] = datetime.utcnow().isoformat()
+    return entry
+
+
+def template_ref(body):
+    """The template part of a request body: {"template_id": ...} or {"template": ...}, else None."""
+    if body.get("template_id"):
+        return {"template_id": body["template_id"]}
+    if body.get("template"):
+        return {"template": body["template"]}
+    return None
+
+
+def _template_from(ref, stored):
+    if "template_id" in ref:
+        if stored is None:
+            return None, JsonResponse({"error": "Template not found"}, status=404)
+        return stored, None
+    latex = ref["template"]
+    return {"id": None, "latex": latex, "placeholders": template_registry.placeholder_map(latex)}, None
+
+
+def resolve_template(email, ref):
+    """Return (template, error_response) for a ``template_ref``.
+
+    Registered templates come from the registry; an inline template is
+    turned into an unregistered entry of the same shape.
+    """
+    stored = template_registry.get(email, ref["template_id"]) if "template_id" in ref else None
+    return _template_from(ref, stored)
+
+
+async def aresolve_template(email, ref):
+    stored = await template_registry.aget(email, ref["template_id"]) if "template_id" in ref else None
+    return _template_from(ref, stored)
+
+
+def parse_batch_body(request):
+    """Return (template_ref, job_descriptions, background, error_response) for a batch request."""
     try:
-        return resp["candidates"][0]["content"]["parts"][0]["text"]
+        body = json.loads(request.body)
     except:
-        return ""
+        return None, None, False, JsonResponse({"error": "Invalid JSON"}, status=400)
+
+    ref = template_ref(body)
+    jds = body.get("job_descriptions")
+
+    if not ref or not isinstance(jds, list) or not jds:
+        return None, None, False, JsonResponse({"error": "Missing template (or template_id) or job_descriptions"}, status=400)
+    if len(jds) > settings.RESUME_BATCH_MAX_ITEMS:
+        return None, None, False, JsonResponse(
+            {"error": f"At most {settings.RESUME_BATCH_MAX_ITEMS} job_descriptions per batch"}, status=400
+        )
+    if not all(isinstance(jd, str) and jd.strip() for jd in jds):
+        return None, None, False, JsonResponse({"error": "Every job description must be a non-empty string"}, status=400)
+
+    return ref, jds, bool(body.get("background")), None
+
+
+def batch_results(jds, outcomes):
+    """Turn per-item (latex, error) outcomes into (entries, results) in request order."""
+    entries = []
+    results = []
+    for index, (jd, (latex, error)) in enumerate(zip(jds, outcomes)):
+        if error is not None:
+            result = {"index": index, "success": False, "error": f"LLM call failed: {error}"}
+            if isinstance(error, RateLimited):
+                result["retry_after"] = math.ceil(error.retry_after)
+            results.append(result)
+            continue
+        entry = new_resume_entry(latex, jd)
+        entries.append(entry)
+        results.append({"index": index, "success": True, "id": entry["id"], "latex": latex})
+    return entries, results
+
+
+def run_resume_job(job):
+    """Execute a queued generate/enhance job and return its result dict.
+
+    Called by ``manage.py resume_worker``; raising marks the attempt failed
+    (PermanentJobError: the whole job, without retries).
+    """
+    email = job["email"]
+    params = job["params"]
+
+    user = store.find_user(email, store.GENERATION_FIELDS)
+    if not user:
+        raise jobs.PermanentJobError("User not found")
+
+    gemini_key = user.get("gemini_key")
+    if not gemini_key:
+        raise jobs.PermanentJobError("Gemini key missing")
+
+    if job["kind"] == "generate":
+        jd = params["job_description"]
+        template, _ = resolve_template(email, params)
+        if template is None:
+            raise jobs.PermanentJobError("Template not found")
+        payload = build_generate_payload(user.get("profile_data", {}), template, jd)
+        finish = lambda raw: (extract_text(raw), None)
+    else:
+        jd = None
+        payload, finish = enhance_request(params["latex"], params["context"], params.get("sections"))
+
+    latex, _ = finish(call_gemini(gemini_key, payload, endpoint=f"resume_{job['kind']}"))
+    entry = new_resume_entry(latex, jd)
+
+    history.save_resume(email, entry, job["kind"])
+    artifact_store.put(entry["id"], latex)
+
+    return {"id": entry["id"], "latex": latex}
 
 
 # ============================================================
@@ -99,15 +366,11 @@ def extract_text(resp):
 
 @csrf_exempt
 @require_http_methods(["POST"])
+@user_required
 def resume_generate(request):
 
-    email = request.session.get("email")
-    if not email:
-        return JsonResponse({"error": "Not logged in"}, status=401)
-
-    user = users.find_one({"email": email})
-    if not user:
-        return JsonResponse({"error": "User not found"}, status=404)
+    user = request.app_user
+    email = user["email"]
 
     gemini_key = user.get("gemini_key")
     profile_data = user.get("profile_data", {})
@@ -121,74 +384,104 @@ def resume_generate(request):
     except:
         return JsonResponse({"error": "Invalid JSON"}, status=400)
 
-    template = body.get("template")
+    ref = template_ref(body)
     jd = body.get("job_description")
 
-    if not template or not jd:
-        return JsonResponse({"error": "Missing template or job_description"}, status=400)
-
-    # -------------------- LLM Prompt --------------------
-    system_prompt = (
-        "You are a senior resume writer & LaTeX engineer. "
-        "Using the template, generate a ONE-PAGE ATS optimized LaTeX resume. "
-        "STRICT RULES:\n"
-        "- Output ONLY LaTeX.\n"
-        "- Do NOT modify template structure or LaTeX commands.\n"
-        "- Use profile_data exactly.\n"
-        "- Align text with the JD.\n"
-        "- Do not invent skills.\n"
-        "- End with: % ATS_SCORE: 85"
-    )
+    if not ref or not jd:
+        return JsonResponse({"error": "Missing template (or template_id) or job_description"}, status=400)
 
-    user_prompt = f"""
-Job Description:
-{jd}
+    template, error = resolve_template(email, ref)
+    if error:
+        return error
 
-User Profile JSON:
-{json.dumps(profile_data, indent=2)}
+    # -------------------- Background Job --------------------
+    if body.get("background"):
+        job_id = jobs.enqueue("generate", email, {**ref, "job_description": jd})
+        return JsonResponse({"success": True, "job_id": job_id, "status": "queued"}, status=202)
 
-LaTeX Template:
-{template}
-
-Follow the rules and output only LaTeX.
-"""
-
-    payload = {
-        "systemInstruction": {"parts": [{"text": system_prompt}]},
-        "contents": [{"parts": [{"text": user_prompt}]}]
-    }
+    payload = build_generate_payload(profile_data, template, jd)
 
     # -------------------- LLM Call --------------------
     try:
-        raw = call_gemini(gemini_key, payload)
+        raw = call_gemini(gemini_key, payload, endpoint="resume_generate", cache=not bypass_requested(request))
+    except RateLimited as e:
+        return rate_limited_response(e)
     except Exception as e:
         return JsonResponse({"error": f"LLM call failed: {e}"}, status=500)
 
     latex = extract_text(raw)
 
     # -------------------- Store in DB --------------------
-    resume_id = str(uuid.uuid4())
-    entry = {
-        "id": resume_id,
-        "latex": latex,
-        "job_description_snippet": jd[:400],
-        "generated_at": datetime.utcnow().isoformat(),
-    }
+    entry = new_resume_entry(latex, jd)
 
-    users.update_one(
-        {"email": email},
-        {"$push": {"generated_resumes": entry}}
-    )
+    history.save_resume(email, entry, "generate")
 
     # -------------------- Store .tex File --------------------
-    temp_folder = settings.TEMP_FOLDER
-    os.makedirs(temp_folder, exist_ok=True)
+    artifact_store.put(entry["id"], latex)
+
+    return JsonResponse({"success": True, "id": entry["id"], "latex": latex})
+
+
+# ============================================================
+# 1b) BATCH RESUME GENERATION
+# POST /resume/generate/batch/
+# One profile against many job descriptions. Gemini calls fan out
+# with at most GEMINI_PER_KEY_CONCURRENCY in flight per API key and
+# all results are stored with one bulk insert.
+# ============================================================
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@user_required
+def resume_generate_batch(request):
 
-    tex_path = os.path.join(temp_folder, f"{resume_id}.tex")
-    with open(tex_path, "w", encoding="utf-8") as f:
-        f.write(latex)
+    user = request.app_user
+    email = user["email"]
 
-    return JsonResponse({"success": True, "id": resume_id, "latex": latex})
+    gemini_key = user.get("gemini_key")
+    if not gemini_key:
+        return JsonResponse({"error": "Gemini key missing"}, status=400)
+
+    ref, jds, background, error = parse_batch_body(request)
+    if error:
+        return error
+
+    template, error = resolve_template(email, ref)
+    if error:
+        return error
+
+    if background:
+        job_ids = jobs.enqueue_many(
+            "generate", email, [{**ref, "job_description": jd} for jd in jds]
+        )
+        return JsonResponse({"success": True, "job_ids": job_ids, "status": "queued"}, status=202)
+
+    payloads = build_generate_payloads(user.get("profile_data", {}), template, jds)
+    slot = key_slot(gemini_key)
+
+    def generate(payload):
+        try:
+            with slot:
+                return extract_text(call_gemini(gemini_key, payload, endpoint="resume_generate", cache=not bypass_requested(request))), None
+        except Exception as e:
+            return None, e
+
+    workers = min(len(payloads), settings.GEMINI_PER_KEY_CONCURRENCY)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        outcomes = list(pool.map(propagate(generate), payloads))
+
+    entries, results = batch_results(jds, outcomes)
+
+    history.save_resumes(email, entries, "generate")
+    for entry in entries:
+        artifact_store.put(entry["id"], entry["latex"])
+
+    return JsonResponse({
+        "success": True,
+        "generated": len(entries),
+        "failed": len(results) - len(entries),
+        "results": results,
+    })
 
 
 # ============================================================
@@ -198,15 +491,11 @@ Follow the rules and output only LaTeX.
 
 @csrf_exempt
 @require_http_methods(["POST"])
+@user_required
 def resume_enhance(request):
 
-    email = request.session.get("email")
-    if not email:
-        return JsonResponse({"error": "Not logged in"}, status=401)
-
-    user = users.find_one({"email": email})
-    if not user:
-        return JsonResponse({"error": "User not found"}, status=404)
+    user = request.app_user
+    email = user["email"]
 
     gemini_key = user.get("gemini_key")
 
@@ -221,54 +510,102 @@ def resume_enhance(request):
     if not latex_input or not context:
         return JsonResponse({"error": "Missing latex or context"}, status=400)
 
-    # -------------------- Enhance Prompt --------------------
-    system_prompt = (
-        "You are an expert LaTeX resume optimizer. "
-        "Enhance the resume content using context but DO NOT modify the template structure. "
-        "Return ONLY LaTeX."
-    )
+    # Optional: titles of the sections to enhance, e.g. ["Experience"]
+    sections = body.get("sections")
+    if sections is not None and not isinstance(sections, list):
+        return JsonResponse({"error": "sections must be a list of section titles"}, status=400)
 
-    user_prompt = f"""
-Context for Enhancement:
-{context}
+    if body.get("background"):
+        job_id = jobs.enqueue("enhance", email, {"latex": latex_input, "context": context, "sections": sections})
+        return JsonResponse({"success": True, "job_id": job_id, "status": "queued"}, status=202)
 
-Original LaTeX Resume:
-{latex_input}
+    payload, finish = enhance_request(latex_input, context, sections)
 
-Improve wording, strengthen achievements, match the new context.
-Keep format exactly same. Output only LaTeX.
-"""
-
-    payload = {
-        "systemInstruction": {"parts": [{"text": system_prompt}]},
-        "contents": [{"parts": [{"text": user_prompt}]}]
-    }
+    # -------------------- LLM Call --------------------
+    try:
+        raw = call_gemini(gemini_key, payload, endpoint="resume_enhance", cache=not bypass_requested(request))
+    except RateLimited as e:
+        return rate_limited_response(e)
+    except Exception as e:
+        return JsonResponse({"error": f"LLM call failed: {e}"}, status=500)
 
-    raw = call_gemini(gemini_key, payload)
-    enhanced = extract_text(raw)
+    try:
+        enhanced, enhanced_info = finish(raw)
+    except latex_sections.RewriteRejected as e:
+        return JsonResponse({"error": str(e), "sections": e.sections}, status=502)
 
     # -------------------- Store new version --------------------
-    resume_id = str(uuid.uuid4())
-    entry = {
-        "id": resume_id,
-        "latex": enhanced,
-        "generated_at": datetime.utcnow().isoformat()
-    }
+    entry = new_resume_entry(enhanced)
 
-    users.update_one(
-        {"email": email},
-        {"$push": {"generated_resumes": entry}}
-    )
+    history.save_resume(email, entry, "enhance")
 
     # -------------------- Save .tex --------------------
-    temp_folder = settings.TEMP_FOLDER
-    os.makedirs(temp_folder, exist_ok=True)
+    artifact_store.put(entry["id"], enhanced)
+
+    return JsonResponse({"success": True, "id": entry["id"], "latex": enhanced, "enhanced": enhanced_info})
+
+
+# ============================================================
+# 2b) BACKGROUND JOB STATUS
+# GET /resume/jobs/<job_id>/
+# ============================================================
+
+@require_http_methods(["GET"])
+def resume_job_status(request, job_id):
+
+    email = request.session.get("email")
+    if not email:
+        return JsonResponse({"error": "Not logged in"}, status=401)
+
+    job = jobs.get_job(job_id, email)
+    if not job:
+        return JsonResponse({"error": "Job not found"}, status=404)
+
+    return JsonResponse({"success": True, **jobs.job_status(job)})
+
+
+# ============================================================
+# 2c) RESUME HISTORY
+# GET /resume/history/?page=1&page_size=20
+# GET /resume/history/<id>/
+# ============================================================
+
+@require_http_methods(["GET"])
+def resume_history(request):
+
+    email = request.session.get("email")
+    if not email:
+        return JsonResponse({"error": "Not logged in"}, status=401)
+
+    try:
+        page = max(int(request.GET.get("page", 1)), 1)
+        page_size = min(max(int(request.GET.get("page_size", 20)), 1), 100)
+    except ValueError:
+        return JsonResponse({"error": "page and page_size must be integers"}, status=400)
+
+    items, total = history.list_resumes(email, page, page_size)
+
+    return JsonResponse({
+        "success": True,
+        "resumes": items,
+        "page": page,
+        "page_size": page_size,
+        "total": total,
+    })
+
+
+@require_http_methods(["GET"])
+def resume_history_detail(request, id):
+
+    email = request.session.get("email")
+    if not email:
+        return JsonResponse({"error": "Not logged in"}, status=401)
 
-    tex_path = os.path.join(temp_folder, f"{resume_id}.tex")
-    with open(tex_path, "w", encoding="utf-8") as f:
-        f.write(enhanced)
+    entry = history.get_resume(email, id)
+    if not entry:
+        return JsonResponse({"error": "Resume not found"}, status=404)
 
-    return JsonResponse({"success": True, "id": resume_id, "latex": enhanced})
+    return JsonResponse({"success": True, "resume": entry})
 
 
 # ============================================================
@@ -282,15 +619,11 @@ def resume_download(request, id):
     if not email:
         return JsonResponse({"error": "Not logged in"}, status=401)
 
-    tex_path = os.path.join(settings.TEMP_FOLDER, f"{id}.tex")
-
-    if not os.path.exists(tex_path):
+    chunks = artifact_store.stream(email, id)
+    if chunks is None:
         return JsonResponse({"error": "File not found"}, status=404)
 
-    with open(tex_path, "r", encoding="utf-8") as f:
-        latex = f.read()
-
-    response = HttpResponse(latex, content_type="text/plain")
+    response = StreamingHttpResponse(chunks, content_type="text/plain")
     response["Content-Disposition"] = f"attachment; filename={id}.tex"
     return response
 
@@ -300,20 +633,53 @@ def resume_download(request, id):
 # GET /user/resume/pdf/<id>/
 # ============================================================
 import os
-import re
 import tempfile
 import subprocess
 from django.http import JsonResponse, FileResponse
 from django.conf import settings
 
 
-def clean_latex(text):
-    """Remove characters that break pdflatex."""
-    text = text.replace("\u2013", "-")
-    text = text.replace("\u2014", "-")
-    text = text.replace("\u00A0", " ")
-    text = re.sub(r"[^\x00-\x7F]+", " ", text)  # remove all unicode
-    return text
+def render_pdf(latex_raw, cancel=None):
+    """Compiled PDF response for ``latex_raw``, or a JSON error response.
+
+    Cache hits never touch the scheduler; misses wait for a compile slot
+    and are refused with 429 when the wait queue is already full.
+    """
+    latex_cleaned = clean_latex(latex_raw)
+
+    def compile_pdf(latex):
+        with span("pdflatex"):
+            return compile_engine.compile(latex, cancel)
+
+    def compile_fn(latex):
+        return compile_scheduler.run(lambda: compile_pdf(latex), cancel=cancel)
+
+    # Same cleaned LaTeX -> same PDF, so only the first request compiles.
+    try:
+        pdf_file = pdf_cache.get_or_compile(latex_cleaned, compile_fn)
+    except SchedulerFull as e:
+        response = JsonResponse({"error": "Too many PDF compiles in progress. Please retry shortly."}, status=429)
+        response["Retry-After"] = str(e.retry_after)
+        return response
+    except subprocess.TimeoutExpired:
+        return JsonResponse({"error": "PDF generation timeout"}, status=500)
+    except LatexCompileError as e:
+        return JsonResponse({
+            "error": "pdflatex failed",
+            "stdout": e.stdout,
+            "stderr": e.stderr,
+            "log": e.log,
+        }, status=500)
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=500)
+
+    return FileResponse(
+        pdf_file,
+        content_type="application/pdf",
+        as_attachment=True,
+        filename="resume.pdf"
+    )
+
 
 def resume_pdf(request, id):
 
@@ -321,64 +687,45 @@ def resume_pdf(request, id):
     if not email:
         return JsonResponse({"error": "Not logged in"}, status=401)
 
-    tex_path = os.path.join(settings.TEMP_FOLDER, f"{id}.tex")
-
-    if not os.path.exists(tex_path):
+    latex_raw = artifact_store.load(email, id)
+    if latex_raw is None:
         return JsonResponse({"error": "LaTeX file not found"}, status=404)
 
-    with open(tex_path, "r", encoding="utf-8") as f:
-        latex_raw = f.read()
-
-    latex_cleaned = clean_latex(latex_raw)
-
-    with tempfile.TemporaryDirectory() as tmp:
+    return render_pdf(latex_raw)
 
-        local_tex = os.path.join(tmp, "resume.tex")
-        local_pdf = os.path.join(tmp, "resume.pdf")
 
-        with open(local_tex, "w", encoding="utf-8") as f:
-            f.write(latex_cleaned)
+async def resume_pdf_async(request, id):
+    """ASGI twin of resume_pdf that abandons the compile if the client disconnects."""
 
-        try:
-            result = subprocess.run(
-                ["pdflatex", "-interaction=nonstopmode", "-halt-on-error", "resume.tex"],
-                cwd=tmp,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                timeout=60,
-                text=True
-            )
-        except subprocess.TimeoutExpired:
-            return JsonResponse({"error": "PDF generation timeout"}, status=500)
-        except Exception as e:
-            return JsonResponse({"error": str(e)}, status=500)
-
-        if not os.path.exists(local_pdf):
+    email = await request.session.aget("email")
+    if not email:
+        return JsonResponse({"error": "Not logged in"}, status=401)
 
-            log_path = os.path.join(tmp, "resume.log")
-            log_text = ""
-            if os.path.exists(log_path):
-                with open(log_path, "r", errors="ignore") as lf:
-                    log_text = lf.read()
+    latex_raw = await asyncio.to_thread(artifact_store.load, email, id)
+    if latex_raw is None:
+        return JsonResponse({"error": "LaTeX file not found"}, status=404)
 
-            return JsonResponse({
-                "error": "pdflatex failed",
-                "stdout": result.stdout,
-                "stderr": result.stderr,
-                "log": log_text,
-            }, status=500)
+    # Django cancels this task on http.disconnect; pass that on to the
+    # scheduler and pdflatex through the event.
+    cancel = threading.Event()
+    try:
+        return await asyncio.to_thread(render_pdf, latex_raw, cancel)
+    except asyncio.CancelledError:
+        cancel.set()
+        raise
 
-        # *** FIX: READ PDF INTO MEMORY BEFORE TEMP FOLDER DELETES ***
-        import io
-        with open(local_pdf, "rb") as f:
-            pdf_bytes = f.read()
 
-        return FileResponse(
-            io.BytesIO(pdf_bytes),
-            content_type="application/pdf",
-            as_attachment=True,
-            filename="resume.pdf"
-        )
+@require_http_methods(["GET"])
+@metrics_required
+def resume_pdf_cache_stats(request):
+    """Hit/miss counters of the compiled-PDF cache, compile latencies and .tex store counters."""
+    return JsonResponse({
+        "success": True,
+        "pdf_cache": pdf_cache.snapshot(),
+        "artifacts": artifact_store.snapshot(),
+        "compile_engine": compile_engine.snapshot(),
+        "compile_scheduler": compile_scheduler.snapshot(),
+    })
 
 
 # ============================================================
@@ -386,38 +733,12 @@ def resume_pdf(request, id):
 # POST /resume/prep-hub/search/
 # ============================================================
 
-@csrf_exempt
-@require_http_methods(["POST"])
-def prep_hub_search(request):
-    """Generate all prep hub data for a company."""
-    try:
-        email = request.session.get("email")
-        if not email:
-            return JsonResponse({"error": "Not logged in"}, status=401)
-
-        user = users.find_one({"email": email})
-        if not user:
-            return JsonResponse({"error": "User not found"}, status=404)
-
-        gemini_key = user.get("gemini_key")
-        if not gemini_key:
-            return JsonResponse({"error": "Gemini API key not found. Please add it in Settings."}, status=400)
-
-        try:
-            body = json.loads(request.body)
-        except:
-            return JsonResponse({"error": "Invalid JSON"}, status=400)
-
-        company_name = body.get("company_name")
-        if not company_name:
-            return JsonResponse({"error": "Missing company_name"}, status=400)
-
-        # Generate all data using Gemini
-        system_prompt = """You are an expert career coach and technical interview preparation specialist. 
+def build_prep_hub_payload(company_name):
+    system_prompt = """You are an expert career coach and technical interview preparation specialist. 
 Generate comprehensive interview preparation data for companies. 
 Always return valid JSON format only, no markdown, no explanations."""
 
-        user_prompt = f"""Generate comprehensive interview preparation data for {company_name}.
+    user_prompt = f"""Generate comprehensive interview preparation data for {company_name}.
 
 Return a JSON object with the following structure:
 
@@ -470,42 +791,373 @@ Include at least 5 questions per round, 4-6 weeks of roadmap, 10-15 leetcode pro
 For LeetCode problems, provide actual LeetCode problem URLs in the format: https://leetcode.com/problems/problem-slug/
 Return ONLY the JSON object, no markdown formatting."""
 
-        payload = {
-            "systemInstruction": {"parts": [{"text": system_prompt}]},
-            "contents": [{"parts": [{"text": user_prompt}]}]
-        }
+    return {
+        "systemInstruction": {"parts": [{"text": system_prompt}]},
+        "contents": [{"parts": [{"text": user_prompt}]}]
+    }
+
+
+def company_name_error(company_name):
+    """400 response unless ``company_name`` names something the cache can key on."""
+    if not company_name or not isinstance(company_name, str):
+        return JsonResponse({"error": "Missing company_name"}, status=400)
+    if not normalize_company(company_name):
+        return JsonResponse({"error": "company_name must contain letters or digits"}, status=400)
+    return None
+
+
+def strip_code_fences(response_text):
+    """Remove markdown code blocks the model sometimes wraps JSON in."""
+    response_text = response_text.strip()
+    if response_text.startswith("```json"):
+        response_text = response_text[7:]
+    if response_text.startswith("```"):
+        response_text = response_text[3:]
+    if response_text.endswith("```"):
+        response_text = response_text[:-3]
+    return response_text.strip()
+
+
+class PrepHubParseError(ValueError):
+    """Gemini answered with something that is not the expected JSON."""
+
+    def __init__(self, message, raw_response):
+        super().__init__(message)
+        self.raw_response = raw_response
+
+
+def parse_prep_hub_response(raw):
+    response_text = strip_code_fences(extract_text(raw))
+    try:
+        return json.loads(response_text)
+    except json.JSONDecodeError as e:
+        raise PrepHubParseError(str(e), response_text)
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@user_required
+def prep_hub_search(request):
+    """Generate all prep hub data for a company."""
+    try:
+        user = request.app_user
+
+        gemini_key = user.get("gemini_key")
+        if not gemini_key:
+            return JsonResponse({"error": "Gemini API key not found. Please add it in Settings."}, status=400)
+
+        try:
+            body = json.loads(request.body)
+        except:
+            return JsonResponse({"error": "Invalid JSON"}, status=400)
+
+        company_name = body.get("company_name")
+        error = company_name_error(company_name)
+        if error:
+            return error
+
+        def generate(company):
+            raw = call_gemini(gemini_key, build_prep_hub_payload(company), endpoint="prep_hub")
+            return parse_prep_hub_response(raw)
+
+        # Same company -> same data for every user; see prep_hub_cache.py
+        try:
+            data, cache_state = prep_hub_cache.get_or_generate(company_name, generate)
+
+            return JsonResponse({
+                "success": True,
+                "company_name": company_name,
+                "data": data,
+                "cache": cache_state,
+            })
+        except PrepHubParseError as e:
+            return JsonResponse({
+                "error": f"Failed to parse AI response as JSON: {str(e)}",
+                "raw_response": e.raw_response[:500]
+            }, status=500)
+        except RateLimited as e:
+            return rate_limited_response(e)
+        except Exception as e:
+            return JsonResponse({"error": f"Gemini API error: {str(e)}"}, status=500)
+    except Exception as e:
+        import traceback
+        print(f"Prep hub search error: {e}")
+        print(traceback.format_exc())
+        return JsonResponse({"error": f"Internal server error: {str(e)}"}, status=500)
+
+# ============================================================
+# 6) TEMPLATE REGISTRY
+# GET/POST /resume/templates/
+# GET/DELETE /resume/templates/<template_id>/
+# Upload a template once, then generate with {"template_id": ...}.
+# ============================================================
+
+@csrf_exempt
+@require_http_methods(["GET", "POST"])
+def resume_templates(request):
+
+    email = request.session.get("email")
+    if not email:
+        return JsonResponse({"error": "Not logged in"}, status=401)
+
+    if request.method == "GET":
+        return JsonResponse({"success": True, "templates": template_registry.list_for(email)})
+
+    try:
+        body = json.loads(request.body)
+    except:
+        return JsonResponse({"error": "Invalid JSON"}, status=400)
+
+    try:
+        template, created = template_registry.register(email, body.get("template"), body.get("name"))
+    except template_registry.TemplateError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    summary = {k: v for k, v in template.items() if k != "latex"}
+    return JsonResponse({
+        "success": True,
+        "template": summary,
+        "format_ready": template_registry.format_ready(template),
+    }, status=201 if created else 200)
+
+
+@csrf_exempt
+@require_http_methods(["GET", "DELETE"])
+def resume_template_detail(request, template_id):
+
+    email = request.session.get("email")
+    if not email:
+        return JsonResponse({"error": "Not logged in"}, status=401)
+
+    if request.method == "DELETE":
+        if not template_registry.remove(email, template_id):
+            return JsonResponse({"error": "Template not found"}, status=404)
+        return JsonResponse({"success": True})
+
+    template = template_registry.get(email, template_id)
+    if not template:
+        return JsonResponse({"error": "Template not found"}, status=404)
+
+    return JsonResponse({
+        "success": True,
+        "template": template,
+        "format_ready": template_registry.format_ready(template),
+    })
+
+
+# ============================================================
+#  ASYNC VIEWS
+#  Served instead of the views above when settings.ASYNC_VIEWS is on
+#  (ASGI). They await Gemini and Mongo instead of holding a worker.
+# ============================================================
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@user_required
+async def resume_generate_async(request):
+
+    user = request.app_user
+    email = user["email"]
+
+    gemini_key = user.get("gemini_key")
+    profile_data = user.get("profile_data", {})
+
+    if not gemini_key:
+        return JsonResponse({"error": "Gemini key missing"}, status=400)
+
+    try:
+        body = json.loads(request.body)
+    except:
+        return JsonResponse({"error": "Invalid JSON"}, status=400)
+
+    ref = template_ref(body)
+    jd = body.get("job_description")
+
+    if not ref or not jd:
+        return JsonResponse({"error": "Missing template (or template_id) or job_description"}, status=400)
+
+    template, error = await aresolve_template(email, ref)
+    if error:
+        return error
+
+    if body.get("background"):
+        job_id = await asyncio.to_thread(
+            jobs.enqueue, "generate", email, {**ref, "job_description": jd}
+        )
+        return JsonResponse({"success": True, "job_id": job_id, "status": "queued"}, status=202)
+
+    payload = build_generate_payload(profile_data, template, jd)
 
+    try:
+        raw = await acall_gemini(gemini_key, payload, endpoint="resume_generate", cache=not bypass_requested(request))
+    except RateLimited as e:
+        return rate_limited_response(e)
+    except Exception as e:
+        return JsonResponse({"error": f"LLM call failed: {e}"}, status=500)
+
+    latex = extract_text(raw)
+    entry = new_resume_entry(latex, jd)
+
+    await history.asave_resume(email, entry, "generate")
+    await asyncio.to_thread(artifact_store.put, entry["id"], latex)
+
+    return JsonResponse({"success": True, "id": entry["id"], "latex": latex})
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@user_required
+async def resume_generate_batch_async(request):
+
+    user = request.app_user
+    email = user["email"]
+
+    gemini_key = user.get("gemini_key")
+    if not gemini_key:
+        return JsonResponse({"error": "Gemini key missing"}, status=400)
+
+    ref, jds, background, error = parse_batch_body(request)
+    if error:
+        return error
+
+    template, error = await aresolve_template(email, ref)
+    if error:
+        return error
+
+    if background:
+        job_ids = await asyncio.to_thread(
+            jobs.enqueue_many, "generate", email, [{**ref, "job_description": jd} for jd in jds]
+        )
+        return JsonResponse({"success": True, "job_ids": job_ids, "status": "queued"}, status=202)
+
+    payloads = build_generate_payloads(user.get("profile_data", {}), template, jds)
+    slot = akey_slot(gemini_key)
+
+    async def generate(payload):
         try:
-            raw = call_gemini(gemini_key, payload)
-            response_text = extract_text(raw)
-            
-            # Clean the response - remove markdown code blocks if present
-            response_text = response_text.strip()
-            if response_text.startswith("```json"):
-                response_text = response_text[7:]
-            if response_text.startswith("```"):
-                response_text = response_text[3:]
-            if response_text.endswith("```"):
-                response_text = response_text[:-3]
-            response_text = response_text.strip()
-            
-            # Parse JSON
-            data = json.loads(response_text)
-            
+            async with slot:
+                return extract_text(await acall_gemini(gemini_key, payload, endpoint="resume_generate", cache=not bypass_requested(request))), None
+        except Exception as e:
+            return None, e
+
+    outcomes = await asyncio.gather(*(generate(payload) for payload in payloads))
+
+    entries, results = batch_results(jds, outcomes)
+
+    await history.asave_resumes(email, entries, "generate")
+
+    def write_all():
+        for entry in entries:
+            artifact_store.put(entry["id"], entry["latex"])
+
+    await asyncio.to_thread(write_all)
+
+    return JsonResponse({
+        "success": True,
+        "generated": len(entries),
+        "failed": len(results) - len(entries),
+        "results": results,
+    })
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@user_required
+async def resume_enhance_async(request):
+
+    user = request.app_user
+    email = user["email"]
+
+    gemini_key = user.get("gemini_key")
+
+    try:
+        body = json.loads(request.body)
+    except:
+        return JsonResponse({"error": "Invalid JSON"}, status=400)
+
+    latex_input = body.get("latex")
+    context = body.get("context")
+
+    if not latex_input or not context:
+        return JsonResponse({"error": "Missing latex or context"}, status=400)
+
+    # Optional: titles of the sections to enhance, e.g. ["Experience"]
+    sections = body.get("sections")
+    if sections is not None and not isinstance(sections, list):
+        return JsonResponse({"error": "sections must be a list of section titles"}, status=400)
+
+    if body.get("background"):
+        job_id = await asyncio.to_thread(
+            jobs.enqueue, "enhance", email, {"latex": latex_input, "context": context, "sections": sections}
+        )
+        return JsonResponse({"success": True, "job_id": job_id, "status": "queued"}, status=202)
+
+    payload, finish = enhance_request(latex_input, context, sections)
+
+    try:
+        raw = await acall_gemini(gemini_key, payload, endpoint="resume_enhance", cache=not bypass_requested(request))
+    except RateLimited as e:
+        return rate_limited_response(e)
+    except Exception as e:
+        return JsonResponse({"error": f"LLM call failed: {e}"}, status=500)
+    try:
+        enhanced, enhanced_info = finish(raw)
+    except latex_sections.RewriteRejected as e:
+        return JsonResponse({"error": str(e), "sections": e.sections}, status=502)
+    entry = new_resume_entry(enhanced)
+
+    await history.asave_resume(email, entry, "enhance")
+    await asyncio.to_thread(artifact_store.put, entry["id"], enhanced)
+
+    return JsonResponse({"success": True, "id": entry["id"], "latex": enhanced, "enhanced": enhanced_info})
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@user_required
+async def prep_hub_search_async(request):
+    """Async twin of prep_hub_search."""
+    try:
+        user = request.app_user
+
+        gemini_key = user.get("gemini_key")
+        if not gemini_key:
+            return JsonResponse({"error": "Gemini API key not found. Please add it in Settings."}, status=400)
+
+        try:
+            body = json.loads(request.body)
+        except:
+            return JsonResponse({"error": "Invalid JSON"}, status=400)
+
+        company_name = body.get("company_name")
+        error = company_name_error(company_name)
+        if error:
+            return error
+
+        async def generate(company):
+            raw = await acall_gemini(gemini_key, build_prep_hub_payload(company), endpoint="prep_hub")
+            return parse_prep_hub_response(raw)
+
+        try:
+            data, cache_state = await prep_hub_cache.aget_or_generate(company_name, generate)
+
             return JsonResponse({
                 "success": True,
                 "company_name": company_name,
-                "data": data
+                "data": data,
+                "cache": cache_state,
             })
-        except json.JSONDecodeError as e:
+        except PrepHubParseError as e:
             return JsonResponse({
                 "error": f"Failed to parse AI response as JSON: {str(e)}",
-                "raw_response": response_text[:500] if 'response_text' in locals() else "No response"
+                "raw_response": e.raw_response[:500]
             }, status=500)
+        except RateLimited as e:
+            return rate_limited_response(e)
         except Exception as e:
             return JsonResponse({"error": f"Gemini API error: {str(e)}"}, status=500)
     except Exception as e:
         import traceback
         print(f"Prep hub search error: {e}")
         print(traceback.format_exc())
-        return JsonResponse({"error": f"Internal server error: {str(e)}"}, status=500)
\ No newline at end of file
+        return JsonResponse({"error": f"Internal server error: {str(e)}"}, status=500)
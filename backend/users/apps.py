@@ -4,3 +4,14 @@ from django.apps import AppConfig
 class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'users'
+
+    def ready(self):
+        from backend.mongo import ensure_indexes_in_background
+        from resume import history, jobs, template_registry
+        from coldconnect.resume_text import resume_text_cache
+        ensure_indexes_in_background(
+            history.ensure_indexes,
+            jobs.ensure_indexes,
+            template_registry.ensure_indexes,
+            resume_text_cache.ensure_indexes,
+        )
@@ -0,0 +1,50 @@
+from functools import wraps
+from inspect import iscoroutinefunction
+
+from django.http import JsonResponse
+from pymongo.errors import ConnectionFailure
+
+from . import store
+
+
+DB_UNAVAILABLE = "Database connection failed. Please ensure MongoDB is running on localhost:27017"
+
+
+def user_required(view):
+    """Resolve the logged-in user once and expose it as ``request.app_user``.
+
+    Answers 401 when there is no session and 404 when the user no longer
+    exists. Works for both sync and async views.
+    """
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            email = await request.session.aget("email")
+            if not email:
+                return JsonResponse({"error": "Not logged in"}, status=401)
+            try:
+                user = await store.asession_user(email)
+            except ConnectionFailure:
+                return JsonResponse({"error": DB_UNAVAILABLE}, status=500)
+            if not user:
+                return JsonResponse({"error": "User not found"}, status=404)
+            request.app_user = user
+            return await view(request, *args, **kwargs)
+
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        email = request.session.get("email")
+        if not email:
+            return JsonResponse({"error": "Not logged in"}, status=401)
+        try:
+            user = store.session_user(email)
+        except ConnectionFailure:
+            return JsonResponse({"error": DB_UNAVAILABLE}, status=500)
+        if not user:
+            return JsonResponse({"error": "User not found"}, status=404)
+        request.app_user = user
+        return view(request, *args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,155 @@
+"""
+Password hashing off the request path.
+
+bcrypt is deliberately slow, so every hash and check runs on a small
+dedicated thread pool (bcrypt releases the GIL) sized below the CPU count.
+At most ``max_queue`` more operations may wait for it; beyond that
+``HasherBusy`` is raised and the view answers 429, so a login flood costs
+a bounded share of the CPUs instead of all of them.
+
+The work factor comes from BCRYPT_ROUNDS. Hashes made with a different
+cost are re-hashed in the background after the next successful login.
+"""
+
+import os
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+from django.conf import settings
+
+
+class HasherBusy(Exception):
+    """Too many password operations are queued; ``retry_after`` is in seconds."""
+
+    def __init__(self, retry_after):
+        super().__init__("password hasher is busy")
+        self.retry_after = retry_after
+
+
+def hash_rounds(hashed):
+    """Cost factor of a ``$2b$12$...`` hash, or None if it cannot be read."""
+    try:
+        return int(hashed.split("$")[2])
+    except (IndexError, ValueError):
+        return None
+
+
+def needs_rehash(hashed):
+    return hash_rounds(hashed) != settings.BCRYPT_ROUNDS
+
+
+class PasswordHasher:
+
+    def __init__(self, max_concurrent, max_queue):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._latency = {"hash": deque(maxlen=200), "check": deque(maxlen=200)}
+        self.stats = {
+            "hashes": 0,
+            "checks": 0,
+            "rehashes": 0,
+            "rejected": 0,
+        }
+
+    def _retry_after(self):
+        samples = self._latency["check"] or self._latency["hash"]
+        avg = (sum(samples) / len(samples)) if samples else 0.25
+        return max(1, math.ceil(avg * (self._pending + 1) / self.max_concurrent))
+
+    def _admit(self):
+        with self._lock:
+            if self._pending >= self.max_concurrent + self.max_queue:
+                self.stats["rejected"] += 1
+                raise HasherBusy(self._retry_after())
+            self._pending += 1
+
+    def _timed(self, op, fn, *args):
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self._latency[op].append(time.perf_counter() - started)
+
+    def _submit(self, op, fn, *args):
+        self._admit()
+        return self._executor.submit(self._timed, op, fn, *args)
+
+    def hash(self, password):
+        """bcrypt hash of ``password`` at the configured cost, as a str."""
+        future = self._submit("hash", _hash, password, settings.BCRYPT_ROUNDS)
+        with self._lock:
+            self.stats["hashes"] += 1
+        return future.result()
+
+    def check(self, password, hashed):
+        future = self._submit("check", _check, password, hashed)
+        with self._lock:
+            self.stats["checks"] += 1
+        return future.result()
+
+    def rehash_later(self, password, save):
+        """Hash ``password`` at the current cost and pass it to ``save``, in the background.
+
+        Skipped when the pool is busy; the next login tries again.
+        """
+        def run():
+            save(_hash(password, settings.BCRYPT_ROUNDS))
+
+        try:
+            future = self._submit("hash", run)
+        except HasherBusy:
+            return False
+        with self._lock:
+            self.stats["rehashes"] += 1
+        future.add_done_callback(_report_failure)
+        return True
+
+    def snapshot(self):
+        with self._lock:
+            latency = {}
+            for op, samples in self._latency.items():
+                ordered = sorted(samples)
+                latency[op] = {
+                    "count": len(ordered),
+                    "avg": round(1000 * sum(ordered) / len(ordered), 1) if ordered else 0.0,
+                    "p95": round(1000 * ordered[int(len(ordered) * 0.95)], 1) if ordered else 0.0,
+                    "max": round(1000 * ordered[-1], 1) if ordered else 0.0,
+                }
+            return {
+                **self.stats,
+                "pending": self._pending,
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "rounds": settings.BCRYPT_ROUNDS,
+                "latency_ms": latency,
+            }
+
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds)).decode()
+
+
+def _check(password, hashed):
+    return bcrypt.checkpw(password.encode(), hashed.encode())
+
+
+def _report_failure(future):
+    if future.exception() is not None:
+        print(f"Password rehash error: {future.exception()}")
+
+
+_concurrency = settings.BCRYPT_MAX_CONCURRENT or max(1, (os.cpu_count() or 1) // 2)
+
+password_hasher = PasswordHasher(
+    max_concurrent=_concurrency,
+    max_queue=settings.BCRYPT_MAX_QUEUE or 4 * _concurrency,
+)
@@ -0,0 +1,127 @@
+"""
+User document accessors.
+
+Lookups never load the whole user document: each one projects a field
+set below and goes through the unique index on ``email``. Request views
+share one ``session_user`` lookup (SESSION_FIELDS) through
+``users.decorators.user_required``; login and the background worker ask
+for AUTH_FIELDS and GENERATION_FIELDS.
+
+``session_user`` serves the logged-in user's everyday fields from a small
+per-process TTL cache, so the several API calls of one page load cost a
+single Mongo round trip. Every write below drops the cached entry; other
+processes see a change within USER_CACHE_TTL seconds.
+"""
+
+import time
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from backend.mongo import users, async_users
+
+
+# Field sets for the common lookups.
+AUTH_FIELDS = ("email", "username", "password")
+GENERATION_FIELDS = ("gemini_key", "profile_data")
+# What the request-level user context carries (never the password hash).
+SESSION_FIELDS = ("username", "email", "gemini_key", "profile_data", "current_resume")
+
+
+def _projection(fields):
+    # Always include email so an existing user never comes back as an empty dict.
+    projection = {field: 1 for field in fields}
+    projection["email"] = 1
+    projection["_id"] = 0
+    return projection
+
+
+def find_user(email, fields):
+    """Return the user's ``fields`` as a dict, or None if there is no such user."""
+    return users().find_one({"email": email}, _projection(fields))
+
+
+async def afind_user(email, fields):
+    return await async_users().find_one({"email": email}, _projection(fields))
+
+
+# ============================================================
+#  Session User Cache
+# ============================================================
+
+_cache = OrderedDict()   # email -> (expires_at, user)
+_cache_lock = threading.Lock()
+
+
+def _cached(email):
+    with _cache_lock:
+        entry = _cache.get(email)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del _cache[email]
+            return None
+        _cache.move_to_end(email)
+        return entry[1]
+
+
+def _remember(email, user):
+    if user is None or settings.USER_CACHE_TTL <= 0:
+        return
+    with _cache_lock:
+        _cache[email] = (time.monotonic() + settings.USER_CACHE_TTL, user)
+        _cache.move_to_end(email)
+        while len(_cache) > settings.USER_CACHE_MAX_ENTRIES:
+            _cache.popitem(last=False)
+
+
+def invalidate(email):
+    with _cache_lock:
+        _cache.pop(email, None)
+
+
+def session_user(email):
+    """Return the SESSION_FIELDS of ``email`` (cached; treat as read-only), or None."""
+    user = _cached(email)
+    if user is None:
+        user = find_user(email, SESSION_FIELDS)
+        _remember(email, user)
+    return user
+
+
+async def asession_user(email):
+    user = _cached(email)
+    if user is None:
+        user = await afind_user(email, SESSION_FIELDS)
+        _remember(email, user)
+    return user
+
+
+# ============================================================
+#  Writes
+# ============================================================
+
+def user_exists(email):
+    return users().count_documents({"email": email}, limit=1) > 0
+
+
+def create_user(doc):
+    users().insert_one(doc)
+
+
+def set_fields(email, **fields):
+    users().update_one({"email": email}, {"$set": fields})
+    invalidate(email)
+
+
+def unset_fields(email, *fields):
+    users().update_one({"email": email}, {"$unset": {field: "" for field in fields}})
+    invalidate(email)
+
+
+def delete_user(email):
+    """Delete the user; returns True if a document was removed."""
+    deleted = users().delete_one({"email": email}).deleted_count > 0
+    invalidate(email)
+    return deleted
@@ -1,3 +1,31 @@
-from django.test import TestCase
+from django.test import SimpleTestCase
 
-# Create your tests here.
+from backend.testing import use_mongomock
+
+from . import store
+
+
+# ============================================================
+#  User Lookups
+# ============================================================
+
+class SessionUserTests(SimpleTestCase):
+
+    def setUp(self):
+        use_mongomock(self)
+        self.addCleanup(store.invalidate, "a@x.com")
+        store.create_user({
+            "email": "a@x.com", "username": "a", "password": "hash",
+            "gemini_key": "key", "profile_data": {"name": "A"}, "generated_resumes": ["old"],
+        })
+
+    def test_only_session_fields_are_loaded(self):
+        user = store.session_user("a@x.com")
+
+        self.assertEqual(set(user), {"email", "username", "gemini_key", "profile_data"})
+
+    def test_writes_drop_the_cached_user(self):
+        store.session_user("a@x.com")
+        store.set_fields("a@x.com", gemini_key="new")
+
+        self.assertEqual(store.session_user("a@x.com")["gemini_key"], "new")
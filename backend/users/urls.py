@@ -8,5 +8,7 @@ urlpatterns = [
     path("profile/", views.fetch_profile),
     path("profile/update/", views.update_profile_data),
     path("gemini/update/", views.update_gemini_key),
+    path("gemini/budget/", views.gemini_budget),
     path("delete/", views.delete_account),
+    path("password-hasher/stats/", views.password_hasher_stats),
 ]
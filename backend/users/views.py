@@ -1,34 +1,25 @@
 import json
-import bcrypt
 from datetime import datetime
-from pymongo import MongoClient
+from pymongo.errors import ConnectionFailure, DuplicateKeyError
 from django.conf import settings
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 
+from backend.ratelimit import key_limiter
+from backend.decorators import metrics_required
+from resume import history
+from resume.artifacts import artifact_store
+from coldconnect.resume_text import resume_text_cache
+from . import store
+from .decorators import user_required, DB_UNAVAILABLE
+from .passwords import password_hasher, needs_rehash, HasherBusy
 
-# MongoDB Setup
-def get_users_collection():
-    """Get MongoDB users collection with error handling."""
-    try:
-        client = MongoClient(settings.MONGO_URI, serverSelectionTimeoutMS=5000)
-        # Test connection
-        client.server_info()
-        db = client[settings.MONGO_DB_NAME]
-        return db["users"]
-    except Exception as e:
-        print(f"MongoDB connection error: {e}")
-        print("Please ensure MongoDB is running on localhost:27017")
-        raise
 
-# Try to connect at module load, but don't fail if MongoDB is not running
-try:
-    users_collection = get_users_collection()
-except Exception as e:
-    print(f"Warning: MongoDB not available at startup: {e}")
-    print("MongoDB connection will be attempted on first request")
-    users_collection = None
+def too_busy(error):
+    response = JsonResponse({"error": "Too many login attempts in progress. Please retry shortly."}, status=429)
+    response["Retry-After"] = str(error.retry_after)
+    return response
 
 
 # ============================================================
@@ -38,14 +29,6 @@ except Exception as e:
 @require_http_methods(["POST"])
 def signup(request):
     try:
-        # Get MongoDB collection (reconnect if needed)
-        global users_collection
-        if users_collection is None:
-            try:
-                users_collection = get_users_collection()
-            except Exception as e:
-                return JsonResponse({"error": "Database connection failed. Please ensure MongoDB is running on localhost:27017"}, status=500)
-        
         try:
             data = json.loads(request.body)
         except Exception as e:
@@ -57,11 +40,11 @@ def signup(request):
                 return JsonResponse({"error": f"Missing field: {f}"}, status=400)
 
         # Check if user already exists
-        if users_collection.find_one({"email": data["email"]}):
+        if store.user_exists(data["email"]):
             return JsonResponse({"error": "User already exists"}, status=400)
 
         # Hash password
-        hashed_password = bcrypt.hashpw(data["password"].encode(), bcrypt.gensalt()).decode()
+        hashed_password = password_hasher.hash(data["password"])
 
         # Create new user
         doc = {
@@ -72,13 +55,20 @@ def signup(request):
             "profile_data": {}
         }
 
-        users_collection.insert_one(doc)
+        try:
+            store.create_user(doc)
+        except DuplicateKeyError:
+            return JsonResponse({"error": "User already exists"}, status=400)
 
         # Store session
         request.session["email"] = data["email"]
         request.session["username"] = data["username"]
 
         return JsonResponse({"success": True, "message": "Signup successful"})
+    except HasherBusy as e:
+        return too_busy(e)
+    except ConnectionFailure:
+        return JsonResponse({"error": DB_UNAVAILABLE}, status=500)
     except Exception as e:
         import traceback
         print(f"Signup error: {e}")
@@ -93,14 +83,6 @@ def signup(request):
 @require_http_methods(["POST"])
 def login(request):
     try:
-        # Get MongoDB collection (reconnect if needed)
-        global users_collection
-        if users_collection is None:
-            try:
-                users_collection = get_users_collection()
-            except Exception as e:
-                return JsonResponse({"error": "Database connection failed. Please ensure MongoDB is running on localhost:27017"}, status=500)
-        
         try:
             data = json.loads(request.body)
         except Exception as e:
@@ -111,18 +93,30 @@ def login(request):
             if f not in data:
                 return JsonResponse({"error": f"Missing field: {f}"}, status=400)
 
-        user = users_collection.find_one({"email": data["email"]})
+        user = store.find_user(data["email"], store.AUTH_FIELDS)
         if not user:
             return JsonResponse({"error": "User not found"}, status=404)
 
-        if not bcrypt.checkpw(data["password"].encode(), user["password"].encode()):
+        if not password_hasher.check(data["password"], user["password"]):
             return JsonResponse({"error": "Incorrect password"}, status=401)
 
+        # Upgrade hashes made with an older BCRYPT_ROUNDS
+        if needs_rehash(user["password"]):
+            email = user["email"]
+            password_hasher.rehash_later(
+                data["password"],
+                lambda hashed: store.set_fields(email, password=hashed),
+            )
+
         # Set session
         request.session["email"] = user["email"]
         request.session["username"] = user["username"]
 
         return JsonResponse({"success": True, "message": "Login successful"})
+    except HasherBusy as e:
+        return too_busy(e)
+    except ConnectionFailure:
+        return JsonResponse({"error": DB_UNAVAILABLE}, status=500)
     except Exception as e:
         import traceback
         print(f"Login error: {e}")
@@ -135,23 +129,14 @@ def login(request):
 # ============================================================
 @csrf_exempt
 @require_http_methods(["GET"])
+@user_required
 def fetch_profile(request):
     try:
-        # Get MongoDB collection (reconnect if needed)
-        global users_collection
-        if users_collection is None:
-            try:
-                users_collection = get_users_collection()
-            except Exception as e:
-                return JsonResponse({"error": "Database connection failed. Please ensure MongoDB is running on localhost:27017"}, status=500)
-        
-        email = request.session.get("email")
-        if not email:
-            return JsonResponse({"error": "Not logged in"}, status=401)
+        user = request.app_user
+        email = user["email"]
 
-        user = users_collection.find_one({"email": email})
-        if not user:
-            return JsonResponse({"error": "User not found"}, status=404)
+        # Only summaries here; full LaTeX comes from /resume/history/<id>/
+        recent, total = history.list_resumes(email, 1, settings.PROFILE_RECENT_RESUMES)
 
         return JsonResponse({
             "success": True,
@@ -159,8 +144,12 @@ def fetch_profile(request):
             "email": user["email"],
             "gemini_key": user.get("gemini_key", None),
             "profile_data": user.get("profile_data", {}),
-            "generated_resumes": user.get("generated_resumes", [])
+            "current_resume": user.get("current_resume"),
+            "generated_resumes": recent,
+            "generated_resumes_total": total
         })
+    except ConnectionFailure:
+        return JsonResponse({"error": DB_UNAVAILABLE}, status=500)
     except Exception as e:
         import traceback
         print(f"Fetch profile error: {e}")
@@ -175,14 +164,6 @@ def fetch_profile(request):
 @require_http_methods(["POST"])
 def update_profile_data(request):
     try:
-        # Get MongoDB collection (reconnect if needed)
-        global users_collection
-        if users_collection is None:
-            try:
-                users_collection = get_users_collection()
-            except Exception as e:
-                return JsonResponse({"error": "Database connection failed. Please ensure MongoDB is running on localhost:27017"}, status=500)
-        
         email = request.session.get("email")
         if not email:
             return JsonResponse({"error": "Not logged in"}, status=401)
@@ -195,12 +176,11 @@ def update_profile_data(request):
         if "profile_data" not in data:
             return JsonResponse({"error": "Missing profile_data"}, status=400)
 
-        users_collection.update_one(
-            {"email": email},
-            {"$set": {"profile_data": data["profile_data"]}}
-        )
+        store.set_fields(email, profile_data=data["profile_data"])
 
         return JsonResponse({"success": True, "message": "Profile updated"})
+    except ConnectionFailure:
+        return JsonResponse({"error": DB_UNAVAILABLE}, status=500)
     except Exception as e:
         import traceback
         print(f"Update profile error: {e}")
@@ -215,14 +195,6 @@ def update_profile_data(request):
 @require_http_methods(["POST"])
 def update_gemini_key(request):
     try:
-        # Get MongoDB collection (reconnect if needed)
-        global users_collection
-        if users_collection is None:
-            try:
-                users_collection = get_users_collection()
-            except Exception as e:
-                return JsonResponse({"error": "Database connection failed. Please ensure MongoDB is running on localhost:27017"}, status=500)
-        
         email = request.session.get("email")
         if not email:
             return JsonResponse({"error": "Not logged in"}, status=401)
@@ -235,12 +207,11 @@ def update_gemini_key(request):
         if "gemini_key" not in data:
             return JsonResponse({"error": "Missing gemini_key"}, status=400)
 
-        users_collection.update_one(
-            {"email": email},
-            {"$set": {"gemini_key": data["gemini_key"]}}
-        )
+        store.set_fields(email, gemini_key=data["gemini_key"])
 
         return JsonResponse({"success": True, "message": "Gemini key updated"})
+    except ConnectionFailure:
+        return JsonResponse({"error": DB_UNAVAILABLE}, status=500)
     except Exception as e:
         import traceback
         print(f"Update Gemini key error: {e}")
@@ -265,27 +236,23 @@ def logout(request):
 @require_http_methods(["DELETE"])
 def delete_account(request):
     try:
-        # Get MongoDB collection (reconnect if needed)
-        global users_collection
-        if users_collection is None:
-            try:
-                users_collection = get_users_collection()
-            except Exception as e:
-                return JsonResponse({"error": "Database connection failed. Please ensure MongoDB is running on localhost:27017"}, status=500)
-        
         email = request.session.get("email")
         if not email:
             return JsonResponse({"error": "Not logged in"}, status=401)
 
         # Delete user from database
-        result = users_collection.delete_one({"email": email})
-        
-        if result.deleted_count > 0:
+        deleted = store.delete_user(email)
+        artifact_store.delete(history.delete_for_user(email))
+        resume_text_cache.unpin(email)
+
+        if deleted:
             # Flush session
             request.session.flush()
             return JsonResponse({"success": True, "message": "Account deleted successfully"})
         else:
             return JsonResponse({"error": "User not found"}, status=404)
+    except ConnectionFailure:
+        return JsonResponse({"error": DB_UNAVAILABLE}, status=500)
     except Exception as e:
         import traceback
         print(f"Delete account error: {e}")
@@ -293,3 +260,24 @@ def delete_account(request):
         return JsonResponse({"error": f"Internal server error: {str(e)}"}, status=500)
 
 
+# ============================================================
+# 8) PASSWORD HASHER STATS API
+# ============================================================
+@require_http_methods(["GET"])
+@metrics_required
+def password_hasher_stats(request):
+    """Queue depth and latency of the bcrypt pool."""
+    return JsonResponse({"success": True, "password_hasher": password_hasher.snapshot()})
+
+
+# ============================================================
+# 9) GEMINI KEY BUDGET API
+# ============================================================
+@require_http_methods(["GET"])
+@user_required
+def gemini_budget(request):
+    """Rate-limit budget of the user's own Gemini key in this process."""
+    gemini_key = request.app_user.get("gemini_key")
+    if not gemini_key:
+        return JsonResponse({"error": "Gemini API key not found. Please add it in Settings."}, status=400)
+    return JsonResponse({"success": True, "budget": key_limiter.budget(gemini_key)})